@@ -0,0 +1,160 @@
+"""
+Agent statistics maintenance (avgScore, callsHandled)
+
+Stats are kept incrementally: each agent row holds a running score sum, sum of
+squares, count and a window of the most recent scores. Each call remembers what
+it contributed (stats_agent_id / stats_score), so applying a call is
+idempotent and O(1), and handles completion, re-score and deletion alike.
+reconcile_agent_stats() periodically rebuilds the aggregates to catch drift.
+"""
+import json
+import math
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Numeric, case, cast, func, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import Agent, CallEvaluation, SessionLocal
+
+
+def _counted_score(call: CallEvaluation) -> Optional[float]:
+    """Score the call should contribute to its agent, None if it does not count"""
+    if call.agent_id and call.status == "completed" and call.score is not None:
+        return call.score
+    return None
+
+
+def _apply_delta(db: Session, agent_id: str, count_delta: int, score_delta: float, sq_delta: float):
+    """Atomic in-place update, so concurrent workers never lose increments"""
+    agents = Agent.__table__
+    new_count = agents.c.callsHandled + count_delta
+    new_sum = agents.c.score_sum + score_delta
+    db.execute(
+        update(agents)
+        .where(agents.c.agentId == agent_id)
+        .values(
+            callsHandled=new_count,
+            score_sum=new_sum,
+            score_sq_sum=agents.c.score_sq_sum + sq_delta,
+            avgScore=case((new_count > 0, func.round(cast(new_sum / new_count, Numeric), 1)), else_=0.0),
+            updated_at=datetime.utcnow()
+        )
+    )
+
+
+def _update_recent_window(db: Session, agent_id: str, call_id: str, score: Optional[float]):
+    """Replace/remove call_id in the agent's last-N window (row is already write-locked)"""
+    agent = db.query(Agent).filter(Agent.agentId == agent_id).populate_existing().first()
+    if not agent:
+        return
+    window = [entry for entry in json.loads(agent.recent_scores or "[]") if entry[0] != call_id]
+    if score is not None:
+        window.append([call_id, score])
+    agent.recent_scores = json.dumps(window[-settings.AGENT_RECENT_SCORES_WINDOW:])
+
+
+def sync_call_stats(db: Session, call: CallEvaluation, removed: bool = False):
+    """
+    Bring the agent aggregates in line with this call's current state.
+    Call before committing the transaction that completes, re-scores, resets or
+    (with removed=True) deletes the call. The caller commits.
+    """
+    target_score = None if removed else _counted_score(call)
+    target_agent = call.agent_id if target_score is not None else None
+
+    if call.stats_agent_id == target_agent and call.stats_score == target_score:
+        return
+
+    if call.stats_agent_id and call.stats_score is not None:
+        old = call.stats_score
+        _apply_delta(db, call.stats_agent_id, -1, -old, -old * old)
+        _update_recent_window(db, call.stats_agent_id, call.id, None)
+
+    if target_agent:
+        _apply_delta(db, target_agent, 1, target_score, target_score * target_score)
+        _update_recent_window(db, target_agent, call.id, target_score)
+
+    if not removed:
+        call.stats_agent_id = target_agent
+        call.stats_score = target_score
+
+
+def agent_score_stddev(agent: Agent) -> Optional[float]:
+    """Population standard deviation of an agent's scores from the running sums"""
+    if not agent.callsHandled:
+        return None
+    mean = agent.score_sum / agent.callsHandled
+    return round(math.sqrt(max(0.0, agent.score_sq_sum / agent.callsHandled - mean * mean)), 2)
+
+
+def reconcile_agent_stats():
+    """
+    Maintenance job: recompute every agent's aggregates with one GROUP BY and
+    fix rows that drifted (crashes between steps, manual edits, pre-upgrade data)
+    """
+    db = SessionLocal()
+    try:
+        counted = (
+            CallEvaluation.status == "completed",
+            CallEvaluation.score != None,
+            CallEvaluation.agent_id != None
+        )
+        totals = {
+            agent_id: (count, score_sum or 0.0, sq_sum or 0.0)
+            for agent_id, count, score_sum, sq_sum in db.query(
+                CallEvaluation.agent_id,
+                func.count(CallEvaluation.id),
+                func.sum(CallEvaluation.score),
+                func.sum(CallEvaluation.score * CallEvaluation.score)
+            ).filter(*counted).group_by(CallEvaluation.agent_id)
+        }
+
+        window_size = settings.AGENT_RECENT_SCORES_WINDOW
+        fixed = 0
+        for agent in db.query(Agent).all():
+            count, score_sum, sq_sum = totals.get(agent.agentId, (0, 0.0, 0.0))
+            window = json.loads(agent.recent_scores or "[]")
+            drifted = (
+                agent.callsHandled != count
+                or not math.isclose(agent.score_sum or 0.0, score_sum, abs_tol=1e-6)
+                or not math.isclose(agent.score_sq_sum or 0.0, sq_sum, abs_tol=1e-3)
+                or len(window) != min(count, window_size)
+            )
+            if not drifted:
+                continue
+
+            recent = db.query(CallEvaluation.id, CallEvaluation.score).filter(
+                CallEvaluation.agent_id == agent.agentId, *counted
+            ).order_by(CallEvaluation.created_at.desc(), CallEvaluation.id.desc()).limit(window_size).all()
+
+            agent.callsHandled = count
+            agent.score_sum = score_sum
+            agent.score_sq_sum = sq_sum
+            agent.avgScore = round(score_sum / count, 1) if count else 0.0
+            agent.recent_scores = json.dumps([[call_id, score] for call_id, score in reversed(recent)])
+            agent.updated_at = datetime.utcnow()
+            fixed += 1
+
+        # Re-align per-call contribution markers (Core statements: updated_at and
+        # the change feed are untouched, this is bookkeeping only)
+        calls = CallEvaluation.__table__
+        is_counted = (calls.c.status == "completed") & (calls.c.score != None) & (calls.c.agent_id != None)
+        db.execute(
+            update(calls)
+            .where(is_counted, (calls.c.stats_score == None) | (calls.c.stats_score != calls.c.score)
+                   | (calls.c.stats_agent_id == None) | (calls.c.stats_agent_id != calls.c.agent_id))
+            .values(stats_agent_id=calls.c.agent_id, stats_score=calls.c.score)
+        )
+        db.execute(
+            update(calls)
+            .where(~is_counted, (calls.c.stats_agent_id != None) | (calls.c.stats_score != None))
+            .values(stats_agent_id=None, stats_score=None)
+        )
+        db.commit()
+
+        if fixed:
+            print(f"✓ Reconciled stats for {fixed} agent(s)")
+    finally:
+        db.close()
@@ -0,0 +1,289 @@
+"""
+Dashboard analytics served from the rollup tables (see rollups.py)
+Response time depends on the requested range, not on how many calls exist
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from auth import get_current_user, get_current_admin_or_manager, role_owner_id, scope_query_by_role
+from call_lifecycle import ANALYTICS_CACHE_GROUP
+from call_metrics import (
+    SCORECARD_METRICS, SCORECARD_VERSION, CLASSIFICATIONS, classification_filter, metric_pass_counts
+)
+from config import settings
+from database import get_db, Agent, CallEvaluation, DailyRollup
+from pagination import to_naive_utc
+from rollups import ROLLUP_MODELS, truncate_bucket, serialize_bucket
+from ttl_cache import TTLCache, register_cache
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+# Short-lived caches, cleared when a call completes/changes or an agent changes
+leaderboard_cache = register_cache(ANALYTICS_CACHE_GROUP, TTLCache(settings.ANALYTICS_CACHE_TTL_SECONDS))
+high_impact_cache = register_cache(ANALYTICS_CACHE_GROUP, TTLCache(settings.ANALYTICS_CACHE_TTL_SECONDS))
+metric_breakdown_cache = register_cache(ANALYTICS_CACHE_GROUP, TTLCache(settings.ANALYTICS_CACHE_TTL_SECONDS))
+
+# Default window and largest allowed range per granularity
+DEFAULT_RANGE = {"daily": timedelta(days=30), "hourly": timedelta(hours=48)}
+MAX_RANGE = {"daily": timedelta(days=3 * 366), "hourly": timedelta(days=92)}
+
+
+@router.get("/trends")
+async def get_trends(
+    granularity: str = "daily",
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    agent_id: Optional[str] = None,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Call volume, average score, handle time and per-metric pass rates per bucket
+    
+    Query params:
+    - granularity: "daily" (default) or "hourly" (UTC buckets)
+    - from / to: Range (defaults to the last 30 days / 48 hours)
+    - agent_id: One agent (default: all agents combined)
+    
+    Agents only see their own numbers. Empty buckets are omitted.
+    """
+    if granularity not in ROLLUP_MODELS:
+        raise HTTPException(status_code=400, detail="granularity must be 'daily' or 'hourly'")
+    model = ROLLUP_MODELS[granularity]
+
+    date_to = to_naive_utc(date_to) or datetime.utcnow()
+    date_from = to_naive_utc(date_from) or date_to - DEFAULT_RANGE[granularity]
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    if date_to - date_from > MAX_RANGE[granularity]:
+        raise HTTPException(status_code=400, detail=f"Range too large for {granularity} granularity")
+
+    pass_columns = [getattr(model, f"pass_{metric}") for metric in SCORECARD_METRICS]
+    query = db.query(
+        model.bucket_start,
+        func.sum(model.call_count),
+        func.sum(model.score_sum),
+        func.sum(model.duration_sum),
+        *[func.sum(column) for column in pass_columns]
+    ).filter(
+        model.bucket_start >= truncate_bucket(date_from, granularity),
+        model.bucket_start <= date_to
+    )
+    query = scope_query_by_role(query, current_user, model.agent_id)
+    if agent_id:
+        query = query.filter(model.agent_id == agent_id)
+
+    rows = query.group_by(model.bucket_start).order_by(model.bucket_start).all()
+
+    buckets = [
+        serialize_bucket(row[0], row[1], row[2], row[3], row[4:])
+        for row in rows if row[1]
+    ]
+    return {
+        "granularity": granularity,
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "agent_id": agent_id,
+        "buckets": buckets
+    }
+
+
+@router.get("/leaderboard")
+async def get_leaderboard(
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    top: int = 3,
+    bottom: int = 2,
+    current_user = Depends(get_current_admin_or_manager),
+    db: Session = Depends(get_db)
+):
+    """
+    Best and worst agents by average score over a date range - Admin/Manager only
+    
+    Computed from the daily rollups (whole UTC days), so cost depends on the
+    number of agents and days, never on the number of calls. When fewer than
+    top + bottom agents have scores, agents without evaluated calls fill the list.
+    """
+    top = max(0, min(top, 50))
+    bottom = max(0, min(bottom, 50))
+    date_from = to_naive_utc(date_from)
+    date_to = to_naive_utc(date_to)
+    # Day granularity - a changing "now" must not defeat the cache
+    key = (
+        truncate_bucket(date_from, "daily") if date_from else None,
+        truncate_bucket(date_to, "daily") if date_to else None,
+        top, bottom
+    )
+    return leaderboard_cache.get_or_set(key, lambda: _build_leaderboard(db, date_from, date_to, top, bottom))
+
+
+def _build_leaderboard(db: Session, date_from, date_to, top: int, bottom: int) -> dict:
+    calls = func.sum(DailyRollup.call_count)
+    avg_score = func.sum(DailyRollup.score_sum) / calls
+
+    query = db.query(DailyRollup.agent_id, Agent.agentName, calls, avg_score).join(
+        Agent, Agent.agentId == DailyRollup.agent_id
+    )
+    if date_from:
+        query = query.filter(DailyRollup.bucket_start >= truncate_bucket(date_from, "daily"))
+    if date_to:
+        query = query.filter(DailyRollup.bucket_start <= date_to)
+    query = query.group_by(DailyRollup.agent_id, Agent.agentName).having(calls > 0)
+
+    def entry(agent_id, agent_name, call_count, score):
+        return {
+            "agentId": agent_id,
+            "agentName": agent_name,
+            "avgScore": round(score, 1) if score is not None else 0,
+            "evaluatedCalls": call_count or 0,
+            "hasEvaluatedCalls": bool(call_count)
+        }
+
+    best = [entry(*row) for row in query.order_by(avg_score.desc(), DailyRollup.agent_id).limit(top)] if top else []
+    seen = {agent["agentId"] for agent in best}
+    worst = []
+    if bottom:
+        for row in query.order_by(avg_score.asc(), DailyRollup.agent_id).limit(bottom + len(best)):
+            if row[0] not in seen and len(worst) < bottom:
+                worst.append(entry(*row))
+                seen.add(row[0])
+
+    leaderboard = best + worst
+    remaining = top + bottom - len(leaderboard)
+    if remaining > 0:
+        unranked = db.query(Agent.agentId, Agent.agentName)
+        if seen:
+            unranked = unranked.filter(Agent.agentId.notin_(seen))
+        for agent_id, agent_name in unranked.order_by(Agent.agentName).limit(remaining):
+            leaderboard.append(entry(agent_id, agent_name, 0, None))
+
+    return {
+        "from": date_from.isoformat() if date_from else None,
+        "to": date_to.isoformat() if date_to else None,
+        "top": best,
+        "bottom": worst,
+        "leaderboard": leaderboard
+    }
+
+
+@router.get("/high-impact-calls")
+async def get_high_impact_calls(
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    classification: Optional[str] = None,
+    limit: int = 5,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Most recent completed calls in a date range, optionally for one score band
+    (excellent >= 90, good 80-90, needs_improvement < 80)
+    
+    Served by a LIMIT scan of the (status, created_at) / (agent_id, created_at)
+    indexes. Agents only see their own calls.
+    """
+    if classification and classification not in CLASSIFICATIONS:
+        raise HTTPException(status_code=400, detail=f"classification must be one of {', '.join(CLASSIFICATIONS)}")
+    limit = max(1, min(limit, 50))
+    date_from = to_naive_utc(date_from)
+    date_to = to_naive_utc(date_to)
+
+    key = (role_owner_id(current_user), current_user.role, date_from, date_to, classification, limit)
+    return high_impact_cache.get_or_set(
+        key, lambda: _build_high_impact_calls(db, current_user, date_from, date_to, classification, limit)
+    )
+
+
+def _build_high_impact_calls(db: Session, current_user, date_from, date_to, classification, limit) -> list:
+    query = db.query(
+        CallEvaluation.id, CallEvaluation.filename, CallEvaluation.agent_id, CallEvaluation.agent_name,
+        CallEvaluation.score, CallEvaluation.duration, CallEvaluation.duration_seconds, CallEvaluation.created_at
+    ).filter(CallEvaluation.status == "completed", CallEvaluation.score != None)
+    query = scope_query_by_role(query, current_user, CallEvaluation.agent_id)
+    if date_from:
+        query = query.filter(CallEvaluation.created_at >= date_from)
+    if date_to:
+        query = query.filter(CallEvaluation.created_at <= date_to)
+    if classification:
+        query = query.filter(classification_filter(CallEvaluation.score, classification))
+
+    rows = query.order_by(CallEvaluation.created_at.desc(), CallEvaluation.id.desc()).limit(limit).all()
+    return [{
+        "id": row.id,
+        "filename": row.filename,
+        "agent_id": row.agent_id,
+        "agent_name": row.agent_name,
+        "score": row.score,
+        "duration": row.duration,
+        "duration_seconds": row.duration_seconds,
+        "created_at": row.created_at.isoformat() if row.created_at else None
+    } for row in rows]
+
+
+@router.get("/metric-breakdown")
+async def get_metric_breakdown(
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    agent_id: Optional[str] = None,
+    classification: Optional[str] = None,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Per-metric pass counts and rates over completed calls
+    
+    Query params:
+    - from / to: Call date range (default: all time)
+    - agent_id: One agent (default: all agents combined)
+    - classification: excellent, good or needs_improvement
+    
+    One aggregate over the metric_mask bitmask (index range scan on status and
+    created_at, no JSON parsing). Agents only see their own calls.
+    """
+    if classification and classification not in CLASSIFICATIONS:
+        raise HTTPException(status_code=400, detail=f"classification must be one of {', '.join(CLASSIFICATIONS)}")
+    date_from = to_naive_utc(date_from)
+    date_to = to_naive_utc(date_to)
+
+    key = (role_owner_id(current_user), current_user.role, date_from, date_to, agent_id, classification)
+    return metric_breakdown_cache.get_or_set(
+        key, lambda: _build_metric_breakdown(db, current_user, date_from, date_to, agent_id, classification)
+    )
+
+
+def _build_metric_breakdown(db: Session, current_user, date_from, date_to, agent_id, classification) -> dict:
+    query = db.query(func.count(CallEvaluation.id), *metric_pass_counts()).filter(
+        CallEvaluation.status == "completed",
+        CallEvaluation.scorecard_version == SCORECARD_VERSION,
+        CallEvaluation.metric_mask != None
+    )
+    query = scope_query_by_role(query, current_user, CallEvaluation.agent_id)
+    if agent_id:
+        query = query.filter(CallEvaluation.agent_id == agent_id)
+    if date_from:
+        query = query.filter(CallEvaluation.created_at >= date_from)
+    if date_to:
+        query = query.filter(CallEvaluation.created_at <= date_to)
+    if classification:
+        query = query.filter(classification_filter(CallEvaluation.score, classification))
+
+    row = query.one()
+    total = row[0] or 0
+    return {
+        "from": date_from.isoformat() if date_from else None,
+        "to": date_to.isoformat() if date_to else None,
+        "agent_id": agent_id,
+        "classification": classification,
+        "scorecard_version": SCORECARD_VERSION,
+        "total_calls": total,
+        "metrics": [{
+            "metric": metric,
+            "passed": passed or 0,
+            "failed": total - (passed or 0),
+            "pass_rate": round((passed or 0) / total, 3) if total else None
+        } for metric, passed in zip(SCORECARD_METRICS, row[1:])]
+    }
@@ -0,0 +1,353 @@
+"""
+Tiered audit log storage
+- Hot tier: the audit_logs table, holding the last AUDIT_HOT_DAYS days
+- Cold tier: one gzip NDJSON segment per calendar month under AUDIT_DIR/archive,
+  newest row first, next to a small JSON sidecar (row count, timestamp/id range
+  and per-field value counts) used to skip segments that cannot match a query
+- archive_audit_logs() (maintenance job) moves whole months that are entirely
+  older than the hot window; query_audit_logs() pages across both tiers
+"""
+import gzip
+import heapq
+import json
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import AuditLog, SessionLocal
+from pagination import decode_cursor, encode_cursor, to_naive_utc
+
+ARCHIVED_COLUMNS = ("id", "action", "resource_type", "resource_id", "message", "user", "role",
+                    "status", "details", "ip_address", "user_agent", "timestamp")
+PUBLIC_COLUMNS = ("id", "action", "resource_type", "resource_id", "message", "user", "role",
+                  "status", "timestamp")
+
+# Exact-match filters; the sidecar keeps value counts for the INDEXED_FIELDS ones
+EQUALITY_FIELDS = ("resource_type", "action", "status", "user", "resource_id")
+INDEXED_FIELDS = ("resource_type", "action", "status", "user")
+
+# Rows deleted from the hot table per transaction once a month is archived
+ARCHIVE_DELETE_BATCH_SIZE = 2000
+
+
+def archive_dir() -> str:
+    return os.path.join(settings.AUDIT_DIR, "archive")
+
+
+def _segment_paths(month: str) -> Tuple[str, str]:
+    base = os.path.join(archive_dir(), f"audit-{month}")
+    return base + ".ndjson.gz", base + ".idx.json"
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month_start: datetime) -> datetime:
+    return (month_start + timedelta(days=32)).replace(day=1)
+
+
+def _record(log: AuditLog) -> dict:
+    record = {column: getattr(log, column) for column in ARCHIVED_COLUMNS}
+    record["timestamp"] = log.timestamp.isoformat() if log.timestamp else None
+    return record
+
+
+def _sort_key(record: dict) -> Tuple[datetime, int]:
+    timestamp = record["timestamp"]
+    return (datetime.fromisoformat(timestamp) if timestamp else datetime.min), record["id"]
+
+
+def load_segment_index(month: str) -> Optional[dict]:
+    _, index_path = _segment_paths(month)
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def archived_months() -> List[str]:
+    """Archived months, newest first"""
+    if not os.path.isdir(archive_dir()):
+        return []
+    months = [name[len("audit-"):-len(".idx.json")] for name in os.listdir(archive_dir())
+              if name.startswith("audit-") and name.endswith(".idx.json")]
+    return sorted(months, reverse=True)
+
+
+def read_segment(month: str) -> Iterator[dict]:
+    """Rows of one archived month, newest first"""
+    data_path, _ = _segment_paths(month)
+    if not os.path.exists(data_path):
+        return
+    with gzip.open(data_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# =============================================================================
+# Archival (hot table -> monthly segments)
+# =============================================================================
+
+def archive_audit_logs():
+    """Maintenance job: move whole months older than the hot window into segments"""
+    boundary = _month_start(datetime.utcnow() - timedelta(days=settings.AUDIT_HOT_DAYS))
+    db = SessionLocal()
+    try:
+        oldest = db.query(AuditLog.timestamp).filter(
+            AuditLog.timestamp < boundary
+        ).order_by(AuditLog.timestamp).first()
+        if not oldest:
+            return
+
+        month_start = _month_start(oldest[0])
+        while month_start < boundary:
+            month_end = _next_month(month_start)
+            moved = _archive_month(db, month_start, month_end)
+            if moved:
+                print(f"✓ Archived {moved} audit log(s) for {month_start:%Y-%m}")
+            month_start = month_end
+    finally:
+        db.close()
+
+
+def _archive_month(db: Session, month_start: datetime, month_end: datetime) -> int:
+    """
+    Merge the month's hot rows into its segment (rewritten, deduplicated by id),
+    then delete them from the table. Rerunning after a crash is safe.
+    """
+    in_month = and_(AuditLog.timestamp >= month_start, AuditLog.timestamp < month_end)
+    max_id = db.query(AuditLog.id).filter(in_month).order_by(AuditLog.id.desc()).limit(1).scalar()
+    if max_id is None:
+        return 0
+
+    month = f"{month_start:%Y-%m}"
+    data_path, index_path = _segment_paths(month)
+    os.makedirs(archive_dir(), exist_ok=True)
+
+    hot_rows = (
+        _record(log) for log in db.query(AuditLog).filter(in_month, AuditLog.id <= max_id)
+        .order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).yield_per(1000)
+    )
+    merged = heapq.merge(hot_rows, read_segment(month), key=_sort_key, reverse=True)
+
+    counts = {field: Counter() for field in INDEXED_FIELDS}
+    rows = 0
+    newest = oldest = None
+    min_id = max_seen_id = None
+    previous_key = None
+    with open(data_path + ".part", "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as segment:
+            for record in merged:
+                key = _sort_key(record)
+                if key == previous_key:
+                    continue  # Archived by an earlier run that crashed before deleting
+                previous_key = key
+                segment.write((json.dumps(record) + "\n").encode("utf-8"))
+                rows += 1
+                newest = newest or record["timestamp"]
+                oldest = record["timestamp"]
+                min_id = record["id"] if min_id is None else min(min_id, record["id"])
+                max_seen_id = record["id"] if max_seen_id is None else max(max_seen_id, record["id"])
+                for field in INDEXED_FIELDS:
+                    counts[field][record.get(field) or ""] += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    index = {
+        "month": month,
+        "rows": rows,
+        "min_timestamp": oldest,
+        "max_timestamp": newest,
+        "min_id": min_id,
+        "max_id": max_seen_id,
+        "counts": {field: dict(counter) for field, counter in counts.items()},
+    }
+    with open(index_path + ".part", "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(data_path + ".part", data_path)
+    os.replace(index_path + ".part", index_path)
+
+    # The segment is durable - now drop the rows from the hot table in small batches
+    moved = 0
+    while True:
+        ids = [row[0] for row in db.query(AuditLog.id).filter(in_month, AuditLog.id <= max_id)
+               .limit(ARCHIVE_DELETE_BATCH_SIZE).all()]
+        if not ids:
+            break
+        db.query(AuditLog).filter(AuditLog.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        moved += len(ids)
+    return moved
+
+
+# =============================================================================
+# Queries across both tiers
+# =============================================================================
+
+def audit_filters(resource_type=None, action=None, user=None, resource_id=None, status=None,
+                  date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                  q: Optional[str] = None) -> dict:
+    """Filter dict understood by apply_audit_filters / query_audit_logs / iter_audit_logs"""
+    return {
+        "resource_type": resource_type,
+        "action": action,
+        "user": user,
+        "resource_id": resource_id,
+        "status": status,
+        "date_from": to_naive_utc(date_from),
+        "date_to": to_naive_utc(date_to),
+        "q": q.strip() if q else None,
+    }
+
+
+def apply_audit_filters(query, filters: dict):
+    """
+    filters: any of EQUALITY_FIELDS, date_from / date_to (naive UTC datetimes)
+    and q (case-insensitive substring of the message). Empty values are ignored.
+    """
+    for field in EQUALITY_FIELDS:
+        if filters.get(field):
+            query = query.filter(getattr(AuditLog, field) == filters[field])
+    if filters.get("date_from"):
+        query = query.filter(AuditLog.timestamp >= filters["date_from"])
+    if filters.get("date_to"):
+        query = query.filter(AuditLog.timestamp <= filters["date_to"])
+    if filters.get("q"):
+        query = query.filter(AuditLog.message.icontains(filters["q"], autoescape=True))
+    return query
+
+
+def _matches(record: dict, filters: dict) -> bool:
+    """Python twin of apply_audit_filters for archived rows"""
+    if not all(record.get(field) == filters[field] for field in EQUALITY_FIELDS if filters.get(field)):
+        return False
+    if filters.get("date_from") or filters.get("date_to"):
+        timestamp = _sort_key(record)[0]
+        if filters.get("date_from") and timestamp < filters["date_from"]:
+            return False
+        if filters.get("date_to") and timestamp > filters["date_to"]:
+            return False
+    if filters.get("q") and filters["q"].lower() not in (record.get("message") or "").lower():
+        return False
+    return True
+
+
+def _segment_may_match(index: dict, filters: dict, before: Optional[Tuple[datetime, int]]) -> bool:
+    """Rule out a month from its sidecar alone (time range and value counts)"""
+    if not index.get("rows"):
+        return False
+    oldest = datetime.fromisoformat(index["min_timestamp"])
+    newest = datetime.fromisoformat(index["max_timestamp"])
+    if before and oldest > before[0]:
+        return False
+    if filters.get("date_from") and newest < filters["date_from"]:
+        return False
+    if filters.get("date_to") and oldest > filters["date_to"]:
+        return False
+    for field in INDEXED_FIELDS:
+        if filters.get(field) and filters[field] not in index["counts"].get(field, {}):
+            return False
+    return True
+
+
+def _iter_archived(filters: dict, before: Optional[Tuple[datetime, int]]) -> Iterator[dict]:
+    """Matching archived rows older than the cursor, newest first"""
+    for month in archived_months():
+        index = load_segment_index(month)
+        if not index or not _segment_may_match(index, filters, before):
+            continue
+        for record in read_segment(month):
+            if before and _sort_key(record) >= before:
+                continue
+            if _matches(record, filters):
+                yield record
+
+
+def _archive_newest(filters: dict) -> Optional[datetime]:
+    for month in archived_months():
+        index = load_segment_index(month)
+        if index and _segment_may_match(index, filters, None):
+            return datetime.fromisoformat(index["max_timestamp"])
+    return None
+
+
+def _public(record: dict) -> dict:
+    return {column: record.get(column) for column in PUBLIC_COLUMNS}
+
+
+def query_audit_logs(db: Session, filters: dict, limit: int,
+                     cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of audit logs (newest first) from the table and the archive,
+    returns (items, next_cursor). Segments are only read once the page reaches
+    back past the newest archived row.
+    """
+    before = decode_cursor(cursor) if cursor else None
+
+    query = apply_audit_filters(db.query(AuditLog), filters)
+    if before:
+        query = query.filter(or_(
+            AuditLog.timestamp < before[0],
+            and_(AuditLog.timestamp == before[0], AuditLog.id < before[1])
+        ))
+    hot = [_record(log) for log in query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit + 1)]
+
+    archive_newest = _archive_newest(filters)
+    needs_archive = archive_newest is not None and (
+        len(hot) <= limit or _sort_key(hot[-1])[0] <= archive_newest
+    )
+    if needs_archive:
+        cold = _iter_archived(filters, before)
+        merged = heapq.merge(hot, cold, key=_sort_key, reverse=True)
+        rows = [record for _, record in zip(range(limit + 1), merged)]
+    else:
+        rows = hot
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_time, last_id = _sort_key(rows[-1])
+        next_cursor = encode_cursor(last_time, last_id)
+    return [_public(record) for record in rows], next_cursor
+
+
+def count_audit_logs(db: Session, filters: dict) -> int:
+    """Matching rows in both tiers (sidecar counts when possible, else a segment scan)"""
+    total = apply_audit_filters(db.query(AuditLog), filters).count()
+    active = {field: value for field, value in filters.items() if value}
+    for month in archived_months():
+        index = load_segment_index(month)
+        if not index or not _segment_may_match(index, active, None):
+            continue
+        if not active:
+            total += index["rows"]
+        elif len(active) == 1 and next(iter(active)) in INDEXED_FIELDS:
+            field, value = next(iter(active.items()))
+            total += index["counts"][field].get(value, 0)
+        else:
+            total += sum(1 for record in read_segment(month) if _matches(record, active))
+    return total
+
+
+def iter_audit_logs(filters: dict) -> Iterator[dict]:
+    """
+    Every matching row from both tiers, newest first, in constant memory
+    (server-side cursor on its own session merged with the segment readers)
+    """
+    db = SessionLocal()
+    try:
+        hot = (
+            _record(log) for log in apply_audit_filters(db.query(AuditLog), filters)
+            .order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).yield_per(1000)
+        )
+        yield from heapq.merge(hot, _iter_archived(filters, None), key=_sort_key, reverse=True)
+    finally:
+        db.close()
@@ -1,4 +1,4 @@
-from database import AuditLog, SessionLocal
+from audit_writer import audit_writer
 from datetime import datetime
 from typing import Optional
 import json
@@ -30,31 +30,41 @@ def log_action(
         ip_address: Client IP address
         user_agent: Browser/client info
     """
-    db = SessionLocal()
-    try:
-        audit_log = AuditLog(
-            action=action,
-            resource_type=resource_type,
-            resource_id=resource_id,
-            message=message,
-            user=user,
-            role=role,
-            status=status,
-            details=json.dumps(details) if details else None,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            timestamp=datetime.utcnow()
-        )
-        
-        db.add(audit_log)
-        db.commit()
-        print(f"✓ Audit log created: {message}")
-        
-    except Exception as e:
-        print(f"✗ Failed to create audit log: {e}")
-        db.rollback()
-    finally:
-        db.close()
+    # Buffered: the row is bulk-inserted by the audit writer thread (audit_writer.py)
+    audit_writer.enqueue(audit_record(
+        action, resource_type, message, resource_id, user, role, status, details, ip_address, user_agent
+    ))
+
+
+def audit_record(
+    action: str,
+    resource_type: str,
+    message: str,
+    resource_id: Optional[str] = None,
+    user: str = "System",
+    role: str = "Admin",
+    status: str = "success",
+    details: Optional[dict] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None
+) -> dict:
+    """
+    AuditLog row (column -> value) for log_action, or for callers that insert
+    audit rows in their own transaction (bulk upload)
+    """
+    return {
+        "action": action,
+        "resource_type": resource_type,
+        "resource_id": resource_id,
+        "message": message,
+        "user": user,
+        "role": role,
+        "status": status,
+        "details": json.dumps(details) if details else None,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "timestamp": datetime.utcnow()
+    }
 
 
 def get_user_role(user_name: str) -> str:
@@ -81,6 +91,18 @@ def log_call_upload(call_id: str, filename: str, agent_name: str, user: str = "S
         details={"filename": filename, "agent_name": agent_name}
     )
 
+def call_upload_record(call_id: str, filename: str, agent_name: str, user: str, role: str, batch_id: str) -> dict:
+    """Audit row for one call of a bulk upload - inserted with the calls, not buffered"""
+    return audit_record(
+        action="create",
+        resource_type="call",
+        resource_id=call_id,
+        message=f"Uploaded call '{filename}' for agent '{agent_name}'",
+        user=user,
+        role=role,
+        details={"filename": filename, "agent_name": agent_name, "batch_id": batch_id}
+    )
+
 def log_call_analysis_complete(call_id: str, filename: str, score: float):
     """Log when call analysis completes"""
     log_action(
@@ -150,6 +172,30 @@ def log_report_generated(report_id: str, report_type: str, user: str = "Admin"):
         role="Admin"
     )
 
+def log_calls_exported(export_format: str, filters: dict, user: str = "Admin", role: str = "Admin"):
+    """Log a bulk call export (BI extracts leave the system, so keep a trail)"""
+    details = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in filters.items() if v is not None}
+    log_action(
+        action="export",
+        resource_type="call",
+        message=f"Exported calls as {export_format.upper()}",
+        user=user,
+        role=role,
+        details=details
+    )
+
+def log_audit_logs_exported(export_format: str, filters: dict, user: str = "Admin", role: str = "Admin"):
+    """Log an audit log export"""
+    details = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in filters.items() if v is not None}
+    log_action(
+        action="export",
+        resource_type="audit_log",
+        message=f"Exported audit logs as {export_format.upper()}",
+        user=user,
+        role=role,
+        details=details
+    )
+
 def log_user_login(user: str, role: str, ip_address: str = None):
     """Log when a user logs in"""
     log_action(
@@ -196,6 +242,19 @@ def log_call_retry(call_id: str, filename: str, user: str = "System"):
         role="System"
     )
 
+def log_retention_run(summary: dict):
+    """Log a retention enforcement run and the space it reclaimed"""
+    reclaimed_mb = (summary["audio_bytes_reclaimed"] + summary["database_bytes_reclaimed"]) / (1024 * 1024)
+    log_action(
+        action="retention",
+        resource_type="system",
+        message=f"Retention removed {summary['calls_deleted']} calls older than "
+                f"{summary['retention_months']} months, reclaimed {reclaimed_mb:.1f} MB",
+        user="System",
+        role="System",
+        details=summary
+    )
+
 # ==================== NEW: USER MANAGEMENT AUDIT LOGGING ====================
 
 def log_user_created(user_id: str, username: str, role: str, created_by: str = "Admin"):
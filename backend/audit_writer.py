@@ -0,0 +1,244 @@
+"""
+Buffered audit log writer
+- enqueue() only appends to an in-memory buffer, request handlers and the
+  pipeline never open a database transaction to log
+- A background thread bulk-inserts every AUDIT_FLUSH_INTERVAL_MS, or as soon as
+  AUDIT_FLUSH_BATCH_SIZE records are waiting, in one short write transaction
+- The buffer is bounded (AUDIT_BUFFER_MAX_RECORDS). Records that do not fit, or
+  whose flush failed, are appended to an NDJSON spill file and replayed on the
+  next flush (AUDIT_OVERFLOW_POLICY="drop" discards and counts them instead)
+- Replay claims the spill file as <spill>.replay and only removes it once every
+  record is written; whatever failed stays there for the next attempt, and
+  lines that cannot be parsed are moved to <spill>.bad
+- After a failed write the flusher backs off (doubling up to
+  AUDIT_RETRY_MAX_SECONDS) and keeps records buffered in memory meanwhile
+- stop() flushes everything left - called from the shutdown event
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert
+
+from config import settings
+from database import AuditLog, engine
+
+SPILL_FILE_NAME = "audit_spill.ndjson"
+
+
+class AuditWriter:
+    def __init__(self):
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # One flush at a time (thread, stop(), flush())
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._retry_delay = 0.0
+        self._retry_at = 0.0  # time.monotonic() before which no write is attempted
+        self.written = 0
+        self.spilled = 0
+        self.dropped = 0
+
+    @property
+    def spill_path(self) -> str:
+        return os.path.join(settings.AUDIT_DIR, SPILL_FILE_NAME)
+
+    def enqueue(self, record: dict):
+        """Queue one audit row (column -> value). Never touches the database while running."""
+        if self._thread is None:
+            # Not started (scripts, one-off jobs): write through so nothing is lost
+            self._write_or_spill([record])
+            return
+
+        overflow = None
+        with self._wakeup:
+            if len(self._buffer) >= settings.AUDIT_BUFFER_MAX_RECORDS:
+                overflow = record
+            else:
+                self._buffer.append(record)
+                if len(self._buffer) >= settings.AUDIT_FLUSH_BATCH_SIZE:
+                    self._wakeup.notify()
+        if overflow is not None:
+            self._overflow([overflow])
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        print("✓ Audit writer started")
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the flusher and write out everything still buffered"""
+        thread = self._thread
+        if thread is None:
+            return
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        thread.join(timeout)
+        self._thread = None
+        self.flush(force=True)
+        print(f"✓ Audit writer stopped ({self.written} written, {self.spilled} spilled, {self.dropped} dropped)")
+
+    def _run(self):
+        interval = settings.AUDIT_FLUSH_INTERVAL_MS / 1000
+        while True:
+            with self._wakeup:
+                backoff = self._retry_at - time.monotonic()
+                if not self._stopping and (backoff > 0 or len(self._buffer) < settings.AUDIT_FLUSH_BATCH_SIZE):
+                    self._wakeup.wait(max(interval, backoff))
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:  # Never let the flusher die
+                print(f"❌ Audit flush failed: {e}")
+            if stopping:
+                return
+
+    def flush(self, force: bool = False) -> int:
+        """
+        Write previously spilled, then buffered records now, returns rows written.
+        While backing off after a failed write this does nothing unless forced.
+        """
+        with self._flush_lock:
+            if not force and time.monotonic() < self._retry_at:
+                return 0
+            replayed = self._replay_spilled()
+            if replayed is None and not force:
+                return 0  # Database still failing, the buffer waits for the next attempt
+
+            with self._lock:
+                records = list(self._buffer)
+                self._buffer.clear()
+            if replayed is None:
+                self._overflow(records)
+                return 0
+
+            batch_size = max(1, settings.AUDIT_FLUSH_BATCH_SIZE)
+            written = replayed
+            for start in range(0, len(records), batch_size):
+                if not self._insert(records[start:start + batch_size]):
+                    self._overflow(records[start:])
+                    break
+                written += min(batch_size, len(records) - start)
+            return written
+
+    def _insert(self, records: List[dict]) -> bool:
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(AuditLog.__table__), records)
+        except Exception as e:
+            self._retry_delay = min(
+                settings.AUDIT_RETRY_MAX_SECONDS,
+                max(settings.AUDIT_FLUSH_INTERVAL_MS / 1000, self._retry_delay * 2)
+            )
+            self._retry_at = time.monotonic() + self._retry_delay
+            print(f"⚠️ Audit write failed for {len(records)} record(s), retrying in {self._retry_delay:.1f}s: {e}")
+            return False
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+        self.written += len(records)
+        return True
+
+    def _write_or_spill(self, records: List[dict]) -> int:
+        if self._insert(records):
+            return len(records)
+        self._overflow(records)
+        return 0
+
+    def _overflow(self, records: List[dict]):
+        if not records:
+            return
+        if settings.AUDIT_OVERFLOW_POLICY != "spill":
+            self.dropped += len(records)
+            return
+        try:
+            os.makedirs(settings.AUDIT_DIR, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(_to_json(record)) + "\n")
+            self.spilled += len(records)
+        except OSError as e:
+            print(f"❌ Could not spill {len(records)} audit record(s): {e}")
+            self.dropped += len(records)
+
+    def _replay_spilled(self) -> Optional[int]:
+        """
+        Write spilled records back, returns rows written or None if the database
+        is still failing (the unwritten records stay in the .replay file).
+        A .replay file left by an earlier attempt is finished before the spill
+        file is claimed again, so it is never overwritten.
+        """
+        replay_path = self.spill_path + ".replay"
+        batch_size = max(1, settings.AUDIT_FLUSH_BATCH_SIZE)
+        written = 0
+        try:
+            while True:
+                if not os.path.exists(replay_path):
+                    if not os.path.exists(self.spill_path):
+                        return written
+                    os.replace(self.spill_path, replay_path)  # New spills start a fresh file
+                records = self._read_spill(replay_path)
+                for start in range(0, len(records), batch_size):
+                    if not self._insert(records[start:start + batch_size]):
+                        _write_spill(replay_path, records[start:])
+                        return None
+                    written += min(batch_size, len(records) - start)
+                os.remove(replay_path)
+                if records:
+                    print(f"✓ Replayed {len(records)} spilled audit record(s)")
+        except OSError as e:
+            print(f"⚠️ Could not replay spilled audit records: {e}")
+            return None
+
+    def _read_spill(self, path: str) -> List[dict]:
+        """Records from a spill file; lines that do not parse (e.g. cut short by a crash) go to <spill>.bad"""
+        records, bad = [], []
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(_from_json(json.loads(line)))
+                except (ValueError, TypeError, AttributeError):
+                    bad.append(line if line.endswith("\n") else line + "\n")
+        if bad:
+            with open(self.spill_path + ".bad", "a", encoding="utf-8") as f:
+                f.writelines(bad)
+            print(f"⚠️ {len(bad)} unreadable spilled audit line(s) moved to {self.spill_path}.bad")
+        return records
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+
+def _to_json(record: dict) -> dict:
+    return {k: v.isoformat() if isinstance(v, datetime) else v for k, v in record.items()}
+
+
+def _write_spill(path: str, records: List[dict]):
+    """Replace a spill file's contents with records (written to a temp file, then renamed)"""
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(_to_json(record)) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _from_json(record: dict) -> dict:
+    if record.get("timestamp"):
+        record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+    return record
+
+
+audit_writer = AuditWriter()
@@ -7,13 +7,16 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import false
+from sqlalchemy.orm import Session, make_transient_to_detached
 import os
 
 # Import get_db at module level to avoid runtime issues
 from database import get_db
+from config import settings
+from ttl_cache import TTLCache
 
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
@@ -29,6 +32,11 @@ pwd_context = CryptContext(
 
 # OAuth2 scheme for token extraction
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login/form")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/auth/login/form", auto_error=False)
+
+# Detached User snapshots by id - saves the user query on every authenticated request.
+# auth_routes invalidates on user changes; other instances pick them up within the TTL.
+user_cache = TTLCache(settings.USER_CACHE_TTL_SECONDS, max_entries=1024)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -75,6 +83,11 @@ async def get_current_user(
     Dependency to get the current authenticated user
     FIXED: Now properly uses FastAPI's dependency injection with direct import
     """
+    return _load_user(token, db)
+
+
+def _load_user(token: str, db: Session):
+    """Resolve a bearer token to an active User"""
     from database import User  # Import User here since it's only needed at runtime
     
     # Verify token
@@ -88,8 +101,7 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
+    user = _get_cached_user(user_id, db)
     
     if user is None:
         raise HTTPException(
@@ -107,6 +119,58 @@ async def get_current_user(
     return user
 
 
+def _get_cached_user(user_id: str, db: Session):
+    """
+    User by id, from the cache when possible. Cached hits are merged into the
+    request's session without a query, so handlers can still modify and commit them.
+    """
+    from database import User
+    
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return db.merge(cached, load=False)
+    
+    generation = user_cache.generation
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is not None:
+        snapshot = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+        make_transient_to_detached(snapshot)
+        user_cache.set(user_id, snapshot, generation)
+    return user
+
+
+def invalidate_cached_user(user_id: str):
+    """Call after committing any change to a user (role, status, password, deletion)"""
+    user_cache.invalidate(user_id)
+
+
+async def get_current_user_for_stream(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = Query(None)
+):
+    """
+    Auth for long-lived streams (SSE). EventSource cannot set headers, so the
+    token may also come from ?access_token=. Uses its own short session so the
+    stream does not hold a pooled connection open for its whole lifetime.
+    """
+    token = token or access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        user = _load_user(token, db)
+        db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+
 # ============================================================================
 # ROLE-BASED ACCESS CONTROL DEPENDENCIES
 # ============================================================================
@@ -174,9 +238,44 @@ def check_resource_access(current_user, resource_owner_id: str, allow_manager: b
     )
 
 
+def role_owner_id(current_user) -> Optional[str]:
+    """
+    Owner id the user's data access is restricted to
+    
+    Returns:
+        None for Admin/Manager (unrestricted), otherwise the user's own id
+    """
+    if current_user.role in ["Admin", "Manager"]:
+        return None
+    return current_user.id
+
+
+def scope_query_by_role(query, current_user, owner_column):
+    """
+    Apply role-based row filtering as a SQL WHERE clause
+    
+    Args:
+        current_user: The authenticated user
+        query: SQLAlchemy query to restrict
+        owner_column: Column holding the owner ID (e.g. CallEvaluation.agent_id)
+    
+    Returns:
+        The query, limited to the user's own rows unless Admin/Manager.
+        Owner columns are indexed, so an agent's request costs O(their rows).
+    """
+    owner_id = role_owner_id(current_user)
+    if owner_id is None:
+        return query
+    if current_user.role != "Agent":
+        # Unknown roles see nothing (same as filter_data_by_role)
+        return query.filter(false())
+    return query.filter(owner_column == owner_id)
+
+
 def filter_data_by_role(current_user, data_list, owner_id_field: str = "agent_id"):
     """
-    Filter data based on user role
+    Filter an already loaded list based on user role
+    Prefer scope_query_by_role so the filter runs in SQL
     
     Args:
         current_user: The authenticated user
@@ -2,7 +2,7 @@
 Authentication routes for login, registration, and user management
 Enhanced with audit logging for user management actions
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
@@ -10,13 +10,15 @@ from typing import Optional
 from datetime import datetime
 import uuid
 
+from config import settings
 from database import get_db, User
+from password_pool import hash_password_async, verify_password_async
+from rate_limit import SlidingWindowLimiter, client_ip
 from auth import (
-    verify_password, 
-    get_password_hash, 
     create_access_token,
     get_current_user,
-    get_current_active_admin
+    get_current_active_admin,
+    invalidate_cached_user
 )
 from audit_logger import (
     log_user_created,
@@ -29,6 +31,36 @@ from audit_logger import (
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
+# Every login attempt costs a bcrypt verify. Only failures are counted, per
+# (client IP, username) so one user's typos don't lock out a whole clinic
+# behind a shared NAT address, plus a looser cap per IP across usernames.
+user_failure_limiter = SlidingWindowLimiter(settings.LOGIN_FAILURES_PER_USER, settings.LOGIN_FAILURE_WINDOW_SECONDS)
+ip_failure_limiter = SlidingWindowLimiter(settings.LOGIN_FAILURES_PER_IP, settings.LOGIN_FAILURE_WINDOW_SECONDS)
+
+
+def _user_key(request: Request, username: str) -> str:
+    return f"{client_ip(request)}|{(username or '').strip().lower()}"
+
+
+def check_login_rate(request: Request, username: str):
+    """429 when this IP/username has failed too often recently - checked before any bcrypt work"""
+    retry_after = user_failure_limiter.check(_user_key(request, username)) or ip_failure_limiter.check(client_ip(request))
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, please try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def record_login_failure(request: Request, username: str):
+    user_failure_limiter.hit(_user_key(request, username))
+    ip_failure_limiter.hit(client_ip(request))
+
+
+def clear_login_failures(request: Request, username: str):
+    user_failure_limiter.reset(_user_key(request, username))
+
 
 # Pydantic models for request/response
 class UserRegister(BaseModel):
@@ -105,7 +137,7 @@ async def register(
         id=str(uuid.uuid4()),
         email=user_data.email,
         username=user_data.username,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await hash_password_async(user_data.password),
         full_name=user_data.full_name,
         role=user_data.role,
         is_active=True
@@ -127,14 +159,17 @@ async def register(
 
 
 @router.post("/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, request: Request, db: Session = Depends(get_db)):
     """
     Login endpoint - returns JWT token with user info (for frontend)
     """
+    check_login_rate(request, user_credentials.username)
+    
     # Find user by username
     user = db.query(User).filter(User.username == user_credentials.username).first()
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    if not user or not await verify_password_async(user_credentials.password, user.hashed_password):
+        record_login_failure(request, user_credentials.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -147,9 +182,12 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             detail="User account is inactive"
         )
     
+    clear_login_failures(request, user.username)
+    
     # Update last login
     user.last_login = datetime.utcnow()
     db.commit()
+    invalidate_cached_user(user.id)
     
     # ADD AUDIT LOG
     log_user_login(
@@ -169,6 +207,7 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
 
 @router.post("/login/form", response_model=OAuth2Token)
 async def login_form(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
@@ -177,10 +216,13 @@ async def login_form(
     Uses form data instead of JSON
     FIXED: Returns only access_token and token_type (OAuth2 spec compliant)
     """
+    check_login_rate(request, form_data.username)
+    
     # Find user by username
     user = db.query(User).filter(User.username == form_data.username).first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
+        record_login_failure(request, form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -193,9 +235,12 @@ async def login_form(
             detail="User account is inactive"
         )
     
+    clear_login_failures(request, user.username)
+    
     # Update last login
     user.last_login = datetime.utcnow()
     db.commit()
+    invalidate_cached_user(user.id)
     
     # ADD AUDIT LOG
     log_user_login(
@@ -271,6 +316,7 @@ async def update_user(
     
     user.updated_at = datetime.utcnow()
     db.commit()
+    invalidate_cached_user(user.id)  # Deactivation / role change applies to the next request
     
     # ADD AUDIT LOG
     if changes:
@@ -310,6 +356,7 @@ async def delete_user(
     
     db.delete(user)
     db.commit()
+    invalidate_cached_user(user_id)
     
     # ADD AUDIT LOG
     log_user_deleted(
@@ -328,17 +375,21 @@ async def change_password(
     db: Session = Depends(get_db)
 ):
     """Change current user's password"""
+    # current_user may come from the user cache - check against the stored hash
+    db.refresh(current_user)
+    
     # Verify old password
-    if not verify_password(password_data.old_password, current_user.hashed_password):
+    if not await verify_password_async(password_data.old_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect password"
         )
     
     # Update password
-    current_user.hashed_password = get_password_hash(password_data.new_password)
+    current_user.hashed_password = await hash_password_async(password_data.new_password)
     current_user.updated_at = datetime.utcnow()
     db.commit()
+    invalidate_cached_user(current_user.id)
     
     # ADD AUDIT LOG
     log_password_changed(
@@ -367,9 +418,10 @@ async def reset_user_password(
         )
     
     # Update password
-    user.hashed_password = get_password_hash(password_data.new_password)
+    user.hashed_password = await hash_password_async(password_data.new_password)
     user.updated_at = datetime.utcnow()
     db.commit()
+    invalidate_cached_user(user.id)
     
     # ADD AUDIT LOG
     log_password_reset(
@@ -0,0 +1,105 @@
+"""
+Benchmark: latency of a cheap endpoint while a burst of logins is in flight
+
+Runs a small ASGI app in-process with two login variants - bcrypt inline in the
+async handler (the old behaviour) and bcrypt on the password pool - plus a
+trivial /ping endpoint. For each mode it fires --logins concurrent logins and
+measures /ping p50/p99 while they run, next to an idle baseline.
+
+Usage:
+    python benchmark_login_storm.py [--logins 40] [--pings 200]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+# Add parent directory to path to import modules
+sys.path.append('.')
+
+from auth import get_password_hash, verify_password
+from password_pool import password_pool_stats, verify_password_async
+
+PASSWORD = "correct horse battery staple"
+HASHED = get_password_hash(PASSWORD)
+
+app = FastAPI()
+
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+
+@app.post("/login/inline")
+async def login_inline():
+    return {"ok": verify_password(PASSWORD, HASHED)}
+
+
+@app.post("/login/pool")
+async def login_pool():
+    return {"ok": await verify_password_async(PASSWORD, HASHED)}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def measure_pings(client: httpx.AsyncClient, count: int, interval: float = 0.01) -> list:
+    """
+    Pings on a fixed schedule; latency is measured from the scheduled send time,
+    so time the event loop spent blocked before the ping could go out counts too
+    """
+    latencies = []
+    start = time.perf_counter()
+    for i in range(count):
+        scheduled = start + i * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await client.get("/ping")
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+    return latencies
+
+
+async def storm(client: httpx.AsyncClient, mode: str, logins: int, pings: int):
+    async def login():
+        response = await client.post(f"/login/{mode}")
+        return response.status_code
+
+    started = time.perf_counter()
+    login_tasks = [asyncio.create_task(login()) for _ in range(logins)]
+    latencies = await measure_pings(client, pings)
+    statuses = await asyncio.gather(*login_tasks)
+    elapsed = time.perf_counter() - started
+    return latencies, statuses, elapsed
+
+
+def report(label: str, latencies: list, extra: str = ""):
+    print(f"{label:<28} p50 {statistics.median(latencies):8.1f} ms   "
+          f"p99 {percentile(latencies, 99):8.1f} ms   max {max(latencies):8.1f} ms  {extra}")
+
+
+async def main(logins: int, pings: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        report("idle", await measure_pings(client, pings))
+        for mode in ("inline", "pool"):
+            latencies, statuses, elapsed = await storm(client, mode, logins, pings)
+            rejected = sum(1 for code in statuses if code == 503)
+            report(f"{logins} logins, bcrypt {mode}", latencies,
+                   f"(logins done in {elapsed:.1f}s, {rejected} rejected)")
+    print(f"\nPassword pool: {password_pool_stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--pings", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.pings))
@@ -0,0 +1,155 @@
+"""
+Benchmark: serializing and compressing the GET /api/calls/{id} payload of a 1-hour call
+
+Compares the stock FastAPI path (jsonable_encoder + json.dumps), orjson, and the
+cached path used for completed calls, plus payload size with gzip / brotli.
+
+Usage:
+    python benchmark_serialization.py [--minutes 60] [--repeat 50]
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+
+# Add parent directory to path to import modules
+sys.path.append('.')
+
+from serialization import PayloadCache, orjson
+from compression import brotli
+
+METRICS = [
+    "enthusiasm_markers", "sounds_polite_courteous", "professional_greeting",
+    "verifies_patient_online", "patient_verification", "active_listening",
+    "handled_with_care", "asks_permission_hold", "returns_properly_from_hold",
+    "no_fillers_stammers", "recaps_time_date", "offers_further_assistance",
+    "ended_call_properly",
+]
+
+WORDS = (
+    "thank you for calling the practice this is how can I help you today let me check "
+    "the schedule for you please hold one moment sir ma'am appointment tuesday morning "
+    "insurance card date of birth is there anything else I can help you with"
+).split()
+
+
+def build_payload(minutes: int) -> dict:
+    """Same shape as GET /api/calls/{id} for a call of the given length"""
+    random.seed(42)
+    segments = []
+    t = 0.0
+    while t < minutes * 60:
+        length = random.uniform(2.0, 8.0)
+        segments.append({
+            "speaker": random.choice(["SPEAKER_00", "SPEAKER_01"]),
+            "text": " ".join(random.choices(WORDS, k=int(length * 2.5))),
+            "start": round(t, 3),
+            "end": round(t + length, 3),
+        })
+        t += length + random.uniform(0.1, 1.0)
+
+    predictions = {m: round(random.random(), 4) for m in METRICS}
+    metrics = {
+        m: {"detected": p >= 0.5, "weight": 5, "weighted_score": 5 if p >= 0.5 else 0, "confidence": p}
+        for m, p in predictions.items()
+    }
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "filename": "one_hour_call.wav",
+        "status": "completed",
+        "analysis_status": "completed",
+        "duration": f"{minutes}:00",
+        "duration_seconds": minutes * 60,
+        "agent_talk_seconds": 1800.0,
+        "caller_talk_seconds": 1500.0,
+        "agent_talk_ratio": 0.5455,
+        "score": 72.5,
+        "agent_id": "AGT-001",
+        "agent_name": "Benchmark Agent",
+        "bert_analysis": {"success": True, "predictions": predictions, "method": "segment-by-segment evaluation"},
+        "wav2vec2_analysis": {"success": True, "predictions": {"no_fillers_stammers": 0.81}},
+        "binary_scores": {"total_score": 72.5, "percentage": 72.5, "metrics": metrics},
+        "transcript": " ".join(seg["text"] for seg in segments),
+        "segments": segments,
+        "speakers": {"SPEAKER_00": "caller", "SPEAKER_01": "agent"},
+        "processing_time": 412.3,
+        "error_message": None,
+        "created_at": now.isoformat(),
+        "updated_at": now.isoformat(),
+    }
+
+
+def timed(func, repeat: int):
+    """Median wall time in milliseconds and the last result"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark call payload serialization and compression")
+    parser.add_argument("--minutes", type=int, default=60, help="Call length to simulate")
+    parser.add_argument("--repeat", type=int, default=50, help="Iterations per measurement (median is reported)")
+    args = parser.parse_args()
+
+    payload = build_payload(args.minutes)
+    print(f"Simulated {args.minutes}-minute call: {len(payload['segments'])} segments, "
+          f"{len(payload['transcript']):,} transcript characters\n")
+
+    # Stock FastAPI: jsonable_encoder + JSONResponse.render
+    def stock():
+        return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                          indent=None, separators=(",", ":")).encode("utf-8")
+
+    rows = [("jsonable_encoder + json (FastAPI default)", stock)]
+    if orjson is not None:
+        rows.append(("jsonable_encoder + orjson (ORJSONResponse)",
+                     lambda: orjson.dumps(jsonable_encoder(payload), option=orjson.OPT_NON_STR_KEYS)))
+        rows.append(("orjson only", lambda: orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)))
+    else:
+        print("orjson not installed - pip install orjson to compare\n")
+
+    cache = PayloadCache(64 * 1024 * 1024)
+    version = datetime.utcnow()
+    cache.get("call", version, lambda: payload)
+    rows.append(("cached payload (completed call)", lambda: cache.get("call", version, lambda: payload)))
+
+    print(f"{'Serialization':<45}{'median ms':>12}{'bytes':>14}")
+    body = None
+    for label, func in rows:
+        ms, body = timed(func, args.repeat)
+        print(f"{label:<45}{ms:>12.2f}{len(body):>14,}")
+
+    raw = stock()
+    print(f"\n{'Compression':<45}{'median ms':>12}{'bytes':>14}{'ratio':>8}")
+    print(f"{'identity':<45}{0:>12.2f}{len(raw):>14,}{1:>8.1f}")
+    encoders = [(f"gzip level {level}", lambda level=level: gzip.compress(raw, compresslevel=level)) for level in (1, 6)]
+    if brotli is not None:
+        encoders += [(f"brotli quality {q}", lambda q=q: brotli.compress(raw, quality=q)) for q in (4, 5, 11)]
+    else:
+        print("(brotli not installed - pip install brotli to compare)")
+    for label, func in encoders:
+        repeat = max(1, args.repeat // 10) if "11" in label else args.repeat
+        ms, compressed = timed(func, repeat)
+        print(f"{label:<45}{ms:>12.2f}{len(compressed):>14,}{len(raw) / len(compressed):>8.1f}")
+
+    if brotli is not None:
+        cache.get("call", version, lambda: payload, "br")
+        ms, _ = timed(lambda: cache.get("call", version, lambda: payload, "br"), args.repeat)
+        print(f"{'cached brotli payload (completed call)':<45}{ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
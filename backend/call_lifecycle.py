@@ -0,0 +1,37 @@
+"""
+Derived data that follows a call's state (agent stats, dashboard rollups)
+Call sync_call_aggregates() in the transaction that completes, re-scores,
+resets or deletes a call - every hook is idempotent and the caller commits.
+Cached analytics are dropped once that transaction commits.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from agent_stats import sync_call_stats
+from database import CallEvaluation
+from rollups import sync_call_rollups
+from ttl_cache import invalidate_group
+
+ANALYTICS_CACHE_GROUP = "analytics"
+
+
+def sync_call_aggregates(db: Session, call: CallEvaluation, removed: bool = False):
+    sync_call_stats(db, call, removed=removed)
+    sync_call_rollups(db, call, removed=removed)
+    mark_analytics_changed(db)
+
+
+def mark_analytics_changed(db: Session):
+    """Invalidate cached analytics when this session's transaction commits"""
+    db.info["analytics_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_analytics(session):
+    if session.info.pop("analytics_changed", False):
+        invalidate_group(ANALYTICS_CACHE_GROUP)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_analytics_flag(session):
+    session.info.pop("analytics_changed", None)
@@ -0,0 +1,193 @@
+"""
+Numeric call metrics computed once at persist time so reports can aggregate in SQL
+"""
+import json
+from typing import List, Dict, Optional
+
+from sqlalchemy import and_, case, func, update
+from sqlalchemy.orm import Session
+
+from database import CallEvaluation
+
+
+# Scorecard metrics in binary_scores["metrics"] (same order as calculate_binary_scores)
+SCORECARD_METRICS = [
+    "professional_greeting", "verifies_patient_online",
+    "patient_verification", "active_listening", "handled_with_care",
+    "asks_permission_hold", "returns_properly_from_hold", "no_fillers_stammers",
+    "recaps_time_date", "offers_further_assistance", "ended_call_properly",
+    "enthusiasm_markers", "sounds_polite_courteous"
+]
+
+# Bump whenever SCORECARD_METRICS changes - metric_mask bit positions follow its order
+SCORECARD_VERSION = 1
+
+
+# Score bands used by the dashboard and reports (lower bound inclusive, upper exclusive)
+CLASSIFICATIONS = {
+    "excellent": (90, None),
+    "good": (80, 90),
+    "needs_improvement": (None, 80),
+}
+
+
+def classification_filter(score_column, classification: str):
+    """SQL condition for a classification band, raises ValueError for unknown names"""
+    if classification not in CLASSIFICATIONS:
+        raise ValueError(f"Unknown classification: {classification}")
+    low, high = CLASSIFICATIONS[classification]
+    conditions = [score_column != None]
+    if low is not None:
+        conditions.append(score_column >= low)
+    if high is not None:
+        conditions.append(score_column < high)
+    return and_(*conditions)
+
+
+def passed_metrics(binary_scores) -> List[str]:
+    """Names of the metrics detected in a call's binary_scores (JSON string or dict)"""
+    if isinstance(binary_scores, str):
+        try:
+            binary_scores = json.loads(binary_scores)
+        except (json.JSONDecodeError, ValueError):
+            return []
+    metrics = (binary_scores or {}).get("metrics") or {}
+    return [name for name in SCORECARD_METRICS if (metrics.get(name) or {}).get("detected")]
+
+
+def metric_bit(name: str) -> int:
+    return 1 << SCORECARD_METRICS.index(name)
+
+
+def metric_mask(binary_scores) -> Optional[int]:
+    """Bitmask of detected metrics, None when the call has no scorecard yet"""
+    if isinstance(binary_scores, str):
+        try:
+            binary_scores = json.loads(binary_scores)
+        except (json.JSONDecodeError, ValueError):
+            return None
+    if not (binary_scores or {}).get("metrics"):
+        return None
+    mask = 0
+    for name in passed_metrics(binary_scores):
+        mask |= metric_bit(name)
+    return mask
+
+
+def mask_metrics(mask: Optional[int]) -> List[str]:
+    """Metric names set in a mask (inverse of metric_mask)"""
+    return [name for name in SCORECARD_METRICS if mask and mask & metric_bit(name)]
+
+
+def apply_metric_mask(call: CallEvaluation):
+    """Keep metric_mask/scorecard_version in line with call.binary_scores"""
+    call.metric_mask = metric_mask(call.binary_scores)
+    call.scorecard_version = SCORECARD_VERSION if call.metric_mask is not None else None
+
+
+def metric_pass_counts(mask_column=CallEvaluation.metric_mask) -> List:
+    """One SUM per metric (SCORECARD_METRICS order) counting rows with its bit set"""
+    return [
+        func.sum(case((mask_column.op("&")(metric_bit(name)) != 0, 1), else_=0))
+        for name in SCORECARD_METRICS
+    ]
+
+
+def backfill_metric_masks(db: Session, batch_size: int = 500):
+    """Fill metric_mask for calls scored before the column existed"""
+    calls = CallEvaluation.__table__
+    updated = 0
+    last_id = ""
+    while True:
+        rows = db.query(CallEvaluation.id, CallEvaluation.binary_scores).filter(
+            CallEvaluation.id > last_id,
+            CallEvaluation.metric_mask == None,
+            CallEvaluation.binary_scores != None
+        ).order_by(CallEvaluation.id).limit(batch_size).all()
+
+        if not rows:
+            break
+
+        for call_id, binary_scores in rows:
+            mask = metric_mask(binary_scores)
+            if mask is None:
+                continue
+            # Core update: keeps updated_at and the change feed untouched
+            db.execute(update(calls).where(calls.c.id == call_id).values(
+                metric_mask=mask, scorecard_version=SCORECARD_VERSION
+            ))
+            updated += 1
+
+        db.commit()
+        last_id = rows[-1][0]
+
+    if updated:
+        print(f"✓ Backfilled metric masks for {updated} calls")
+
+
+def compute_call_timings(segments: List[Dict], speaker_roles: Optional[Dict] = None) -> Dict:
+    """
+    Duration and talk time per role from diarized segments
+
+    Returns duration_seconds (end of the last segment, same as the "m:ss" duration),
+    agent_talk_seconds, caller_talk_seconds and agent_talk_ratio (agent share of
+    total talk time, None when nobody spoke)
+    """
+    speaker_roles = speaker_roles or {}
+
+    talk = {"agent": 0.0, "caller": 0.0}
+    for seg in segments:
+        role = speaker_roles.get(seg.get("speaker"))
+        if role in talk:
+            talk[role] += max(0.0, (seg.get("end") or 0) - (seg.get("start") or 0))
+
+    total_talk = talk["agent"] + talk["caller"]
+
+    return {
+        "duration_seconds": int(segments[-1].get("end") or 0) if segments else 0,
+        "agent_talk_seconds": round(talk["agent"], 2),
+        "caller_talk_seconds": round(talk["caller"], 2),
+        "agent_talk_ratio": round(talk["agent"] / total_talk, 4) if total_talk > 0 else None
+    }
+
+
+def format_duration(duration_seconds: int) -> str:
+    """Seconds to the legacy "m:ss" display string"""
+    minutes = duration_seconds // 60
+    seconds = duration_seconds % 60
+    return f"{minutes}:{seconds:02d}"
+
+
+def backfill_call_timings(db: Session, batch_size: int = 200):
+    """Fill the numeric timing columns for calls processed before they existed"""
+    updated = 0
+    last_id = ""
+    while True:
+        calls = db.query(CallEvaluation.id, CallEvaluation.scores, CallEvaluation.speakers).filter(
+            CallEvaluation.id > last_id,
+            CallEvaluation.duration_seconds == None,
+            CallEvaluation.scores != None
+        ).order_by(CallEvaluation.id).limit(batch_size).all()
+
+        if not calls:
+            break
+
+        for call_id, scores, speakers in calls:
+            try:
+                segments = json.loads(scores).get("segments") or []
+                roles = json.loads(speakers) if speakers else {}
+            except (json.JSONDecodeError, ValueError, TypeError, AttributeError):
+                continue
+            timings = compute_call_timings(segments, roles)
+            # Keep updated_at as-is, a backfill is not a change to the call
+            timings["updated_at"] = CallEvaluation.updated_at
+            db.query(CallEvaluation).filter(CallEvaluation.id == call_id).update(
+                timings, synchronize_session=False
+            )
+            updated += 1
+
+        db.commit()
+        last_id = calls[-1][0]
+
+    if updated:
+        print(f"✓ Backfilled duration/talk-time columns for {updated} calls")
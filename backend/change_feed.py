@@ -0,0 +1,136 @@
+"""
+Change tracking for polling clients
+- Per-table version counter (table_versions) bumped in the same transaction as
+  every insert/update/delete, used to build ETags without scanning the table
+- Tombstones (deleted_records) so ?updated_since deltas can report deleted ids
+Listeners are registered on import.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import CallEvaluation, TableVersion, DeletedRecord, SessionLocal
+
+# Models whose changes bump their table version
+TRACKED_MODELS = (CallEvaluation,)
+
+# server_time handed to delta clients lags "now" so rows committed slightly
+# after their updated_at timestamp are never skipped (clients upsert by id)
+CHANGE_FEED_OVERLAP_SECONDS = 5
+
+
+def _bump_versions(session: Session, table_names):
+    connection = session.connection()
+    for table_name in table_names:
+        connection.execute(
+            update(TableVersion.__table__)
+            .where(TableVersion.__table__.c.table_name == table_name)
+            .values(version=TableVersion.__table__.c.version + 1)
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _record_tombstones(session, flush_context, instances):
+    for obj in list(session.deleted):
+        if isinstance(obj, CallEvaluation):
+            session.add(DeletedRecord(
+                table_name=CallEvaluation.__tablename__,
+                record_id=obj.id,
+                owner_id=obj.agent_id,
+                deleted_at=datetime.utcnow()
+            ))
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_flush(session, flush_context):
+    changed = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, TRACKED_MODELS):
+            changed.add(obj.__tablename__)
+    for obj in session.dirty:
+        if isinstance(obj, TRACKED_MODELS) and session.is_modified(obj, include_collections=False):
+            changed.add(obj.__tablename__)
+    if changed:
+        _bump_versions(session, changed)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_on_bulk_statement(orm_execute_state):
+    """query.update()/query.delete() bypass the flush - catch them here"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    changed = {
+        mapper.class_.__tablename__
+        for mapper in orm_execute_state.all_mappers
+        if issubclass(mapper.class_, TRACKED_MODELS)
+    }
+    if changed:
+        _bump_versions(orm_execute_state.session, changed)
+
+
+def ensure_table_versions():
+    """Create the counter rows once - call in startup after create_tables()"""
+    db = SessionLocal()
+    try:
+        for model in TRACKED_MODELS:
+            if db.get(TableVersion, model.__tablename__) is None:
+                db.add(TableVersion(table_name=model.__tablename__, version=0))
+        db.commit()
+    finally:
+        db.close()
+
+
+def get_table_version(db: Session, table_name: str) -> int:
+    """Current change counter for a table (single primary-key lookup)"""
+    row = db.get(TableVersion, table_name, populate_existing=True)
+    return row.version if row else 0
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the table version plus everything that shapes the response"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    # Weak comparison - compressed responses carry W/ versions of the same tag
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags or if_none_match.strip() == "*"
+
+
+def deleted_since(db: Session, table_name: str, since: datetime, owner_id: Optional[str] = None) -> List[str]:
+    """Ids deleted from a table since a point in time (optionally for one owner)"""
+    query = db.query(DeletedRecord.record_id).filter(
+        DeletedRecord.table_name == table_name,
+        DeletedRecord.deleted_at >= since
+    )
+    if owner_id is not None:
+        query = query.filter(DeletedRecord.owner_id == owner_id)
+    return [row[0] for row in query.all()]
+
+
+def tombstone_horizon() -> datetime:
+    """Oldest updated_since we can still answer correctly"""
+    return datetime.utcnow() - timedelta(days=settings.CHANGE_FEED_TOMBSTONE_DAYS)
+
+
+def prune_tombstones():
+    """Maintenance job: drop tombstones older than CHANGE_FEED_TOMBSTONE_DAYS"""
+    db = SessionLocal()
+    try:
+        removed = db.query(DeletedRecord).filter(
+            DeletedRecord.deleted_at < tombstone_horizon()
+        ).delete(synchronize_session=False)
+        db.commit()
+        if removed:
+            print(f"✓ Pruned {removed} change-feed tombstones")
+    finally:
+        db.close()
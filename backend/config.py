@@ -24,9 +24,78 @@ class Settings(BaseSettings):
     # File upload settings - FIXED: No filesystem I/O at module level
     UPLOAD_DIR: str = "/data/uploads"  # Default, will be overridden if needed
     MAX_FILE_SIZE: int = 100 * 1024 * 1024  # 100MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Uploads are copied/hashed in chunks of this size
+    BULK_UPLOAD_MAX_FILES: int = 200  # Recordings per /api/upload/bulk request (loose files or zip entries)
+    BULK_UPLOAD_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # Whole bulk request body / extracted zip total
+    BULK_PROCESS_CONCURRENCY: int = 4  # Bulk-uploaded calls processed at once (per API instance)
+    RESUMABLE_CHECKPOINT_BYTES: int = 8 * 1024 * 1024  # fsync + persist the offset this often within a PATCH
+    RESUMABLE_UPLOAD_EXPIRY_HOURS: float = 24  # Untouched partial uploads are garbage-collected after this
+    RESUMABLE_GC_INTERVAL_MINUTES: float = 60
+    
+    # Generated report files (CSV/XLSX/PDF)
+    REPORTS_DIR: str = "/data/reports"
+    REPORT_CACHE_MAX_MB: int = 1024  # Disk budget for cached report files (LRU eviction)
+    REPORT_CACHE_MAX_ENTRIES: int = 500
     
     # Database - FIXED: No filesystem I/O at module level  
     DATABASE_URL: str = "sqlite:////data/calleval.db"  # Default, will be overridden if needed
+
+    # Connection pool (PostgreSQL) - each API instance holds up to
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW connections, keep this below max_connections / instances
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+
+    # Retention enforcement (Settings.retention_period is in months)
+    RETENTION_INTERVAL_HOURS: float = 24
+    RETENTION_BATCH_SIZE: int = 100  # Calls deleted per short write transaction
+    RETENTION_BATCH_PAUSE_SECONDS: float = 0.5  # Throttle between batches
+    RETENTION_ARCHIVE_DIR: Optional[str] = None  # Move audio here instead of deleting
+    MAINTENANCE_LEASE_SECONDS: int = 300  # Job lease, renewed while the job runs (one instance at a time)
+    
+    # Audit log writer - log_action() buffers in memory, a background thread bulk-inserts
+    AUDIT_DIR: str = "/data/audit"  # Overflow spill file and archived monthly segments
+    AUDIT_FLUSH_INTERVAL_MS: int = 500
+    AUDIT_FLUSH_BATCH_SIZE: int = 200  # Flush early once this many records are waiting
+    AUDIT_BUFFER_MAX_RECORDS: int = 10000
+    AUDIT_OVERFLOW_POLICY: str = "spill"  # Full buffer / failed flush: "spill" to AUDIT_DIR or "drop"
+    AUDIT_RETRY_MAX_SECONDS: float = 60  # Longest back-off between writes while the database is failing
+    AUDIT_HOT_DAYS: int = 90  # Older whole months move to compressed segments in AUDIT_DIR/archive
+    AUDIT_ARCHIVE_INTERVAL_HOURS: float = 24
+    
+    # Change feed (GET /api/calls?updated_since=) - deleted ids are kept this long
+    CHANGE_FEED_TOMBSTONE_DAYS: int = 7
+    
+    # Agent statistics
+    AGENT_RECENT_SCORES_WINDOW: int = 20  # Last-N scores kept per agent
+    AGENT_STATS_RECONCILE_HOURS: int = 6
+    
+    # Dashboard analytics (leaderboard, high-impact calls) in-process cache
+    ANALYTICS_CACHE_TTL_SECONDS: int = 30
+    
+    # Response compression / serialization
+    COMPRESSION_MIN_SIZE: int = 1024  # Bytes - smaller bodies are sent as-is
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 5  # 0-11, higher is smaller but much slower
+    PAYLOAD_CACHE_MAX_MB: int = 64  # Serialized payloads of completed calls kept in memory
+    
+    # Authenticated user lookups cached per instance (bounds how long a
+    # deactivation/role change takes to reach other instances)
+    USER_CACHE_TTL_SECONDS: int = 30
+    
+    # Password hashing pool (bcrypt runs off the event loop) and login throttling
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32  # Queued + running; more gets 503 + Retry-After
+    # Only failed logins count (clinics share NAT addresses, so a shift start is many good logins from one IP)
+    LOGIN_FAILURES_PER_USER: int = 5  # Per (client IP, username) per window
+    LOGIN_FAILURES_PER_IP: int = 50  # All usernames from one client IP per window
+    LOGIN_FAILURE_WINDOW_SECONDS: int = 300
+    
+    # Event-loop lag monitor (toggle at runtime with PUT /api/system/loop-monitor)
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: int = 200
+    LOOP_LAG_THRESHOLD_MS: int = 250  # Longer stalls are logged with the blocking stack
     
     # JWT Authentication
     JWT_SECRET_KEY: str = "your-secret-key-change-this-in-production"
@@ -40,7 +109,11 @@ class Settings(BaseSettings):
         Only performs filesystem checks when actually instantiated, not on import.
         """
         super().__init__(**kwargs)
-        
+
+        # Render/Heroku hand out "postgres://" URLs, SQLAlchemy only accepts "postgresql://"
+        if self.DATABASE_URL.startswith("postgres://"):
+            self.DATABASE_URL = "postgresql://" + self.DATABASE_URL[len("postgres://"):]
+
         # Only check filesystem if no explicit env vars are set
         if "UPLOAD_DIR" not in os.environ:
             # Dynamically determine upload directory at runtime
@@ -49,6 +122,12 @@ class Settings(BaseSettings):
             else:
                 self.UPLOAD_DIR = "/tmp/uploads"
         
+        if "REPORTS_DIR" not in os.environ:
+            self.REPORTS_DIR = "/data/reports" if os.path.exists("/data") else "/tmp/reports"
+        
+        if "AUDIT_DIR" not in os.environ:
+            self.AUDIT_DIR = "/data/audit" if os.path.exists("/data") else "/tmp/audit"
+        
         if "DATABASE_URL" not in os.environ:
             # Dynamically determine database path at runtime
             if os.path.exists("/data"):
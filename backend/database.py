@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, String, Float, DateTime, Text, Integer, Boolean
+from sqlalchemy import create_engine, inspect, text, Column, String, Float, DateTime, Text, Integer, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
@@ -6,17 +6,34 @@ from datetime import datetime
 from config import settings
 
 # Create engine
-# Create engine with INCREASED CONNECTION POOL for bulk uploads
-engine = create_engine(
-    settings.DATABASE_URL, 
-    connect_args={"check_same_thread": False},
-    poolclass=QueuePool,
-    pool_size=20,  # Increased from default 5 to handle 19+ concurrent uploads
-    max_overflow=30,  # Increased from default 10
-    pool_timeout=60,  # Increased timeout from default 30
-    pool_pre_ping=True,  # Verify connections before using them
-    pool_recycle=3600  # Recycle connections after 1 hour
-)
+# SQLite (single Render disk) and PostgreSQL (horizontally scaled API) need different settings
+IS_SQLITE = settings.DATABASE_URL.startswith("sqlite")
+
+if IS_SQLITE:
+    # Create engine with INCREASED CONNECTION POOL for bulk uploads
+    engine = create_engine(
+        settings.DATABASE_URL, 
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=20,  # Increased from default 5 to handle 19+ concurrent uploads
+        max_overflow=30,  # Increased from default 10
+        pool_timeout=60,  # Increased timeout from default 30
+        pool_pre_ping=True,  # Verify connections before using them
+        pool_recycle=3600  # Recycle connections after 1 hour
+    )
+else:
+    # PostgreSQL: every API instance gets its own pool, so keep it small and
+    # recycle before the server/proxy idle timeout kills connections
+    engine = create_engine(
+        settings.DATABASE_URL,
+        poolclass=QueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_use_lifo=True  # Reuse hot connections so idle ones can be recycled
+    )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -64,6 +81,11 @@ class Agent(Base):
     avgScore = Column(Float, default=0.0)
     callsHandled = Column(Integer, default=0)
     
+    # Running aggregates maintained incrementally (see agent_stats.py)
+    score_sum = Column(Float, default=0.0, nullable=False, server_default="0")
+    score_sq_sum = Column(Float, default=0.0, nullable=False, server_default="0")
+    recent_scores = Column(Text, nullable=True)  # JSON [[call_id, score], ...] oldest first
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -76,6 +98,9 @@ class CallEvaluation(Base):
     id = Column(String, primary_key=True)
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
+    file_size = Column(Integer, nullable=True)  # Bytes as uploaded
+    file_sha256 = Column(String(64), nullable=True)  # Hex digest of the uploaded file
+    batch_id = Column(String, nullable=True, index=True)  # UploadBatch this call arrived in
     status = Column(String, default="pending")
     analysis_status = Column(String, default="pending")
     
@@ -85,13 +110,27 @@ class CallEvaluation(Base):
     
     # Results
     transcript = Column(Text, nullable=True)
-    duration = Column(String, nullable=True)
+    duration = Column(String, nullable=True)  # "m:ss" for display
     score = Column(Float, nullable=True)
     
+    # What this call currently contributes to its agent's running stats
+    stats_agent_id = Column(String, nullable=True)
+    stats_score = Column(Float, nullable=True)
+    rollup_state = Column(Text, nullable=True)  # JSON contribution to the rollup tables
+    
+    # Numeric timing (computed at persist time, aggregate these in SQL)
+    duration_seconds = Column(Integer, nullable=True)
+    agent_talk_seconds = Column(Float, nullable=True)
+    caller_talk_seconds = Column(Float, nullable=True)
+    agent_talk_ratio = Column(Float, nullable=True)  # agent talk / (agent + caller talk)
+    
     # Modal AI Model Results
     bert_analysis = Column(Text, nullable=True)
     wav2vec2_analysis = Column(Text, nullable=True)
     binary_scores = Column(Text, nullable=True)
+    # Detected metrics as bits (bit i = SCORECARD_METRICS[i], see call_metrics.py) for SQL aggregation
+    metric_mask = Column(Integer, nullable=True)
+    scorecard_version = Column(Integer, nullable=True)  # Bit layout the mask was written with
 
     # Processing metadata
     processing_time = Column(Float, nullable=True)
@@ -104,6 +143,139 @@ class CallEvaluation(Base):
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Keyset pagination indexes: (created_at, id) newest-first, optionally per agent/status
+    __table_args__ = (
+        Index("ix_call_evaluations_created_id", "created_at", "id"),
+        Index("ix_call_evaluations_agent_created_id", "agent_id", "created_at", "id"),
+        Index("ix_call_evaluations_status_created_id", "status", "created_at", "id"),
+        Index("ix_call_evaluations_updated_at", "updated_at"),  # ?updated_since change feed
+        # Covers metric breakdowns (status/date/agent/score slices) without touching the table
+        Index("ix_call_evaluations_metric_slice", "status", "created_at", "agent_id", "score",
+              "scorecard_version", "metric_mask"),
+    )
+
+
+class UploadBatch(Base):
+    """One bulk upload - progress is aggregated from its calls (CallEvaluation.batch_id)"""
+    __tablename__ = "upload_batches"
+    
+    id = Column(String, primary_key=True)
+    source = Column(String, nullable=False)  # files or zip
+    file_count = Column(Integer, nullable=False, default=0)
+    total_bytes = Column(Integer, nullable=False, default=0)
+    created_by = Column(String, nullable=True)  # User id
+    created_by_name = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadSession(Base):
+    """Resumable (tus-style) upload - the call row is only created once the file is complete and verified"""
+    __tablename__ = "upload_sessions"
+    
+    id = Column(String, primary_key=True)
+    call_id = Column(String, nullable=False)  # Reserved at creation, used for the file name and the call
+    filename = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)  # Chunks are written here directly
+    agent_id = Column(String, nullable=False)
+    upload_length = Column(Integer, nullable=False)
+    upload_offset = Column(Integer, nullable=False, default=0)  # Bytes fsynced to file_path
+    expected_sha256 = Column(String(64), nullable=False)
+    audio_format = Column(String, nullable=True)  # Sniffed once the first bytes arrive
+    status = Column(String, default="uploading")  # uploading, completed, failed
+    error_message = Column(Text, nullable=True)
+    created_by = Column(String, nullable=True)  # User id
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # GC age
+
+
+class CallSegment(Base):
+    """Censored transcript segments, one row per segment - source for full-text search"""
+    __tablename__ = "call_segments"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    call_id = Column(String, nullable=False, index=True)
+    segment_index = Column(Integer, nullable=False)
+    speaker = Column(String, nullable=True)  # Raw diarization label, e.g. SPEAKER_00
+    speaker_role = Column(String, nullable=True)  # agent, caller or unknown
+    start = Column(Float, nullable=True)
+    end = Column(Float, nullable=True)
+    text = Column(Text, nullable=False)
+
+
+class TableVersion(Base):
+    """Per-table change counter, bumped in the same transaction as every change (ETags)"""
+    __tablename__ = "table_versions"
+    
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class JobLease(Base):
+    """Maintenance job lease - only the instance holding an unexpired lease runs the job"""
+    __tablename__ = "job_leases"
+    
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)  # Token of the run holding it
+    expires_at = Column(DateTime, nullable=False)
+
+
+class DeletedRecord(Base):
+    """Tombstones so polling clients can drop deleted rows (?updated_since)"""
+    __tablename__ = "deleted_records"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String, nullable=False)
+    record_id = Column(String, nullable=False)
+    owner_id = Column(String, nullable=True)  # agent_id of a deleted call, for role filtering
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_deleted_records_table_deleted", "table_name", "deleted_at"),
+    )
+
+
+class RollupColumns:
+    """Per-agent time bucket aggregates shared by the daily and hourly rollups"""
+    bucket_start = Column(DateTime, primary_key=True)  # UTC, truncated to the bucket
+    agent_id = Column(String, primary_key=True)  # "" for calls without an agent
+    
+    call_count = Column(Integer, default=0, nullable=False)
+    score_sum = Column(Float, default=0.0, nullable=False)
+    duration_sum = Column(Integer, default=0, nullable=False)  # seconds
+    
+    # Completed calls that passed each scorecard metric
+    pass_professional_greeting = Column(Integer, default=0, nullable=False)
+    pass_verifies_patient_online = Column(Integer, default=0, nullable=False)
+    pass_patient_verification = Column(Integer, default=0, nullable=False)
+    pass_active_listening = Column(Integer, default=0, nullable=False)
+    pass_handled_with_care = Column(Integer, default=0, nullable=False)
+    pass_asks_permission_hold = Column(Integer, default=0, nullable=False)
+    pass_returns_properly_from_hold = Column(Integer, default=0, nullable=False)
+    pass_no_fillers_stammers = Column(Integer, default=0, nullable=False)
+    pass_recaps_time_date = Column(Integer, default=0, nullable=False)
+    pass_offers_further_assistance = Column(Integer, default=0, nullable=False)
+    pass_ended_call_properly = Column(Integer, default=0, nullable=False)
+    pass_enthusiasm_markers = Column(Integer, default=0, nullable=False)
+    pass_sounds_polite_courteous = Column(Integer, default=0, nullable=False)
+
+
+class DailyRollup(RollupColumns, Base):
+    """Completed-call aggregates per agent per UTC day (see rollups.py)"""
+    __tablename__ = "rollup_daily"
+    
+    __table_args__ = (
+        Index("ix_rollup_daily_agent_bucket", "agent_id", "bucket_start"),
+    )
+
+
+class HourlyRollup(RollupColumns, Base):
+    """Completed-call aggregates per agent per UTC hour (see rollups.py)"""
+    __tablename__ = "rollup_hourly"
+    
+    __table_args__ = (
+        Index("ix_rollup_hourly_agent_bucket", "agent_id", "bucket_start"),
+    )
 
 
 class Report(Base):
@@ -113,7 +285,8 @@ class Report(Base):
     id = Column(String, primary_key=True)
     type = Column(String, nullable=False)  # weekly, monthly, custom
     format = Column(String, nullable=False)  # csv, xlsx, pdf
-    status = Column(String, default="completed")  # completed, failed
+    status = Column(String, default="completed")  # generating, completed, failed
+    error_message = Column(Text, nullable=True)
     
     # Filters applied
     agent_id = Column(String, nullable=True)
@@ -130,9 +303,36 @@ class Report(Base):
     
     # File info (if you want to store the files)
     file_path = Column(String, nullable=True)
+    cache_hit = Column(Boolean, default=False)  # Served from report_cache without regenerating
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_reports_created_id", "created_at", "id"),
+        Index("ix_reports_agent_created_id", "agent_id", "created_at", "id"),
+    )
+
+
+class ReportCacheEntry(Base):
+    """Generated report file + aggregates, reused while the underlying calls are unchanged"""
+    __tablename__ = "report_cache"
+    
+    cache_key = Column(String, primary_key=True)  # sha1 of the normalized filters + format
+    filter_key = Column(String, nullable=False)  # Same filters without the format (shared aggregates)
+    data_version = Column(String, nullable=False)  # Fingerprint of the calls in range when generated
+    format = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    file_size = Column(Integer, default=0)
+    summary = Column(Text, nullable=False)  # JSON from compute_report_summary
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_report_cache_filter_key", "filter_key"),
+        Index("ix_report_cache_last_used", "last_used_at"),
+    )
 
 
 class Settings(Base):
@@ -167,6 +367,13 @@ class AuditLog(Base):
     # Timestamp
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     
+    __table_args__ = (
+        Index("ix_audit_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_audit_logs_type_action_timestamp", "resource_type", "action", "timestamp"),
+        Index("ix_audit_logs_user_timestamp", "user", "timestamp"),
+        Index("ix_audit_logs_resource_timestamp", "resource_id", "timestamp"),
+    )
+    
     def to_dict(self):
         """Convert to dictionary for API response"""
         return {
@@ -190,11 +397,46 @@ class AuditLog(Base):
 # Flag to ensure tables are created only once
 _tables_created = False
 
+def upgrade_schema():
+    """
+    Add columns and indexes introduced after a table was first created.
+    create_all() only creates missing tables, existing databases need this.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            
+            existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'
+                if column.server_default is not None:
+                    # Existing rows get the default (required for NOT NULL columns)
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                conn.execute(text(ddl))
+                print(f"✓ Added column {table.name}.{column.name}")
+            
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=conn, checkfirst=True)
+                    print(f"✓ Created index {index.name}")
+
+
 def create_tables():
     """Create database tables - call this once in startup event"""
     global _tables_created
     if not _tables_created:
         Base.metadata.create_all(bind=engine)
+        upgrade_schema()
         _tables_created = True
         print("✓ Database tables created/verified")
 
@@ -205,4 +447,43 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def claim_call(db, call_id: str):
+    """
+    Atomically claim a queued call for the processing pipeline.
+    Returns the call (now "transcribing") or None if it is missing, cancelled
+    or already claimed by another worker/instance.
+
+    - PostgreSQL: SELECT ... FOR UPDATE SKIP LOCKED, so concurrent claimers never block
+    - SQLite: conditional UPDATE (compare-and-set), the database lock serializes writers
+    """
+    claimable = (
+        CallEvaluation.id == call_id,
+        CallEvaluation.analysis_status == "queued",
+        CallEvaluation.status != "cancelled"
+    )
+    
+    if IS_SQLITE:
+        claimed = db.query(CallEvaluation).filter(*claimable).update(
+            {
+                "status": "transcribing",
+                "analysis_status": "transcribing",
+                "updated_at": datetime.utcnow()
+            },
+            synchronize_session=False
+        )
+        db.commit()
+        if not claimed:
+            return None
+        return db.query(CallEvaluation).filter(CallEvaluation.id == call_id).first()
+    
+    call = db.query(CallEvaluation).filter(*claimable).with_for_update(skip_locked=True).first()
+    if not call:
+        db.rollback()
+        return None
+    
+    call.status = "transcribing"
+    call.analysis_status = "transcribing"
+    db.commit()
+    return call
@@ -0,0 +1,92 @@
+"""
+In-process pub/sub for live call-processing events (Server-Sent Events)
+process_call publishes from worker threads, SSE handlers consume on the event loop
+"""
+import asyncio
+import itertools
+import json
+import threading
+from datetime import datetime
+from typing import Optional
+
+# Slow clients lose their oldest events instead of growing memory
+SUBSCRIBER_QUEUE_SIZE = 200
+
+
+class Subscription:
+    """One connected SSE client"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, agent_id: Optional[str]):
+        self.loop = loop
+        self.agent_id = agent_id  # None = receives every call's events
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, event: dict):
+        """Runs on the subscriber's loop - drop the oldest event when full"""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class CallEventBroker:
+    """Fan-out of call events to SSE subscribers, with per-agent filtering"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, agent_id: Optional[str] = None) -> Subscription:
+        """Must be called from the event loop that will consume the events"""
+        subscription = Subscription(asyncio.get_running_loop(), agent_id)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event: dict):
+        """Thread-safe - callable from background tasks and from the loop"""
+        event = {"id": next(self._ids), **event}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.agent_id is not None and subscription.agent_id != event.get("agent_id"):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Loop already closed - client is gone
+                self.unsubscribe(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+call_events = CallEventBroker()
+
+
+def publish_call_event(call, event_type: str = "status", **extra):
+    """
+    Publish a call's current state.
+    event_type: status (queued/transcribing/analyzing/cancelled), progress,
+    completed or failed; extra keys (progress, score, metrics, error) are merged in
+    """
+    call_events.publish({
+        "type": event_type,
+        "call_id": call.id,
+        "agent_id": call.agent_id,
+        "filename": call.filename,
+        "status": call.status,
+        "analysis_status": call.analysis_status,
+        "timestamp": datetime.utcnow().isoformat(),
+        **extra
+    })
+
+
+def format_sse(event: dict) -> str:
+    """Serialize one event in text/event-stream format"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
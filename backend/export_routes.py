@@ -0,0 +1,205 @@
+"""
+Bulk exports (CSV / NDJSON)
+- Calls for BI tools: every scorecard metric gets its own column, and each row
+  carries a cursor; pass the last one received to resume a download
+- Audit logs for compliance, across the table and the archived segments
+Rows are streamed straight from a server-side cursor (yield_per), so the
+response size does not depend on memory, even for millions of rows.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from audit_archive import ARCHIVED_COLUMNS, audit_filters, iter_audit_logs
+from audit_logger import log_audit_logs_exported, log_calls_exported
+from auth import get_current_active_admin, get_current_user, scope_query_by_role
+from call_metrics import SCORECARD_METRICS
+from database import get_db, CallEvaluation, SessionLocal
+from pagination import apply_call_filters, decode_cursor, encode_cursor
+from serialization import dumps
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Rows fetched per round trip, and rows written per chunk sent to the client
+EXPORT_FETCH_SIZE = 2000
+EXPORT_CHUNK_ROWS = 500
+
+EXPORT_COLUMNS = [
+    CallEvaluation.id, CallEvaluation.created_at, CallEvaluation.updated_at,
+    CallEvaluation.agent_id, CallEvaluation.agent_name, CallEvaluation.filename,
+    CallEvaluation.status, CallEvaluation.analysis_status, CallEvaluation.score,
+    CallEvaluation.duration_seconds, CallEvaluation.agent_talk_seconds,
+    CallEvaluation.caller_talk_seconds, CallEvaluation.agent_talk_ratio,
+    CallEvaluation.binary_scores,
+]
+
+FIELD_NAMES = [column.key for column in EXPORT_COLUMNS[:-1]] + SCORECARD_METRICS + ["cursor"]
+
+
+def _metric_flags(binary_scores: Optional[str]) -> dict:
+    """metric -> 1/0, or None for every metric when the call was not scored"""
+    try:
+        metrics = (json.loads(binary_scores) or {}).get("metrics") if binary_scores else None
+    except (json.JSONDecodeError, ValueError, AttributeError):
+        metrics = None
+    if not metrics:
+        return dict.fromkeys(SCORECARD_METRICS)
+    return {name: 1 if (metrics.get(name) or {}).get("detected") else 0 for name in SCORECARD_METRICS}
+
+
+def _export_record(row) -> dict:
+    record = dict(zip(FIELD_NAMES, row[:-1]))
+    record["created_at"] = row.created_at.isoformat() if row.created_at else None
+    record["updated_at"] = row.updated_at.isoformat() if row.updated_at else None
+    record.update(_metric_flags(row.binary_scores))
+    record["cursor"] = encode_cursor(row.created_at, row.id)
+    return record
+
+
+def _csv_chunk(records: list, fieldnames: list, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue()
+
+
+def _encode_chunk(records: list, export_format: str, fieldnames: list) -> bytes:
+    if export_format == "csv":
+        return _csv_chunk(records, fieldnames).encode()
+    return b"".join(dumps(record) + b"\n" for record in records)
+
+
+def _stream_records(records: Iterator[dict], export_format: str, fieldnames: list) -> Iterator[bytes]:
+    """Encode records in EXPORT_CHUNK_ROWS chunks (Starlette runs this in its threadpool)"""
+    if export_format == "csv":
+        yield _csv_chunk([], fieldnames, header=True).encode()
+
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield _encode_chunk(chunk, export_format, fieldnames)
+            chunk = []
+    if chunk:
+        yield _encode_chunk(chunk, export_format, fieldnames)
+
+
+def _iter_call_records(query) -> Iterator[dict]:
+    """
+    Runs on its own session, so the request's session is not held for the
+    length of the download
+    """
+    db = SessionLocal()
+    try:
+        for row in query.with_session(db).yield_per(EXPORT_FETCH_SIZE):
+            yield _export_record(row)
+    finally:
+        db.close()
+
+
+def _export_response(records: Iterator[dict], export_format: str, fieldnames: list, name: str) -> StreamingResponse:
+    filename = f"{name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return StreamingResponse(
+        _stream_records(records, export_format, fieldnames),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+def _check_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+
+@router.get("/calls")
+async def export_calls(
+    format: str = "csv",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    agent_id: Optional[str] = None,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream calls oldest first, one row per call with a column per scorecard metric
+
+    Query params:
+    - format: "csv" (default) or "ndjson"
+    - date_from, date_to, agent_id, status: Filters
+    - cursor: Resume after the row carrying this cursor (last "cursor" value received)
+
+    Metric columns are 1 (detected), 0 (not detected) or empty for unscored calls.
+    Agents only export their own calls.
+    """
+    _check_format(format)
+
+    query = scope_query_by_role(db.query(*EXPORT_COLUMNS), current_user, CallEvaluation.agent_id)
+    query = apply_call_filters(query, status, agent_id, date_from, date_to)
+
+    if cursor:
+        cursor_time, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            CallEvaluation.created_at > cursor_time,
+            and_(CallEvaluation.created_at == cursor_time, CallEvaluation.id > cursor_id)
+        ))
+    query = query.order_by(CallEvaluation.created_at, CallEvaluation.id)
+
+    log_calls_exported(
+        export_format=format,
+        filters={"date_from": date_from, "date_to": date_to, "agent_id": agent_id,
+                 "status": status, "resumed": bool(cursor)},
+        user=current_user.full_name or current_user.username,
+        role=current_user.role
+    )
+
+    return _export_response(_iter_call_records(query), format, FIELD_NAMES, "calls_export")
+
+
+@router.get("/audit-logs")
+async def export_audit_logs(
+    format: str = "csv",
+    resource_type: Optional[str] = None,
+    action: Optional[str] = None,
+    user: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    q: Optional[str] = None,
+    current_user = Depends(get_current_active_admin)
+):
+    """
+    Stream every matching audit log (newest first), hot table and archive - Admin only
+
+    Same filters as GET /api/audit-logs; includes details, IP address and user agent.
+    """
+    _check_format(format)
+    filters = audit_filters(resource_type, action, user, resource_id, status, date_from, date_to, q)
+
+    log_audit_logs_exported(
+        export_format=format,
+        filters=filters,
+        user=current_user.full_name or current_user.username,
+        role=current_user.role
+    )
+    return _export_response(iter_audit_logs(filters), format, list(ARCHIVED_COLUMNS), "audit_logs_export")
@@ -19,6 +19,8 @@ def initialize_persistent_storage():
         # Create necessary subdirectories
         directories = [
             "/data/uploads",  # Audio files
+            "/data/reports",  # Generated reports
+            "/data/audit",  # Audit overflow spill
             "/data"  # Database will be here
         ]
         
@@ -40,6 +42,18 @@ def initialize_persistent_storage():
     except Exception as e:
         print(f"❌ Error creating upload directory: {e}")
     
+    try:
+        os.makedirs(settings.REPORTS_DIR, exist_ok=True)
+        print(f"✓ Reports directory ready: {settings.REPORTS_DIR}")
+    except Exception as e:
+        print(f"❌ Error creating reports directory: {e}")
+    
+    try:
+        os.makedirs(settings.AUDIT_DIR, exist_ok=True)
+        print(f"✓ Audit directory ready: {settings.AUDIT_DIR}")
+    except Exception as e:
+        print(f"❌ Error creating audit directory: {e}")
+    
     print(f"✓ Using database at: {settings.DATABASE_URL}")
     print("✅ Storage initialization complete!\n")
 
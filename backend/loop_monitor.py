@@ -0,0 +1,182 @@
+"""
+Event-loop lag monitor
+- A tick task sleeps LOOP_MONITOR_INTERVAL_MS and records how late it woke up
+  (the event-loop lag); recent samples are summarised by stats()
+- A watchdog thread notices when the tick is overdue by more than
+  LOOP_LAG_THRESHOLD_MS while the loop is still blocked, and captures the
+  loop thread's stack plus the route of the request running at that moment
+- LoopMonitorMiddleware remembers which request each task is serving (one
+  dict write per request)
+Idle cost is a few wakeups per second. It can be switched on and off at
+runtime (PUT /api/system/loop-monitor).
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from config import settings
+
+# Lag samples kept for the percentiles and captured stalls kept for the API
+LAG_SAMPLES = 600
+RECENT_STALLS = 20
+
+# Innermost stack frames kept per stall
+STACK_DEPTH = 25
+
+
+class LoopMonitor:
+    def __init__(self):
+        self.enabled = False
+        self.threshold_ms = settings.LOOP_LAG_THRESHOLD_MS
+        self.interval = settings.LOOP_MONITOR_INTERVAL_MS / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._captured_heartbeat = None
+        self._captured_stall = None  # Entry the watchdog recorded, its lag_ms is finalised by _tick
+        self._samples = deque(maxlen=LAG_SAMPLES)
+        self._stalls = deque(maxlen=RECENT_STALLS)
+        self._lock = threading.Lock()
+        self.stall_count = 0
+        self.max_lag_ms = 0.0
+        self.task_scopes = weakref.WeakKeyDictionary()  # asyncio.Task -> ASGI scope
+
+    def start(self):
+        """Start monitoring the running loop - call from the loop (startup event)"""
+        if self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop = threading.Event()  # Fresh event: a previous watchdog keeps its own (set) one
+        self.enabled = True
+        self._task = self._loop.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, args=(self._stop,), name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        print(f"✓ Event-loop monitor started (threshold {self.threshold_ms} ms)")
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.task_scopes.clear()
+        print("✓ Event-loop monitor stopped")
+
+    async def _tick(self):
+        loop = asyncio.get_running_loop()
+        while self.enabled:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - started - self.interval) * 1000)
+            self._heartbeat = time.monotonic()
+            with self._lock:
+                self._samples.append(lag_ms)
+                self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if self._captured_heartbeat is not None:
+                # The watchdog saw this stall while it was still going - record how long it really lasted
+                stall = self._captured_stall
+                if stall is not None:
+                    with self._lock:
+                        stall["lag_ms"] = round(max(stall["lag_ms"], lag_ms), 1)
+                    print(f"⚠️ Event loop stall in {stall['route'] or 'unknown'} lasted {stall['lag_ms']} ms")
+            elif lag_ms >= self.threshold_ms:
+                # Stall shorter than the watchdog period - no stack, but still counted
+                self._record_stall(lag_ms, None, None)
+            self._captured_heartbeat = None
+            self._captured_stall = None
+
+    def _watch(self, stop: threading.Event):
+        while not stop.wait(max(0.01, self.threshold_ms / 2000)):
+            overdue_ms = (time.monotonic() - self._heartbeat - self.interval) * 1000
+            if overdue_ms < self.threshold_ms or self._captured_heartbeat == self._heartbeat:
+                continue
+            self._captured_heartbeat = self._heartbeat  # One capture per stall
+            self._captured_stall = self._record_stall(overdue_ms, *self._capture())
+
+    def _capture(self):
+        """Stack of the loop thread and the route of the task that is running on it"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame)[-STACK_DEPTH:] if frame else []
+        route = None
+        task = asyncio.current_task(self._loop)
+        scope = self.task_scopes.get(task) if task else None
+        if scope:
+            endpoint = scope.get("endpoint")
+            route = f"{scope.get('method', '')} {scope.get('path', '')}".strip()
+            if endpoint is not None:
+                route += f" ({getattr(endpoint, '__name__', endpoint)})"
+        elif task is not None:
+            route = f"task {task.get_name()}"
+        return route, stack
+
+    def _record_stall(self, lag_ms: float, route: Optional[str], stack: Optional[list]):
+        stall = {
+            "at": datetime.utcnow().isoformat(),
+            "lag_ms": round(lag_ms, 1),
+            "route": route,
+            "stack": [line.rstrip() for line in stack] if stack else None,
+        }
+        with self._lock:
+            self.stall_count += 1
+            self._stalls.append(stall)
+        print(f"⚠️ Event loop blocked for {stall['lag_ms']} ms+ in {route or 'unknown'}")
+        if stack:
+            print("".join(stack).rstrip())
+        return stall
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            last = self._samples[-1] if self._samples else None
+
+        def percentile(pct):
+            return round(samples[min(len(samples) - 1, int(len(samples) * pct / 100))], 1) if samples else None
+
+        return {
+            "enabled": self.enabled,
+            "interval_ms": round(self.interval * 1000),
+            "threshold_ms": self.threshold_ms,
+            "lag_ms": round(last, 1) if last is not None else None,
+            "lag_p50_ms": percentile(50),
+            "lag_p99_ms": percentile(99),
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "stalls": self.stall_count,
+        }
+
+    def recent_stalls(self) -> list:
+        with self._lock:
+            return list(reversed(self._stalls))
+
+
+loop_monitor = LoopMonitor()
+
+
+class LoopMonitorMiddleware:
+    """Pure ASGI - tags the serving task with its scope so stalls can name the route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not loop_monitor.enabled:
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        loop_monitor.task_scopes[task] = scope  # The router adds "endpoint" to this dict
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            loop_monitor.task_scopes.pop(task, None)
@@ -1,21 +1,48 @@
 from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, BackgroundTasks, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy import func, case
+from datetime import datetime, timedelta
 import os
 import uuid
+import asyncio
 import modal
 import librosa
 from pathlib import Path
 import json
 import re
-from database import get_db, CallEvaluation, SessionLocal, Agent, Report, Settings, AuditLog, create_tables
+from database import get_db, CallEvaluation, SessionLocal, Agent, Report, Settings, UploadBatch, create_tables, claim_call, engine
 from config import settings
 from pydantic import BaseModel
-from typing import Optional
-from fastapi import Form
+from typing import List, Optional
+from fastapi import Form, Header
 from profanity_filter import censor_segments, censor_transcript
+from agent_stats import reconcile_agent_stats
+from call_lifecycle import sync_call_aggregates, mark_analytics_changed
+from rollups import backfill_rollups
+from report_engine import REPORT_FORMATS, generate_report, report_file_name
+from report_cache import report_data_version, use_cached_report
+from call_metrics import (
+    compute_call_timings, format_duration, backfill_call_timings, backfill_metric_masks,
+    apply_metric_mask, CLASSIFICATIONS
+)
+from retention import enforce_retention
+from audit_writer import audit_writer
+from loop_monitor import loop_monitor, LoopMonitorMiddleware
+from upload_storage import new_call_id, save_upload, UploadSizeLimitMiddleware
+from upload_batches import batch_progress, dispatch_batch, ingest_batch, remove_staged, stage_bulk_upload
+from resumable_uploads import (
+    TUS_VERSION, append_chunk, complete_session, create_session, delete_session, gc_resumable_uploads,
+    get_session, parse_metadata, tus_headers
+)
+from audit_archive import archive_audit_logs, audit_filters, count_audit_logs, query_audit_logs
+from maintenance import register_job, start_maintenance, stop_maintenance
+from change_feed import (
+    ensure_table_versions, get_table_version, make_etag, etag_matches,
+    deleted_since, tombstone_horizon, prune_tombstones, CHANGE_FEED_OVERLAP_SECONDS
+)
+from search_index import ensure_search_index, backfill_search_index, index_call_segments, remove_call_segments, search_segments
 from audit_logger import (
     log_call_upload, log_call_analysis_complete, log_agent_created, 
     log_agent_updated, log_agent_deleted, log_settings_updated,
@@ -25,15 +52,25 @@ from audit_logger import (
 # CHANGED: Import the function instead of the module
 from init_storage import initialize_persistent_storage
 from auth_routes import router as auth_router
+from analytics_routes import router as analytics_router
+from export_routes import router as export_router
+from system_routes import router as system_router
 from auth import (
     get_current_user,
+    get_current_user_for_stream,
     get_current_active_admin,
     get_current_admin_or_manager,
     get_current_active_user,
     check_resource_access,
-    filter_data_by_role
+    filter_data_by_role,
+    role_owner_id,
+    scope_query_by_role
 )
-from fastapi import Request 
+from fastapi import Request, Response
+from pagination import keyset_paginate, apply_call_filters, to_naive_utc, MAX_PAGE_SIZE
+from events import call_events, publish_call_event, format_sse
+from serialization import DefaultJSONResponse, call_payload_cache
+from compression import CompressionMiddleware, choose_encoding
 
 
 
@@ -81,9 +118,12 @@ class ReportCreate(BaseModel):
 # MOVED TO STARTUP EVENT - No module-level execution!
 
 # Create FastAPI app
-app = FastAPI(title="CallEval API - Full Modal Stack")
+app = FastAPI(title="CallEval API - Full Modal Stack", default_response_class=DefaultJSONResponse)
 
 app.include_router(auth_router)
+app.include_router(analytics_router)
+app.include_router(export_router)
+app.include_router(system_router)
 
 # FIXED: Add startup event for all initialization tasks
 @app.on_event("startup")
@@ -95,6 +135,37 @@ async def startup_event():
     # Create database tables (only runs once per startup)
     create_tables()
     
+    # Change counters for ETags on polled lists
+    ensure_table_versions()
+    
+    # Transcript search index (FTS5 on SQLite), backfilled once for older calls
+    ensure_search_index(engine)
+    db = SessionLocal()
+    try:
+        backfill_search_index(db)
+        backfill_call_timings(db)
+        backfill_metric_masks(db)
+        backfill_rollups(db)
+    finally:
+        db.close()
+    
+    # Periodic maintenance jobs
+    register_job("retention", settings.RETENTION_INTERVAL_HOURS * 3600, enforce_retention)
+    register_job("prune_tombstones", 6 * 3600, prune_tombstones)
+    register_job("archive_audit_logs", settings.AUDIT_ARCHIVE_INTERVAL_HOURS * 3600, archive_audit_logs)
+    register_job("gc_resumable_uploads", settings.RESUMABLE_GC_INTERVAL_MINUTES * 60, gc_resumable_uploads)
+    register_job(
+        "reconcile_agent_stats", settings.AGENT_STATS_RECONCILE_HOURS * 3600,
+        reconcile_agent_stats, initial_delay=30
+    )
+    start_maintenance()
+    
+    # Audit rows are buffered and bulk-inserted off the request path
+    audit_writer.start()
+    
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    
     # Configure Modal authentication (moved from module level)
     modal_token_id = os.getenv("MODAL_TOKEN_ID")
     modal_token_secret = os.getenv("MODAL_TOKEN_SECRET")
@@ -112,6 +183,14 @@ async def startup_event():
         print("  Modal functions will NOT work without credentials!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background jobs and flush buffered audit rows on app shutdown"""
+    stop_maintenance()
+    loop_monitor.stop()
+    await asyncio.to_thread(audit_writer.stop)
+
+
 # Configure CORS origins
 allowed_origins = [origin.strip() for origin in settings.FRONTEND_URL.split(",")]
 if "http://localhost:5173" not in allowed_origins:
@@ -130,15 +209,30 @@ for url in production_urls:
 # REMOVED: print statement that caused sync loop
 # print(f"✓ CORS allowed origins: {allowed_origins}")
 
+# Rejects upload bodies past MAX_FILE_SIZE before they are spooled to disk.
+# Added before CORSMiddleware so it sits inside it - the early 413 gets CORS
+# headers and the frontend can read it
+app.add_middleware(UploadSizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=[
+        "Content-Disposition", "X-Next-Cursor", "X-Total-Count", "ETag",
+        # Resumable uploads (tus)
+        "Location", "Tus-Resumable", "Upload-Offset", "Upload-Length", "Upload-Expires", "X-Call-Id",
+    ],
 )
 
+# gzip/brotli for JSON bodies above COMPRESSION_MIN_SIZE (streams pass through)
+app.add_middleware(CompressionMiddleware)
+
+# Lets the event-loop monitor name the route behind a stall
+app.add_middleware(LoopMonitorMiddleware)
+
 # Binary Scorecard Configuration
 SCORECARD_CONFIG = {
     "enthusiasm_markers": {
@@ -677,40 +771,6 @@ def calculate_binary_scores(agent_segments, call_structure, bert_output_combined
         "active_listening_OR_handled_with_care": active_or_handled == 1.0  # Add this for clarity
     }
 
-def update_agent_stats(agent_id: str, db: Session):
-    """Update agent statistics after call processing or deletion"""
-    agent = db.query(Agent).filter(Agent.agentId == agent_id).first()
-    if not agent:
-        return
-    
-    # Get all completed calls for this agent
-    completed_calls = db.query(CallEvaluation).filter(
-        CallEvaluation.agent_id == agent_id,
-        CallEvaluation.status == "completed",
-        CallEvaluation.score != None
-    ).all()
-    
-    # FIXED: Always update stats, even if no calls remain
-    if completed_calls:
-        # Calculate new average score
-        total_score = sum(call.score for call in completed_calls)
-        agent.avgScore = round(total_score / len(completed_calls), 1)
-        agent.callsHandled = len(completed_calls)
-        agent.updated_at = datetime.utcnow()
-        db.commit()
-        
-        print(f"✅ Updated agent {agent.agentName} stats:")
-        print(f"   Calls Handled: {agent.callsHandled}")
-        print(f"   Average Score: {agent.avgScore}")
-    else:
-        # No calls left - reset stats to 0
-        agent.avgScore = 0.0
-        agent.callsHandled = 0
-        agent.updated_at = datetime.utcnow()
-        db.commit()
-        
-        print(f"✅ Reset agent {agent.agentName} stats to 0 (no remaining calls)")
-
 def process_call(call_id: str, file_path: str):
     """Background task: Process call with phase-aware evaluation"""
     
@@ -718,27 +778,21 @@ def process_call(call_id: str, file_path: str):
     call = None  # ← ADD THIS LINE: Initialize call to prevent UnboundLocalError
     
     try:
-        call = db.query(CallEvaluation).filter(CallEvaluation.id == call_id).first()
+        # Claim the call so only one worker (or API instance) processes it.
+        # Also covers CANCELLATION CHECK 1: cancelled calls are not claimable
+        call = claim_call(db, call_id)
         
         if not call:
-            print(f"Call {call_id} not found")
+            print(f"⚠️ Call {call_id} not found, cancelled or already claimed by another worker")
             return
         
-        # ==================== ADDED: CANCELLATION CHECK 1 ====================
-        if call.status == "cancelled":
-            print(f"⚠️ Call {call_id} was cancelled before processing started")
-            return
-        # =====================================================================
+        publish_call_event(call, progress={"stage": "transcription"})
         
         # STEP 1: TRANSCRIBE
         print(f"\n{'='*60}")
         print(f"STEP 1: TRANSCRIBING WITH MODAL WHISPERX")
         print(f"{'='*60}")
         
-        call.status = "transcribing"
-        call.analysis_status = "transcribing"
-        db.commit()
-        
         # ==================== ADDED: CANCELLATION CHECK 2 ====================
         db.refresh(call)
         if call.status == "cancelled":
@@ -778,25 +832,30 @@ def process_call(call_id: str, file_path: str):
         
         # Store segments in the scores field
         call.scores = json.dumps({"segments": segments_data})
+        
+        # Keep the transcript search index in sync (same transaction)
+        index_call_segments(db, call_id, segments_data, speaker_roles)
         print(f"✅ Stored {len(segments_data)} segments (profanity censored)")
         
-        # Calculate duration
-        if whisperx_result["segments"]:
-            last_segment = whisperx_result["segments"][-1]
-            duration_seconds = int(last_segment.get("end", 0))
-            minutes = duration_seconds // 60
-            seconds = duration_seconds % 60
-            call.duration = f"{minutes}:{seconds:02d}"
-        else:
-            duration_seconds = 0
+        # Calculate duration and talk time per speaker role (numeric, for SQL aggregation)
+        timings = compute_call_timings(segments_data, speaker_roles)
+        duration_seconds = timings["duration_seconds"]
+        call.duration_seconds = duration_seconds
+        call.agent_talk_seconds = timings["agent_talk_seconds"]
+        call.caller_talk_seconds = timings["caller_talk_seconds"]
+        call.agent_talk_ratio = timings["agent_talk_ratio"]
+        if segments_data:
+            call.duration = format_duration(duration_seconds)
         
         print(f"✅ Transcription complete (with profanity censoring)!")
         print(f"   Transcript length: {len(full_text)} characters")
         print(f"   Duration: {call.duration}")
+        print(f"   Agent talk ratio: {call.agent_talk_ratio}")
         print(f"   Segments: {len(segments_data)}")
         print(f"   Speakers: {speaker_roles}")
         
         db.commit()
+        publish_call_event(call, "progress", progress={"stage": "transcription", "segments": len(segments_data)})
         
         # ==================== ADDED: CANCELLATION CHECK 3 ====================
         db.refresh(call)
@@ -856,10 +915,12 @@ def process_call(call_id: str, file_path: str):
         call.status = "analyzing"
         call.analysis_status = "analyzing with BERT"
         db.commit()
+        publish_call_event(call, progress={"stage": "bert", "done": 0, "total": len(agent_segments)})
         
         all_bert_predictions = {}
         
         for i, segment in enumerate(agent_segments):
+            publish_call_event(call, "progress", progress={"stage": "bert", "done": i, "total": len(agent_segments)})
             segment_text = segment["text"]
             print(f"\n📝 Segment {i+1}/{len(agent_segments)}: '{segment_text[:50]}...'")
             
@@ -890,6 +951,7 @@ def process_call(call_id: str, file_path: str):
         
         # Wav2Vec2
         print(f"\n🎵 Calling Wav2Vec2 with full agent audio...")
+        publish_call_event(call, "progress", progress={"stage": "wav2vec2"})
         agent_text_combined = " ".join([seg["text"] for seg in agent_segments])
         wav2vec2_output = analyze_with_modal_wav2vec2(file_path, call_id, agent_text_combined)
         
@@ -976,21 +1038,26 @@ def process_call(call_id: str, file_path: str):
         call.bert_analysis = json.dumps(bert_output_combined)
         call.wav2vec2_analysis = json.dumps(wav2vec2_output) if wav2vec2_output else None
         call.binary_scores = json.dumps(binary_scores)
+        apply_metric_mask(call)
+        # Agent stats and rollups move in the same transaction as the completion
+        sync_call_aggregates(db, call)
         
         db.commit()
         db.refresh(call)
 
         # ADD THIS AUDIT LOG AFTER SUCCESSFUL ANALYSIS
         log_call_analysis_complete(call_id, call.filename, call.score)
+        publish_call_event(
+            call, "completed",
+            score=call.score,
+            metrics={name: data["detected"] for name, data in binary_scores["metrics"].items()}
+        )
         
         print(f"\n{'='*60}")
         print(f"✅ PROCESSING COMPLETE!")
         print(f"   Call ID: {call_id}")
         print(f"   Final Score: {total_score:.1f}/100")
         print(f"{'='*60}\n")
-
-        if call.agent_id and call.score:
-            update_agent_stats(call.agent_id, db)
         
     except Exception as e:
         print(f"\n❌ ERROR processing call {call_id}: {e}")
@@ -1006,6 +1073,8 @@ def process_call(call_id: str, file_path: str):
                 call.error_message = str(e)  # Store full error for debugging
             # =================================================================================
             db.commit()
+            if call.status == "failed":
+                publish_call_event(call, "failed", error=call.error_message)
     
     finally:
         db.close()
@@ -1034,27 +1103,24 @@ async def upload_audio(
 ):
     """Upload audio file for evaluation - Admin/Manager only"""
     
-    if not file.filename.endswith(('.mp3', '.wav', '.m4a')):
-        raise HTTPException(status_code=400, detail="Invalid file type")
-    
     # Verify agent exists
     agent = db.query(Agent).filter(Agent.agentId == agent_id).first()
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    call_id = f"REC-{timestamp}-{str(uuid.uuid4().int)[:4]}"
-    file_path = os.path.join(settings.UPLOAD_DIR, f"{call_id}_{file.filename}")
+    call_id = new_call_id()
     
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    # Chunked copy with size limit, SHA-256 and format sniffing, renamed into place when complete
+    stored = await save_upload(file, call_id)
+    file_path = stored["path"]
     
     # Create call with agent assignment
     call = CallEvaluation(
         id=call_id,
         filename=file.filename,
         file_path=file_path,
+        file_size=stored["size"],
+        file_sha256=stored["sha256"],
         status="processing",
         analysis_status="queued",
         agent_id=agent_id,
@@ -1071,6 +1137,7 @@ async def upload_audio(
         user=current_user.full_name  # ADDED: Track who uploaded
     )
     
+    publish_call_event(call)
     background_tasks.add_task(process_call, call_id, file_path)
     
     return {
@@ -1078,13 +1145,183 @@ async def upload_audio(
         "filename": file.filename,
         "agent_id": agent_id,
         "agent_name": agent.agentName,
+        "file_size": stored["size"],
+        "sha256": stored["sha256"],
         "status": "processing"
     }
 
 
+@app.post("/api/upload/bulk")
+async def upload_bulk(
+    files: List[UploadFile] = File(...),
+    agent_id: Optional[str] = Form(None),
+    manifest: Optional[UploadFile] = File(None),
+    current_user = Depends(get_current_admin_or_manager),
+    background_tasks: BackgroundTasks = BackgroundTasks(),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload many recordings in one batch - Admin/Manager only
+    Either several files or one zip. A manifest (csv: filename,agent_id or json:
+    {filename: agent_id}), sent as a form file or inside the zip, assigns agents;
+    agent_id is the fallback for unlisted files.
+    """
+    source, staged, agents = await stage_bulk_upload(db, files, manifest, agent_id)
+    try:
+        batch = ingest_batch(db, source, staged, agents, current_user)
+    except Exception:
+        db.rollback()
+        remove_staged(staged)
+        raise
+    
+    calls = db.query(CallEvaluation).filter(CallEvaluation.batch_id == batch.id).all()
+    for call in calls:
+        publish_call_event(call)
+    background_tasks.add_task(dispatch_batch, process_call, staged)
+    print(f"✓ Bulk upload {batch.id}: {len(staged)} calls ({source})")
+    
+    return {
+        **batch_progress(db, batch),
+        "calls": [
+            {
+                "id": item["call_id"],
+                "filename": item["filename"],
+                "agent_id": item["agent_id"],
+                "file_size": item["size"],
+                "sha256": item["sha256"]
+            }
+            for item in staged
+        ]
+    }
+
+
+@app.get("/api/upload/batches/{batch_id}")
+def get_upload_batch(
+    batch_id: str,
+    current_user = Depends(get_current_admin_or_manager),
+    db: Session = Depends(get_db)
+):
+    """Aggregate processing progress of a bulk upload - Admin/Manager only"""
+    batch = db.query(UploadBatch).filter(UploadBatch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Upload batch not found")
+    return batch_progress(db, batch)
+
+
+@app.post("/api/upload/resumable", status_code=201)
+def create_resumable_upload(
+    upload_length: int = Header(...),
+    upload_metadata: Optional[str] = Header(None),
+    current_user = Depends(get_current_admin_or_manager),
+    db: Session = Depends(get_db)
+):
+    """
+    Start a resumable (tus) upload - Admin/Manager only
+    Upload-Metadata needs filename, agent_id and the file's sha256 (hex).
+    """
+    upload = create_session(db, upload_length, parse_metadata(upload_metadata), current_user)
+    print(f"✓ Resumable upload {upload.id} created for {upload.filename} ({upload.upload_length} bytes)")
+    return Response(
+        status_code=201,
+        headers={"Location": f"/api/upload/resumable/{upload.id}", **tus_headers(upload)}
+    )
+
+
+@app.head("/api/upload/resumable/{upload_id}")
+def get_resumable_upload(
+    upload_id: str,
+    current_user = Depends(get_current_admin_or_manager),
+    db: Session = Depends(get_db)
+):
+    """Offset to resume a resumable upload from"""
+    upload = get_session(db, upload_id, current_user)
+    return Response(status_code=200, headers=tus_headers(upload))
+
+
+@app.patch("/api/upload/resumable/{upload_id}")
+async def patch_resumable_upload(
+    upload_id: str,
+    request: Request,
+    current_user = Depends(get_current_admin_or_manager),
+    background_tasks: BackgroundTasks = BackgroundTasks(),
+    db: Session = Depends(get_db)
+):
+    """Append a chunk at Upload-Offset; the call is queued once the whole file is in and verified"""
+    upload = get_session(db, upload_id, current_user)
+    await append_chunk(db, upload, request)
+    
+    call = await complete_session(db, upload)
+    if call:
+        log_call_upload(
+            call_id=call.id,
+            filename=call.filename,
+            agent_name=call.agent_name,
+            user=current_user.full_name
+        )
+        publish_call_event(call)
+        background_tasks.add_task(process_call, call.id, call.file_path)
+        print(f"✓ Resumable upload {upload.id} complete - call {call.id} queued")
+    
+    return Response(status_code=204, headers=tus_headers(upload))
+
+
+@app.delete("/api/upload/resumable/{upload_id}")
+def delete_resumable_upload(
+    upload_id: str,
+    current_user = Depends(get_current_admin_or_manager),
+    db: Session = Depends(get_db)
+):
+    """Abandon a resumable upload and remove its partial file"""
+    delete_session(db, get_session(db, upload_id, current_user))
+    return Response(status_code=204, headers={"Tus-Resumable": TUS_VERSION})
+
+
+# Comment line sent when no event arrived within this many seconds (keeps proxies from closing the stream)
+SSE_HEARTBEAT_SECONDS = 15
+
+
+@app.get("/api/calls/events")
+async def stream_call_events(
+    request: Request,
+    current_user = Depends(get_current_user_for_stream)
+):
+    """
+    Server-Sent Events stream of call processing status, progress and final scores.
+    Agents only receive events for their own calls. EventSource clients can
+    authenticate with ?access_token=<jwt> since they cannot send headers.
+    """
+    agent_filter = role_owner_id(current_user)
+
+    async def event_stream():
+        subscription = call_events.subscribe(agent_id=agent_filter)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            call_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx/Render)
+        }
+    )
+
+
 @app.get("/api/calls/{call_id}")
 async def get_call(
     call_id: str,
+    request: Request,
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -1092,19 +1329,42 @@ async def get_call(
     Get call evaluation results with access control
     - Admin/Manager: Can view any call
     - Agent: Can only view their own calls
+    Completed calls are served from pre-serialized (and pre-compressed) payloads.
     """
-    call = db.query(CallEvaluation).filter(CallEvaluation.id == call_id).first()
+    # Light lookup first - transcript/segments are only loaded when not cached
+    header = db.query(
+        CallEvaluation.agent_id, CallEvaluation.status, CallEvaluation.updated_at
+    ).filter(CallEvaluation.id == call_id).first()
     
-    if not call:
+    if not header:
         raise HTTPException(status_code=404, detail="Call not found")
     
     # ADDED: Check if user has permission to view this call
-    if current_user.role == "Agent" and call.agent_id != current_user.id:
+    if current_user.role == "Agent" and header.agent_id != current_user.id:
         raise HTTPException(
             status_code=403,
             detail="You don't have permission to access this call"
         )
     
+    def load_detail():
+        call = db.query(CallEvaluation).filter(CallEvaluation.id == call_id).first()
+        if not call:
+            raise HTTPException(status_code=404, detail="Call not found")
+        return build_call_detail(call)
+    
+    if header.status != "completed":
+        return load_detail()
+    
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    body = call_payload_cache.get(call_id, header.updated_at, load_detail, encoding)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def build_call_detail(call: CallEvaluation) -> dict:
+    """Full call payload (transcript, segments, parsed analysis) for GET /api/calls/{id}"""
     # Helper function for safe JSON parsing
     def safe_json_parse(json_str):
         if not json_str or json_str.strip() == '':
@@ -1138,6 +1398,10 @@ async def get_call(
         "status": call.status,
         "analysis_status": call.analysis_status,
         "duration": call.duration,
+        "duration_seconds": call.duration_seconds,
+        "agent_talk_seconds": call.agent_talk_seconds,
+        "caller_talk_seconds": call.caller_talk_seconds,
+        "agent_talk_ratio": call.agent_talk_ratio,
         "score": call.score,
         "agent_id": call.agent_id,
         "agent_name": call.agent_name,
@@ -1181,6 +1445,7 @@ async def cancel_call_processing(
         
         # Add audit log
         log_call_cancel(call_id, call.filename)
+        publish_call_event(call)
         
         print(f"✓ Call {call_id} cancelled successfully")
         
@@ -1234,11 +1499,14 @@ async def retry_call_processing(
         call.bert_analysis = None
         call.wav2vec2_analysis = None
         call.binary_scores = None
+        apply_metric_mask(call)
         call.updated_at = datetime.utcnow()
+        sync_call_aggregates(db, call)
         db.commit()
         
         # Add audit log
         log_call_retry(call_id, call.filename)
+        publish_call_event(call)
         
         # Restart background processing
         background_tasks.add_task(process_call, call_id, file_path)
@@ -1284,8 +1552,11 @@ async def delete_call(
                 print(f"⚠ Failed to delete audio file: {e}")
         
         # Delete from database
+        remove_call_segments(db, call_id)
+        sync_call_aggregates(db, call, removed=True)
         db.delete(call)
         db.commit()
+        call_payload_cache.invalidate(call_id)
         
         # ADD AUDIT LOG
         log_call_deleted(
@@ -1313,6 +1584,18 @@ async def delete_call(
 
 @app.get("/api/calls")
 async def list_calls(
+    request: Request,
+    response: Response,
+    updated_since: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    status: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    score_min: Optional[float] = None,
+    score_max: Optional[float] = None,
     current_user = Depends(get_current_user),  # ADDED: Require authentication
     db: Session = Depends(get_db)
 ):
@@ -1320,28 +1603,141 @@ async def list_calls(
     List call evaluations based on user role:
     - Admin/Manager: See all calls
     - Agent: See only their own calls
+    
+    Query params:
+    - limit / cursor: Keyset pagination, newest first (next page cursor in X-Next-Cursor)
+    - include_total: Send X-Total-Count (default true, turn off for cheaper pages)
+    - status, agent_id, date_from, date_to, score_min, score_max: Filters
+    - updated_since: Only calls changed since then, plus deleted ids:
+      {"items": [...], "deleted_ids": [...], "server_time": ...} - pass server_time
+      as the next updated_since
+    
+    Responses carry an ETag; send it back in If-None-Match to get 304 Not Modified
+    while no call has changed (checked without scanning the calls table).
     """
-    calls = db.query(CallEvaluation).order_by(CallEvaluation.created_at.desc()).all()
+    # Unchanged polls are answered from the table version alone.
+    # updated_since is left out of the key: a client holding the latest version has nothing to fetch
+    version = get_table_version(db, CallEvaluation.__tablename__)
+    query_key = sorted((k, v) for k, v in request.query_params.multi_items() if k != "updated_since")
+    etag = make_etag("calls", version, current_user.id, current_user.role, query_key)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+    
+    # Agents only see their own calls - filtered in SQL on the agent_id index
+    query = scope_query_by_role(db.query(CallEvaluation), current_user, CallEvaluation.agent_id)
+    query = apply_call_filters(query, status, agent_id, date_from, date_to, score_min, score_max)
+    
+    if updated_since is not None:
+        since = to_naive_utc(updated_since)
+        if since < tombstone_horizon():
+            raise HTTPException(status_code=410, detail="updated_since is too old, reload the full list")
+        
+        server_time = datetime.utcnow() - timedelta(seconds=CHANGE_FEED_OVERLAP_SECONDS)
+        calls = query.filter(CallEvaluation.updated_at >= since).order_by(CallEvaluation.updated_at).all()
+        deleted_ids = deleted_since(
+            db, CallEvaluation.__tablename__, since,
+            owner_id=role_owner_id(current_user)
+        )
+        return {
+            "items": [serialize_call_summary(call) for call in calls],
+            "deleted_ids": deleted_ids,
+            "server_time": server_time.isoformat()
+        }
     
-    # ADDED: Filter calls based on role
-    if current_user.role == "Agent":
-        # Agents only see their own calls
-        calls = [call for call in calls if call.agent_id == current_user.id]
-    # Admin and Manager see all calls (no filtering needed)
+    calls = keyset_paginate(
+        query, CallEvaluation.created_at, CallEvaluation.id, response,
+        limit=limit, cursor=cursor, include_total=include_total
+    )
     
-    return [{
+    return [serialize_call_summary(call) for call in calls]
+
+
+def serialize_call_summary(call: CallEvaluation) -> dict:
+    """List representation of a call (GET /api/calls)"""
+    return {
         "id": call.id,
         "filename": call.filename,
         "status": call.status,
         "analysis_status": call.analysis_status,
         "duration": call.duration,
+        "duration_seconds": call.duration_seconds,
+        "agent_talk_ratio": call.agent_talk_ratio,
         "score": call.score,
         "agent_id": call.agent_id,
         "agent_name": call.agent_name,
         "binary_scores": call.binary_scores,
         "created_at": call.created_at.isoformat() if call.created_at else None,
         "updated_at": call.updated_at.isoformat() if call.updated_at else None,
-    } for call in calls]
+    }
+
+
+@app.get("/api/search")
+async def search_transcripts(
+    q: str,
+    speaker_role: Optional[str] = None,
+    mode: str = "phrase",
+    sort: str = "recent",
+    limit: int = 20,
+    offset: int = 0,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Full-text search over censored transcript segments
+    
+    Query params:
+    - q: Text to find (phrase match by default)
+    - speaker_role: Only segments spoken by "agent" or "caller"
+    - mode: "phrase" (exact phrase) or "words" (all words, any order)
+    - sort: "recent" (newest segments first, default) or "relevance"
+    - limit / offset: Pagination (limit max 100)
+    
+    Agents only get matches from their own calls.
+    """
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Search query cannot be empty")
+    if mode not in ("phrase", "words"):
+        raise HTTPException(status_code=400, detail="mode must be 'phrase' or 'words'")
+    if sort not in ("recent", "relevance"):
+        raise HTTPException(status_code=400, detail="sort must be 'recent' or 'relevance'")
+    
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+    
+    # Fetch one extra row to know if there is a next page without counting all matches
+    rows = search_segments(
+        db,
+        q,
+        agent_id=role_owner_id(current_user),
+        speaker_role=speaker_role,
+        mode=mode,
+        sort=sort,
+        limit=limit + 1,
+        offset=offset
+    )
+    
+    return {
+        "query": q,
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(rows) > limit,
+        "results": [{
+            "call_id": row["call_id"],
+            "filename": row["filename"],
+            "agent_id": row["agent_id"],
+            "agent_name": row["agent_name"],
+            "segment_index": row["segment_index"],
+            "speaker": row["speaker"],
+            "speaker_role": row["speaker_role"],
+            "start": row["start"],
+            "end": row["end"],
+            "snippet": row["snippet"],
+            "created_at": row["created_at"].isoformat() if hasattr(row["created_at"], "isoformat") else row["created_at"],
+        } for row in rows[:limit]]
+    }
 
 
 @app.get("/api/temp-audio/{call_id}")
@@ -1419,6 +1815,7 @@ async def create_agent(
         )
         
         db.add(new_agent)
+        mark_analytics_changed(db)
         db.commit()
         db.refresh(new_agent)
         
@@ -1464,7 +1861,7 @@ async def update_agent(
             db.query(CallEvaluation).filter(
                 CallEvaluation.agent_id == agent_id
             ).update(
-                {"agent_name": agent_update.agentName},
+                {"agent_name": agent_update.agentName, "updated_at": datetime.utcnow()},
                 synchronize_session=False
             )
             print(f"✅ Updated agent_name in all call records")
@@ -1476,6 +1873,7 @@ async def update_agent(
             changes['status'] = agent_update.status
             agent.status = agent_update.status
         
+        mark_analytics_changed(db)
         db.commit()
         
         # ADD AUDIT LOG
@@ -1513,11 +1911,12 @@ async def delete_agent(
         
         # Delete related call evaluations first (or handle as needed)
         db.query(CallEvaluation).filter(CallEvaluation.agent_id == agent_id).update(
-            {"agent_id": None, "agent_name": f"{agent_name} (Deleted)"}
+            {"agent_id": None, "agent_name": f"{agent_name} (Deleted)", "updated_at": datetime.utcnow()}
         )
         
         # Delete the agent
         db.delete(agent)
+        mark_analytics_changed(db)
         db.commit()
         
         # ADD AUDIT LOG
@@ -1538,6 +1937,15 @@ async def delete_agent(
 @app.get("/api/agents/{agent_id}/calls")
 async def get_agent_calls(
     agent_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    score_min: Optional[float] = None,
+    score_max: Optional[float] = None,
     current_user = Depends(get_current_user),  # ADDED: Require authentication
     db: Session = Depends(get_db)
 ):
@@ -1545,6 +1953,8 @@ async def get_agent_calls(
     Get all calls for a specific agent
     - Admin/Manager: Can view any agent's calls
     - Agent: Can only view their own calls
+    
+    Supports the same pagination and filter params as GET /api/calls
     """
     agent = db.query(Agent).filter(Agent.agentId == agent_id).first()
     
@@ -1558,9 +1968,12 @@ async def get_agent_calls(
             detail="You can only view your own calls"
         )
     
-    calls = db.query(CallEvaluation).filter(
-        CallEvaluation.agent_id == agent_id
-    ).order_by(CallEvaluation.created_at.desc()).all()
+    query = db.query(CallEvaluation).filter(CallEvaluation.agent_id == agent_id)
+    query = apply_call_filters(query, status, None, date_from, date_to, score_min, score_max)
+    calls = keyset_paginate(
+        query, CallEvaluation.created_at, CallEvaluation.id, response,
+        limit=limit, cursor=cursor, include_total=include_total
+    )
     
     return {
         "agent": {
@@ -1576,6 +1989,8 @@ async def get_agent_calls(
             "status": call.status,
             "score": call.score,
             "duration": call.duration,
+            "duration_seconds": call.duration_seconds,
+            "agent_talk_ratio": call.agent_talk_ratio,
             "created_at": call.created_at.isoformat() if call.created_at else None
         } for call in calls]
     }
@@ -1592,34 +2007,46 @@ async def get_agent_stats(
     - Agent: See only their own stats
     """
     try:
-        # ADDED: Filter agents based on role
-        if current_user.role == "Agent":
-            # Agent sees only their own stats
-            agents = db.query(Agent).filter(Agent.agentId == current_user.id).all()
-        else:
-            # Admin/Manager see all agents
-            agents = db.query(Agent).all()
-        
-        if not agents:
+        # Role-scoped aggregates computed in SQL (agents only see their own stats)
+        total, active, avg_score, total_calls = scope_query_by_role(
+            db.query(
+                func.count(Agent.agentId),
+                func.sum(case((Agent.status == "Active", 1), else_=0)),
+                func.avg(Agent.avgScore),
+                func.sum(Agent.callsHandled)
+            ),
+            current_user, Agent.agentId
+        ).one()
+        
+        if not total:
             return {
                 "total": 0,
                 "active": 0,
                 "inactive": 0,
                 "avgScore": 0,
-                "totalCalls": 0
+                "totalCalls": 0,
+                "avgHandleTime": 0,
+                "avgAgentTalkRatio": None
             }
         
-        total = len(agents)
-        active = len([a for a in agents if a.status == "Active"])
-        avg_score = sum(a.avgScore for a in agents) / total if total > 0 else 0
-        total_calls = sum(a.callsHandled for a in agents)
+        active = active or 0
+        
+        # Average handle time and talk ratio in a single SQL aggregate
+        timing_query = db.query(
+            func.avg(CallEvaluation.duration_seconds),
+            func.avg(CallEvaluation.agent_talk_ratio)
+        ).filter(CallEvaluation.status == "completed")
+        timing_query = scope_query_by_role(timing_query, current_user, CallEvaluation.agent_id)
+        avg_handle_time, avg_talk_ratio = timing_query.one()
         
         return {
             "total": total,
             "active": active,
             "inactive": total - active,
-            "avgScore": round(avg_score, 1),
-            "totalCalls": total_calls
+            "avgScore": round(avg_score or 0, 1),
+            "totalCalls": total_calls or 0,
+            "avgHandleTime": round(avg_handle_time or 0),  # seconds
+            "avgAgentTalkRatio": round(avg_talk_ratio, 3) if avg_talk_ratio is not None else None
         }
     except Exception as e:
         print(f"Error fetching stats: {str(e)}")
@@ -1629,10 +2056,25 @@ async def get_agent_stats(
 @app.post("/api/reports")
 async def create_report(
     report: ReportCreate,
+    background_tasks: BackgroundTasks,
     current_user = Depends(get_current_admin_or_manager),  # ADDED: Admin/Manager only
     db: Session = Depends(get_db)
 ):
-    """Create evaluation report - Admin/Manager only"""
+    """
+    Create evaluation report - Admin/Manager only
+    The file is generated server-side in the background (status "generating");
+    total_calls/avg_score are computed from the database, client values are ignored.
+    Download it from GET /api/reports/{id}/download once status is "completed".
+    Repeat requests over unchanged calls complete immediately from the report
+    cache (cache_hit=true).
+    """
+    if report.format not in REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(REPORT_FORMATS)}")
+    if report.classification in ("all", ""):
+        report.classification = None
+    if report.classification and report.classification not in CLASSIFICATIONS:
+        raise HTTPException(status_code=400, detail=f"classification must be one of {', '.join(CLASSIFICATIONS)}")
+    
     try:
         import uuid
         
@@ -1644,40 +2086,37 @@ async def create_report(
                 return None
             # Replace 'Z' with '+00:00' for proper parsing
             date_string = date_string.replace('Z', '+00:00')
-            return datetime.fromisoformat(date_string)
+            return to_naive_utc(datetime.fromisoformat(date_string))
         
         db_report = Report(
             id=report_id,
             type=report.type,
             format=report.format,
-            status="completed",
+            status="generating",
             agent_id=report.agent_id,
             agent_name=report.agent_name,
             classification=report.classification,
             start_date=parse_datetime(report.start_date),
             end_date=parse_datetime(report.end_date),
-            total_calls=report.total_calls,
-            avg_score=report.avg_score
+            total_calls=0,
+            avg_score=None,
+            cache_hit=False
         )
         
+        # Same filters over unchanged calls: hand back the cached file right away
+        served_from_cache = use_cached_report(db, db_report, report_data_version(db, db_report))
+        
         db.add(db_report)
         db.commit()
         db.refresh(db_report)
         
         # ADD AUDIT LOG
-        log_report_generated(report_id, report.type, user="Admin")
+        log_report_generated(report_id, report.type, user=current_user.full_name)
         
-        return {
-            "id": db_report.id,
-            "type": db_report.type,
-            "format": db_report.format,
-            "status": db_report.status,
-            "agent_name": db_report.agent_name or "All Agents",
-            "classification": db_report.classification or "All Classifications",
-            "total_calls": db_report.total_calls,
-            "avg_score": db_report.avg_score,
-            "created_at": db_report.created_at.isoformat() if db_report.created_at else None
-        }
+        if not served_from_cache:
+            background_tasks.add_task(generate_report, report_id)
+        
+        return serialize_report(db_report)
     except Exception as e:
         db.rollback()
         print(f"Error creating report: {str(e)}")
@@ -1686,25 +2125,39 @@ async def create_report(
 
 @app.get("/api/reports")
 async def list_reports(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    agent_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
     current_user = Depends(get_current_admin_or_manager),  # ADDED: Admin/Manager only
     db: Session = Depends(get_db)
 ):
-    """List all reports - Admin/Manager only"""
+    """
+    List all reports - Admin/Manager only
+    Supports limit/cursor/include_total pagination like GET /api/calls,
+    agent_id and date_from/date_to (report creation time) filters
+    """
     try:
         from database import Report
-        reports = db.query(Report).order_by(Report.created_at.desc()).all()
-        
-        return [{
-            "id": report.id,
-            "type": report.type,
-            "format": report.format,
-            "status": report.status,
-            "agent_name": report.agent_name or "All Agents",
-            "classification": report.classification or "All Classifications",
-            "total_calls": report.total_calls,
-            "avg_score": report.avg_score,
-            "created_at": report.created_at.isoformat() if report.created_at else None
-        } for report in reports]
+        query = db.query(Report)
+        if agent_id:
+            query = query.filter(Report.agent_id == agent_id)
+        if date_from:
+            query = query.filter(Report.created_at >= to_naive_utc(date_from))
+        if date_to:
+            query = query.filter(Report.created_at <= to_naive_utc(date_to))
+        
+        reports = keyset_paginate(
+            query, Report.created_at, Report.id, response,
+            limit=limit, cursor=cursor, include_total=include_total
+        )
+        
+        return [serialize_report(report) for report in reports]
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching reports: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1716,30 +2169,74 @@ async def get_report(
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db)
     ):
-    """Get a specific report"""
+    """
+    Get a specific report
+    - Admin/Manager: Any report
+    - Agent: Only reports generated for them
+    """
     try:
         from database import Report
-        report = db.query(Report).filter(Report.id == report_id).first()
+        query = scope_query_by_role(db.query(Report), current_user, Report.agent_id)
+        report = query.filter(Report.id == report_id).first()
         
         if not report:
             raise HTTPException(status_code=404, detail="Report not found")
         
-        return {
-            "id": report.id,
-            "type": report.type,
-            "format": report.format,
-            "status": report.status,
-            "agent_name": report.agent_name or "All Agents",
-            "classification": report.classification or "All Classifications",
-            "total_calls": report.total_calls,
-            "avg_score": report.avg_score,
-            "created_at": report.created_at.isoformat() if report.created_at else None
-        }
+        return serialize_report(report)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching report: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/reports/{report_id}/download")
+async def download_report(
+    report_id: str,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download a generated report file (same access rules as GET /api/reports/{id})"""
+    query = scope_query_by_role(db.query(Report), current_user, Report.agent_id)
+    report = query.filter(Report.id == report_id).first()
+    
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if report.status == "generating":
+        raise HTTPException(status_code=409, detail="Report is still being generated")
+    if report.status == "failed":
+        raise HTTPException(status_code=409, detail=f"Report generation failed: {report.error_message}")
+    if not report.file_path:
+        raise HTTPException(status_code=404, detail="Report file not available")
+    if not os.path.exists(report.file_path):
+        # Evicted from the report cache or replaced after the data changed
+        raise HTTPException(status_code=410, detail="Report file has expired, generate the report again")
+    
+    return FileResponse(
+        report.file_path,
+        media_type=REPORT_FORMATS.get(report.format, "application/octet-stream"),
+        filename=report_file_name(report)
+    )
+
+
+def serialize_report(report: Report) -> dict:
+    """API representation of a report"""
+    return {
+        "id": report.id,
+        "type": report.type,
+        "format": report.format,
+        "status": report.status,
+        "agent_name": report.agent_name or "All Agents",
+        "classification": report.classification or "All Classifications",
+        "total_calls": report.total_calls,
+        "avg_score": report.avg_score,
+        "error_message": report.error_message,
+        "cache_hit": bool(report.cache_hit),
+        "download_url": f"/api/reports/{report.id}/download" if report.status == "completed" and report.file_path else None,
+        "created_at": report.created_at.isoformat() if report.created_at else None
+    }
+
+
 # GET settings
 @app.get("/api/settings")
 async def get_settings(
@@ -1822,6 +2319,15 @@ async def update_settings(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/settings/retention/run")
+async def run_retention(
+    background_tasks: BackgroundTasks,
+    current_user = Depends(get_current_active_admin),
+):
+    """Enforce the retention period now instead of waiting for the scheduled run - Admin only"""
+    background_tasks.add_task(enforce_retention)
+    return {"message": "Retention enforcement started"}
+
 # GET users
 @app.get("/api/users")
 async def get_users(db: Session = Depends(get_db)):
@@ -1846,10 +2352,19 @@ async def create_user(user: dict, db: Session = Depends(get_db)):
 # GET audit logs
 @app.get("/api/audit-logs")
 async def get_audit_logs(
+    response: Response,
     current_user = Depends(get_current_active_admin),
     limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     resource_type: Optional[str] = None,
     action: Optional[str] = None,
+    user: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    q: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
@@ -1857,23 +2372,34 @@ async def get_audit_logs(
     
     Query params:
     - limit: Maximum number of logs to return (default: 100)
+    - cursor: Value of X-Next-Cursor from the previous page
+    - include_total: Send X-Total-Count (default: false)
     - resource_type: Filter by resource type (call, agent, settings, etc.)
     - action: Filter by action type (create, update, delete, etc.)
+    - user, resource_id, status: Exact-match filters
+    - date_from / date_to: Time range
+    - q: Case-insensitive text search in the message
+    
+    Pages are newest first, keyed on (timestamp, id), and span the audit_logs
+    table and the archived monthly segments (rows older than AUDIT_HOT_DAYS)
+    transparently. For full extracts use GET /api/export/audit-logs.
     """
     try:
-        query = db.query(AuditLog)
+        filters = audit_filters(resource_type, action, user, resource_id, status, date_from, date_to, q)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
         
-        # Apply filters if provided
-        if resource_type:
-            query = query.filter(AuditLog.resource_type == resource_type)
-        if action:
-            query = query.filter(AuditLog.action == action)
+        if include_total:
+            response.headers["X-Total-Count"] = str(await asyncio.to_thread(count_audit_logs, db, filters))
         
-        # Order by most recent first and limit results
-        logs = query.order_by(AuditLog.timestamp.desc()).limit(limit).all()
+        # Segment reads are blocking file I/O - keep them off the event loop
+        logs, next_cursor = await asyncio.to_thread(query_audit_logs, db, filters, limit, cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         
-        return [log.to_dict() for log in logs]
+        return logs
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching audit logs: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
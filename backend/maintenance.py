@@ -0,0 +1,122 @@
+"""
+Periodic background jobs (retention, reconciliation, cleanup)
+Jobs are plain sync functions run in a worker thread so they never block the event loop
+Every instance and worker schedules them, but a run first takes the job's row
+in job_leases - while another run holds an unexpired lease the job is skipped.
+The lease is renewed while the job runs and released when it finishes.
+"""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from database import JobLease, SessionLocal
+
+_jobs: Dict[str, Dict] = {}
+_tasks: List[asyncio.Task] = []
+
+
+def register_job(name: str, interval_seconds: float, func: Callable, initial_delay: float = 60):
+    """Register a job to run every interval_seconds once start_maintenance() is called (again replaces it)"""
+    _jobs[name] = {
+        "name": name,
+        "interval": interval_seconds,
+        "func": func,
+        "initial_delay": initial_delay
+    }
+
+
+def acquire_lease(name: str) -> Optional[str]:
+    """Take the job's lease if it is free or expired -> owner token, None if another run holds it"""
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=settings.MAINTENANCE_LEASE_SECONDS)
+    db = SessionLocal()
+    try:
+        taken = db.query(JobLease).filter(
+            JobLease.name == name, JobLease.expires_at < now
+        ).update({"owner": owner, "expires_at": expires_at}, synchronize_session=False)
+        if not taken:
+            db.add(JobLease(name=name, owner=owner, expires_at=expires_at))
+        db.commit()
+        return owner
+    except IntegrityError:
+        db.rollback()  # Row exists and is held
+        return None
+    finally:
+        db.close()
+
+
+def renew_lease(name: str, owner: str) -> bool:
+    db = SessionLocal()
+    try:
+        expires_at = datetime.utcnow() + timedelta(seconds=settings.MAINTENANCE_LEASE_SECONDS)
+        renewed = db.query(JobLease).filter(
+            JobLease.name == name, JobLease.owner == owner
+        ).update({"expires_at": expires_at}, synchronize_session=False)
+        db.commit()
+        return bool(renewed)
+    finally:
+        db.close()
+
+
+def release_lease(name: str, owner: str):
+    db = SessionLocal()
+    try:
+        db.query(JobLease).filter(JobLease.name == name, JobLease.owner == owner).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _run_with_lease(job: Dict):
+    owner = await asyncio.to_thread(acquire_lease, job["name"])
+    if owner is None:
+        print(f"⏭️ Maintenance job {job['name']} is running elsewhere, skipped")
+        return
+    print(f"🔧 Running maintenance job: {job['name']}")
+    run = asyncio.ensure_future(asyncio.to_thread(job["func"]))
+    renew_every = settings.MAINTENANCE_LEASE_SECONDS / 3
+    while True:
+        done, _ = await asyncio.wait({run}, timeout=renew_every)
+        if done:
+            break
+        if not await asyncio.to_thread(renew_lease, job["name"], owner):
+            print(f"⚠️ Maintenance job {job['name']} lost its lease while running")
+    # Released only once the job finished - if this task is cancelled first the
+    # thread may still be running, so the lease is left to expire
+    await asyncio.to_thread(release_lease, job["name"], owner)
+    run.result()
+
+
+async def _run_periodically(job: Dict):
+    await asyncio.sleep(job["initial_delay"])
+    while True:
+        try:
+            await _run_with_lease(job)
+        except Exception as e:
+            print(f"❌ Maintenance job {job['name']} failed: {e}")
+            import traceback
+            traceback.print_exc()
+        await asyncio.sleep(job["interval"])
+
+
+def start_maintenance():
+    """Start all registered jobs - call from the startup event"""
+    if _tasks:
+        return
+    for job in _jobs.values():
+        _tasks.append(asyncio.create_task(_run_periodically(job)))
+    print(f"✓ Started {len(_tasks)} maintenance job(s)")
+
+
+def stop_maintenance():
+    """Cancel all running jobs - call from the shutdown event"""
+    for task in _tasks:
+        task.cancel()
+    _tasks.clear()
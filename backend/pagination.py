@@ -0,0 +1,105 @@
+"""
+Keyset (cursor) pagination and shared list filters
+Pages are ordered newest first by (timestamp, id) so page N costs the same as page 1
+"""
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Optional, Tuple, List
+
+from fastapi import HTTPException, Response
+from sqlalchemy import or_, and_
+
+from database import CallEvaluation
+
+MAX_PAGE_SIZE = 500
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC - normalize "...Z"/offset query params"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(timestamp: datetime, row_id) -> str:
+    """Opaque cursor pointing just past (timestamp, id)"""
+    raw = json.dumps([timestamp.isoformat() if timestamp else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], object]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(timestamp) if timestamp else None), row_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_paginate(
+    query,
+    time_column,
+    id_column,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True
+) -> List:
+    """
+    Apply (time, id) DESC keyset pagination to a query and return the rows.
+
+    Without limit/cursor all rows are returned (legacy behaviour). Otherwise the
+    next page cursor is sent in the X-Next-Cursor header and, unless
+    include_total=false, the filtered row count in X-Total-Count.
+    """
+    if include_total and (limit is not None or cursor):
+        response.headers["X-Total-Count"] = str(query.order_by(None).count())
+
+    if cursor:
+        cursor_time, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            time_column < cursor_time,
+            and_(time_column == cursor_time, id_column < cursor_id)
+        ))
+
+    query = query.order_by(time_column.desc(), id_column.desc())
+
+    if limit is None:
+        return query.all()
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = query.limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            getattr(last, time_column.key), getattr(last, id_column.key)
+        )
+    return rows
+
+
+def apply_call_filters(
+    query,
+    status: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    score_min: Optional[float] = None,
+    score_max: Optional[float] = None
+):
+    """Server-side filters shared by the call list endpoints"""
+    if status:
+        query = query.filter(CallEvaluation.status == status)
+    if agent_id:
+        query = query.filter(CallEvaluation.agent_id == agent_id)
+    if date_from:
+        query = query.filter(CallEvaluation.created_at >= to_naive_utc(date_from))
+    if date_to:
+        query = query.filter(CallEvaluation.created_at <= to_naive_utc(date_to))
+    if score_min is not None:
+        query = query.filter(CallEvaluation.score >= score_min)
+    if score_max is not None:
+        query = query.filter(CallEvaluation.score <= score_max)
+    return query
@@ -0,0 +1,104 @@
+"""
+Password hashing off the event loop
+bcrypt at 12 rounds costs ~250 ms of CPU per verify/hash. Run inline in an
+async handler that stalls every other request, so all password work goes
+through a small dedicated thread pool instead:
+- PASSWORD_HASH_WORKERS threads (bcrypt releases the GIL while hashing)
+- At most PASSWORD_HASH_MAX_PENDING jobs queued or running; beyond that callers
+  get 503 + Retry-After rather than an ever-growing queue
+- Queue depth, rejections and timings are reported by password_pool_stats()
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from fastapi import HTTPException, status
+
+from auth import get_password_hash, verify_password
+from config import settings
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "queued": 0,  # Submitted, waiting for a worker
+    "running": 0,
+    "completed": 0,
+    "rejected": 0,
+    "max_depth": 0,
+    "wait_ms_total": 0.0,
+    "run_ms_total": 0.0,
+}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+                )
+    return _executor
+
+
+def _depth() -> int:
+    return _stats["queued"] + _stats["running"]
+
+
+async def _run(func: Callable, *args):
+    with _stats_lock:
+        if _depth() >= settings.PASSWORD_HASH_MAX_PENDING:
+            _stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in requests in progress, please retry shortly",
+                headers={"Retry-After": "2"},
+            )
+        _stats["queued"] += 1
+        _stats["max_depth"] = max(_stats["max_depth"], _depth())
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        with _stats_lock:
+            _stats["queued"] -= 1
+            _stats["running"] += 1
+            _stats["wait_ms_total"] += (started - submitted) * 1000
+        try:
+            return func(*args)
+        finally:
+            with _stats_lock:
+                _stats["running"] -= 1
+                _stats["completed"] += 1
+                _stats["run_ms_total"] += (time.perf_counter() - started) * 1000
+
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), job)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """auth.verify_password on the password pool"""
+    return await _run(verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    """auth.get_password_hash on the password pool"""
+    return await _run(get_password_hash, password)
+
+
+def password_pool_stats() -> dict:
+    with _stats_lock:
+        completed = _stats["completed"]
+        return {
+            "workers": settings.PASSWORD_HASH_WORKERS,
+            "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+            "queue_depth": _stats["queued"],
+            "running": _stats["running"],
+            "max_depth": _stats["max_depth"],
+            "completed": completed,
+            "rejected": _stats["rejected"],
+            "avg_wait_ms": round(_stats["wait_ms_total"] / completed, 1) if completed else None,
+            "avg_run_ms": round(_stats["run_ms_total"] / completed, 1) if completed else None,
+        }
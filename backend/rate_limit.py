@@ -0,0 +1,68 @@
+"""
+In-process sliding-window rate limiting (per API instance)
+Used to cap failed logins per client IP and per (IP, username) - each attempt
+costs a bcrypt verify.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from fastapi import Request
+
+# Forget idle keys once this many are tracked
+MAX_TRACKED_KEYS = 10000
+
+
+class SlidingWindowLimiter:
+    def __init__(self, max_events: int, window_seconds: float):
+        self.max_events = max_events
+        self.window_seconds = window_seconds
+        self._events: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str) -> Optional[int]:
+        """Record an event for key. Returns None if allowed, else seconds until retry."""
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.setdefault(key, deque())
+            retry_after = self._retry_after(events, now)
+            if retry_after is not None:
+                return retry_after
+            events.append(now)
+            if len(self._events) > MAX_TRACKED_KEYS:
+                self._prune(now)
+            return None
+
+    def check(self, key: str) -> Optional[int]:
+        """Like hit() without recording anything - None if key is under the limit"""
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            return self._retry_after(events, now) if events else None
+
+    def _retry_after(self, events: deque, now: float) -> Optional[int]:
+        while events and events[0] <= now - self.window_seconds:
+            events.popleft()
+        if len(events) >= self.max_events:
+            return max(1, int(events[0] + self.window_seconds - now) + 1)
+        return None
+
+    def reset(self, key: str):
+        with self._lock:
+            self._events.pop(key, None)
+
+    def _prune(self, now: float):
+        for key in [k for k, events in self._events.items() if not events or events[-1] <= now - self.window_seconds]:
+            del self._events[key]
+
+
+def client_ip(request: Request) -> str:
+    """
+    Caller address. Behind Render's proxy the last X-Forwarded-For hop is the
+    one the proxy saw; earlier entries are client-supplied and can be spoofed.
+    """
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
@@ -0,0 +1,173 @@
+"""
+Cache of generated report files and their aggregates
+
+Entries are keyed by the normalized report filters (+ format) and tagged with a
+fingerprint of the calls in range (count + newest updated_at, no status
+filter). Any insert, update or delete of a call in range changes the
+fingerprint, so stale files are never served. Cache files live in REPORTS_DIR
+and are evicted least-recently-used once REPORT_CACHE_MAX_MB / _MAX_ENTRIES is
+exceeded. Every Report gets its own file, hardlinked to the cache file (copied
+where links are unsupported), so evicting or replacing a cache entry never
+breaks downloads of reports already generated.
+"""
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import CallEvaluation, Report, ReportCacheEntry, IS_SQLITE
+
+# Bump when the layout of generated files changes, so older cached files are not reused
+REPORT_CACHE_SCHEMA = 1
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def report_filter_key(report: Report) -> str:
+    """Normalized filters - the same selection always hashes the same way"""
+    return _digest([
+        REPORT_CACHE_SCHEMA,
+        (report.type or "custom").lower(),
+        report.agent_id or None,
+        report.agent_name or None,
+        report.classification or None,
+        report.start_date.isoformat() if report.start_date else None,
+        report.end_date.isoformat() if report.end_date else None,
+    ])
+
+
+def report_cache_key(report: Report) -> str:
+    return _digest([report_filter_key(report), report.format])
+
+
+def report_data_version(db: Session, report: Report) -> str:
+    """Fingerprint of every call in the report's agent/date range (index range scan)"""
+    query = db.query(func.count(CallEvaluation.id), func.max(CallEvaluation.updated_at))
+    if report.agent_id:
+        query = query.filter(CallEvaluation.agent_id == report.agent_id)
+    if report.start_date:
+        query = query.filter(CallEvaluation.created_at >= report.start_date)
+    if report.end_date:
+        query = query.filter(CallEvaluation.created_at <= report.end_date)
+    count, last_updated = query.one()
+    return f"{count}:{last_updated.isoformat() if last_updated else '-'}"
+
+
+def cached_file_path(report: Report, data_version: str) -> str:
+    """Versioned file name, so a regenerated file never overwrites one still being downloaded"""
+    name = f"cache_{report_cache_key(report)[:20]}_{_digest(data_version)[:10]}.{report.format}"
+    return os.path.join(settings.REPORTS_DIR, name)
+
+
+def attach_report_file(report: Report, cache_path: str) -> str:
+    """The report's own file ({id}.{format}) sharing the cache file's data - returns its path"""
+    path = os.path.join(settings.REPORTS_DIR, f"{report.id}.{report.format}")
+    part_path = f"{path}.part"
+    if os.path.exists(part_path):
+        os.remove(part_path)
+    try:
+        os.link(cache_path, part_path)
+    except OSError:
+        shutil.copyfile(cache_path, part_path)
+    os.replace(part_path, path)
+    return path
+
+
+def find_cached_summary(db: Session, report: Report, data_version: str) -> Optional[dict]:
+    """Aggregates for the same filters in any format (e.g. CSV requested after the PDF)"""
+    entry = db.query(ReportCacheEntry).filter(
+        ReportCacheEntry.filter_key == report_filter_key(report),
+        ReportCacheEntry.data_version == data_version
+    ).first()
+    return json.loads(entry.summary) if entry else None
+
+
+def use_cached_report(db: Session, report: Report, data_version: str) -> bool:
+    """
+    Complete report from a cached file when one matches its filters and data
+    version. Records the hit; the caller commits.
+    """
+    entry = db.get(ReportCacheEntry, report_cache_key(report))
+    if not entry or entry.data_version != data_version or not os.path.exists(entry.file_path):
+        return False
+
+    summary = json.loads(entry.summary)
+    report.file_path = attach_report_file(report, entry.file_path)
+    report.total_calls = summary["total_calls"]
+    report.avg_score = summary["avg_score"]
+    report.status = "completed"
+    report.error_message = None
+    report.cache_hit = True
+
+    table = ReportCacheEntry.__table__
+    db.execute(
+        update(table)
+        .where(table.c.cache_key == entry.cache_key)
+        .values(hit_count=table.c.hit_count + 1, last_used_at=datetime.utcnow())
+    )
+    return True
+
+
+def store_cached_report(db: Session, report: Report, data_version: str, temp_path: str, summary: dict) -> str:
+    """Move a finished file into place and (re)point the cache entry at it - the caller commits"""
+    final_path = cached_file_path(report, data_version)
+    os.replace(temp_path, final_path)
+
+    cache_key = report_cache_key(report)
+    previous = db.get(ReportCacheEntry, cache_key)
+    replaced_path = previous.file_path if previous and previous.file_path != final_path else None
+
+    now = datetime.utcnow()
+    values = {
+        "filter_key": report_filter_key(report),
+        "data_version": data_version,
+        "format": report.format,
+        "file_path": final_path,
+        "file_size": os.path.getsize(final_path),
+        "summary": json.dumps(summary),
+        "hit_count": 0,
+        "created_at": now,
+        "last_used_at": now,
+    }
+    table = ReportCacheEntry.__table__
+    insert = sqlite_insert if IS_SQLITE else pg_insert
+    stmt = insert(table).values(cache_key=cache_key, **values)
+    db.execute(stmt.on_conflict_do_update(index_elements=[table.c.cache_key], set_=values))
+
+    if replaced_path and os.path.exists(replaced_path):
+        os.remove(replaced_path)  # Stale cache file - reports made from it keep their own links
+    return final_path
+
+
+def evict_report_cache(db: Session):
+    """Drop least-recently-used entries (and their cache files) beyond the size/entry budget"""
+    budget = settings.REPORT_CACHE_MAX_MB * 1024 * 1024
+    entries = db.query(
+        ReportCacheEntry.cache_key, ReportCacheEntry.file_path, ReportCacheEntry.file_size
+    ).order_by(ReportCacheEntry.last_used_at.desc()).all()
+
+    used = 0
+    evicted = []
+    for index, (cache_key, file_path, file_size) in enumerate(entries):
+        used += file_size or 0
+        if used > budget or index >= settings.REPORT_CACHE_MAX_ENTRIES:
+            evicted.append(cache_key)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    if evicted:
+        db.query(ReportCacheEntry).filter(
+            ReportCacheEntry.cache_key.in_(evicted)
+        ).delete(synchronize_session=False)
+        db.commit()
+        print(f"✓ Evicted {len(evicted)} cached report file(s)")
@@ -0,0 +1,314 @@
+"""
+Server-side report generation (CSV / XLSX / PDF)
+- Aggregates (count, average, bands, per-agent) are computed in SQL
+- Call rows are streamed from the database straight into the file with
+  yield_per, so memory stays flat for reports over 100k+ calls
+- Files are written next to their final path and renamed when complete
+- Repeat requests for unchanged data reuse the cached file (report_cache.py)
+"""
+import csv
+import os
+import traceback
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from call_metrics import CLASSIFICATIONS, classification_filter
+from config import settings
+from database import CallEvaluation, Report, SessionLocal
+from report_cache import (
+    attach_report_file,
+    cached_file_path,
+    evict_report_cache,
+    find_cached_summary,
+    report_data_version,
+    store_cached_report,
+    use_cached_report,
+)
+
+REPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+
+REPORT_COLUMNS = ["Call ID", "Agent ID", "Agent Name", "Filename", "Score", "Classification",
+                  "Duration", "Status", "Created At (UTC)"]
+
+CLASSIFICATION_LABELS = {
+    "excellent": "Excellent",
+    "good": "Good",
+    "needs_improvement": "Needs Improvement",
+}
+
+# Rows fetched per round trip while streaming
+STREAM_BATCH_SIZE = 2000
+
+# Excel hard limit is 1,048,576 rows per sheet - leave room for the header block
+XLSX_MAX_ROWS_PER_SHEET = 1_000_000
+
+# Per-agent rows shown in the PDF summary
+PDF_MAX_AGENT_ROWS = 50
+
+
+def report_calls_query(db: Session, report: Report, *columns):
+    """Completed calls matching the report's agent/classification/date filters"""
+    query = db.query(*columns) if columns else db.query(CallEvaluation)
+    query = query.filter(CallEvaluation.status == "completed")
+    if report.agent_id:
+        query = query.filter(CallEvaluation.agent_id == report.agent_id)
+    if report.classification:
+        query = query.filter(classification_filter(CallEvaluation.score, report.classification))
+    if report.start_date:
+        query = query.filter(CallEvaluation.created_at >= report.start_date)
+    if report.end_date:
+        query = query.filter(CallEvaluation.created_at <= report.end_date)
+    return query
+
+
+def classify_score(score: Optional[float]) -> str:
+    if score is None:
+        return "N/A"
+    for name, (low, high) in CLASSIFICATIONS.items():
+        if (low is None or score >= low) and (high is None or score < high):
+            return CLASSIFICATION_LABELS[name]
+    return "N/A"
+
+
+def compute_report_summary(db: Session, report: Report) -> dict:
+    """Totals, score bands and per-agent breakdown in two aggregate queries"""
+    band_counts = [
+        func.sum(case((classification_filter(CallEvaluation.score, name), 1), else_=0))
+        for name in CLASSIFICATIONS
+    ]
+    row = report_calls_query(
+        db, report,
+        func.count(CallEvaluation.id),
+        func.avg(CallEvaluation.score),
+        func.min(CallEvaluation.score),
+        func.max(CallEvaluation.score),
+        func.avg(CallEvaluation.duration_seconds),
+        *band_counts
+    ).one()
+    total_calls, avg_score, min_score, max_score, avg_duration = row[:5]
+
+    calls = func.count(CallEvaluation.id)
+    agents = report_calls_query(
+        db, report,
+        CallEvaluation.agent_id,
+        func.max(CallEvaluation.agent_name),
+        calls,
+        func.avg(CallEvaluation.score)
+    ).group_by(CallEvaluation.agent_id).order_by(calls.desc()).limit(PDF_MAX_AGENT_ROWS).all()
+
+    return {
+        "total_calls": total_calls or 0,
+        "avg_score": round(avg_score, 1) if avg_score is not None else None,
+        "min_score": min_score,
+        "max_score": max_score,
+        "avg_duration_seconds": round(avg_duration) if avg_duration is not None else None,
+        "classifications": {name: count or 0 for name, count in zip(CLASSIFICATIONS, row[5:])},
+        "agents": [{
+            "agent_id": agent_id,
+            "agent_name": agent_name,
+            "calls": count,
+            "avg_score": round(score, 1) if score is not None else None
+        } for agent_id, agent_name, count, score in agents]
+    }
+
+
+def iter_report_rows(db: Session, report: Report) -> Iterator[list]:
+    """Stream report rows (oldest first) without loading the result set"""
+    query = report_calls_query(
+        db, report,
+        CallEvaluation.id, CallEvaluation.agent_id, CallEvaluation.agent_name, CallEvaluation.filename,
+        CallEvaluation.score, CallEvaluation.duration, CallEvaluation.status, CallEvaluation.created_at
+    ).order_by(CallEvaluation.created_at, CallEvaluation.id)
+
+    for call_id, agent_id, agent_name, filename, score, duration, status, created_at in query.yield_per(STREAM_BATCH_SIZE):
+        yield [
+            call_id,
+            agent_id or "N/A",
+            agent_name or "N/A",
+            filename,
+            score if score is not None else 0,
+            classify_score(score),
+            duration or "N/A",
+            status,
+            created_at.strftime("%Y-%m-%d %H:%M:%S") if created_at else ""
+        ]
+
+
+def _filter_lines(report: Report) -> list:
+    return [
+        ["Report Type:", (report.type or "custom").capitalize()],
+        ["Agent Filter:", report.agent_name or report.agent_id or "All Agents"],
+        ["Classification:", CLASSIFICATION_LABELS.get(report.classification, "All Classifications")],
+        ["Date Range:", f"{_format_date(report.start_date)} - {_format_date(report.end_date)}"],
+    ]
+
+
+def _format_date(value: Optional[datetime]) -> str:
+    return value.strftime("%Y-%m-%d") if value else "Any"
+
+
+def write_csv(path: str, db: Session, report: Report):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_COLUMNS)
+        for row in iter_report_rows(db, report):
+            writer.writerow(row)
+
+
+def write_xlsx(path: str, db: Session, report: Report, summary: dict):
+    from openpyxl import Workbook  # Optional dependency, only needed for XLSX
+
+    workbook = Workbook(write_only=True)  # Rows are flushed to disk as they are appended
+
+    def new_sheet(title: str):
+        sheet = workbook.create_sheet(title)
+        for column, width in zip("ABCDEFGHI", (38, 15, 20, 30, 10, 18, 12, 12, 20)):
+            sheet.column_dimensions[column].width = width
+        sheet.append(REPORT_COLUMNS)
+        return sheet
+
+    sheet = workbook.create_sheet("Summary")
+    sheet.append(["CallEval Performance Report"])
+    sheet.append(["Generated:", datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")])
+    for line in _filter_lines(report):
+        sheet.append(line)
+    sheet.append([])
+    sheet.append(["Total Calls:", summary["total_calls"]])
+    sheet.append(["Average Score:", summary["avg_score"]])
+
+    sheet = new_sheet("Calls")
+    sheet_rows = 0
+    sheet_number = 1
+    for row in iter_report_rows(db, report):
+        if sheet_rows >= XLSX_MAX_ROWS_PER_SHEET:
+            sheet_number += 1
+            sheet = new_sheet(f"Calls ({sheet_number})")
+            sheet_rows = 0
+        sheet.append(row)
+        sheet_rows += 1
+
+    workbook.save(path)
+
+
+def write_pdf(path: str, report: Report, summary: dict):
+    """One-page style summary - per-call listings belong in CSV/XLSX"""
+    from reportlab.lib import colors  # Optional dependency, only needed for PDF
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    header_style = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#22C55E")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+    ])
+
+    story = [
+        Paragraph("CallEval Performance Report", styles["Title"]),
+        Paragraph(f"Generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}", styles["Normal"]),
+    ]
+    story += [Paragraph(f"{label} {value}", styles["Normal"]) for label, value in _filter_lines(report)]
+    story.append(Spacer(1, 12))
+
+    def fmt(value):
+        return "N/A" if value is None else value
+
+    totals = [
+        ["Total Calls", "Average Score", "Lowest", "Highest", "Avg Duration (s)"],
+        [summary["total_calls"], fmt(summary["avg_score"]), fmt(summary["min_score"]),
+         fmt(summary["max_score"]), fmt(summary["avg_duration_seconds"])],
+    ]
+    story += [Table(totals, style=header_style), Spacer(1, 12)]
+
+    bands = [["Classification", "Calls"]] + [
+        [CLASSIFICATION_LABELS[name], count] for name, count in summary["classifications"].items()
+    ]
+    story += [Table(bands, style=header_style), Spacer(1, 12)]
+
+    if summary["agents"]:
+        agents = [["Agent", "Calls", "Average Score"]] + [
+            [agent["agent_name"] or agent["agent_id"] or "Unassigned", agent["calls"], fmt(agent["avg_score"])]
+            for agent in summary["agents"]
+        ]
+        story += [Paragraph("Per-agent breakdown", styles["Heading3"]), Table(agents, style=header_style)]
+
+    story += [Spacer(1, 48), Paragraph("Approved by: ______________________", styles["Normal"]),
+              Paragraph("QA Specialist", styles["Normal"])]
+
+    SimpleDocTemplate(path, pagesize=A4, title="CallEval Performance Report").build(story)
+
+
+def report_file_name(report: Report) -> str:
+    """Download name, e.g. CallEval_Monthly_Report_2024-05-31.pdf"""
+    created = (report.created_at or datetime.utcnow()).strftime("%Y-%m-%d")
+    return f"CallEval_{(report.type or 'custom').capitalize()}_Report_{created}.{report.format}"
+
+
+def generate_report(report_id: str):
+    """Background job: compute, write and attach the report file (or reuse a cached one)"""
+    db = SessionLocal()
+    report = None
+    temp_path = None
+    try:
+        report = db.query(Report).filter(Report.id == report_id).first()
+        if not report:
+            return
+
+        started = datetime.utcnow()
+        data_version = report_data_version(db, report)
+        if use_cached_report(db, report, data_version):
+            db.commit()
+            print(f"✅ Report {report.id} ({report.format}) served from cache")
+            return
+
+        summary = find_cached_summary(db, report, data_version) or compute_report_summary(db, report)
+
+        os.makedirs(settings.REPORTS_DIR, exist_ok=True)
+        temp_path = f"{cached_file_path(report, data_version)}.{report.id}.part"
+
+        if report.format == "csv":
+            write_csv(temp_path, db, report)
+        elif report.format == "xlsx":
+            write_xlsx(temp_path, db, report, summary)
+        else:
+            write_pdf(temp_path, report, summary)
+
+        cache_path = store_cached_report(db, report, data_version, temp_path, summary)
+        report.file_path = attach_report_file(report, cache_path)
+        report.total_calls = summary["total_calls"]
+        report.avg_score = summary["avg_score"]
+        report.status = "completed"
+        report.error_message = None
+        report.cache_hit = False
+        db.commit()
+
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        print(f"✅ Report {report.id} ({report.format}) generated: {summary['total_calls']} calls in {elapsed:.1f}s")
+
+        try:
+            evict_report_cache(db)
+        except Exception as e:  # The report itself is done, eviction retries next time
+            db.rollback()
+            print(f"⚠️ Report cache eviction failed: {e}")
+
+    except Exception as e:
+        print(f"❌ Report {report_id} generation failed: {e}")
+        traceback.print_exc()
+        db.rollback()
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        if report is not None:
+            report.status = "failed"
+            report.error_message = str(e)
+            db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,315 @@
+"""
+Resumable uploads (tus 1.0 core protocol, /api/upload/resumable)
+- POST creates a session: Upload-Length plus Upload-Metadata with filename,
+  agent_id and the sha256 (hex) of the whole file. The call id is reserved and
+  an empty file is created at its final path in UPLOAD_DIR
+- PATCH (Content-Type application/offset+octet-stream) appends at
+  Upload-Offset, writing straight into that file. The data is fsynced and the
+  stored offset advanced every RESUMABLE_CHECKPOINT_BYTES and when the request
+  ends - also when the client drops mid-chunk - so the stored offset never
+  runs ahead of what is on disk
+- An optional Upload-Checksum ("sha256 <base64>") verifies one PATCH body;
+  the offset only moves once it matches (460 otherwise)
+- HEAD reports the offset to resume from
+- The call row is created, and processing enqueued, only when the last byte
+  has arrived and the file's SHA-256 matches the declared one
+- gc_resumable_uploads() (maintenance job) removes partial files and sessions
+  untouched for RESUMABLE_UPLOAD_EXPIRY_HOURS
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+
+from config import settings
+from database import Agent, CallEvaluation, SessionLocal, UploadSession
+from upload_storage import (
+    SNIFF_BYTES, discard, file_sha256, new_call_id, require_format, stored_filename, too_large,
+)
+
+TUS_VERSION = "1.0.0"
+OFFSET_CONTENT_TYPE = "application/offset+octet-stream"
+HTTP_CHECKSUM_MISMATCH = 460  # tus checksum extension
+
+SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+
+# Sessions with a PATCH in progress on this instance
+_in_flight = set()
+
+
+def parse_metadata(header: Optional[str]) -> Dict[str, str]:
+    """Upload-Metadata: comma-separated "key base64(value)" pairs"""
+    metadata = {}
+    for pair in (header or "").split(","):
+        key, _, value = pair.strip().partition(" ")
+        if not key:
+            continue
+        try:
+            metadata[key] = base64.b64decode(value.strip(), validate=True).decode("utf-8") if value else ""
+        except (binascii.Error, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail=f"Invalid Upload-Metadata value for {key}")
+    return metadata
+
+
+def _parse_checksum(header: Optional[str]) -> Optional[bytes]:
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(" ")
+    if algorithm.lower() != "sha256":
+        raise HTTPException(status_code=400, detail="Only sha256 Upload-Checksum is supported")
+    try:
+        return base64.b64decode(value.strip(), validate=True)
+    except binascii.Error:
+        raise HTTPException(status_code=400, detail="Invalid Upload-Checksum")
+
+
+def _expires_at(session: UploadSession) -> datetime:
+    return (session.updated_at or session.created_at) + timedelta(hours=settings.RESUMABLE_UPLOAD_EXPIRY_HOURS)
+
+
+def tus_headers(session: UploadSession) -> Dict[str, str]:
+    headers = {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Offset": str(session.upload_offset),
+        "Upload-Length": str(session.upload_length),
+        "Cache-Control": "no-store",
+    }
+    if session.status == "uploading":
+        headers["Upload-Expires"] = format_datetime(_expires_at(session).replace(tzinfo=timezone.utc), usegmt=True)
+    if session.status == "completed":
+        headers["X-Call-Id"] = session.call_id
+    return headers
+
+
+def create_session(db: Session, upload_length: int, metadata: Dict[str, str], current_user) -> UploadSession:
+    if upload_length <= 0:
+        raise HTTPException(status_code=400, detail="Upload-Length must be positive")
+    if upload_length > settings.MAX_FILE_SIZE:
+        raise too_large()
+    filename = metadata.get("filename")
+    agent_id = metadata.get("agent_id")
+    expected_sha256 = (metadata.get("sha256") or "").lower()
+    if not filename or not agent_id:
+        raise HTTPException(status_code=400, detail="Upload-Metadata must include filename and agent_id")
+    if not SHA256_HEX.match(expected_sha256):
+        raise HTTPException(status_code=400, detail="Upload-Metadata must include the file's sha256 (hex)")
+    if not db.query(Agent.agentId).filter(Agent.agentId == agent_id).first():
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    call_id = new_call_id()
+    file_path = os.path.join(settings.UPLOAD_DIR, stored_filename(call_id, filename, None))
+    open(file_path, "wb").close()
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        call_id=call_id,
+        filename=filename,
+        file_path=file_path,
+        agent_id=agent_id,
+        upload_length=upload_length,
+        upload_offset=0,
+        expected_sha256=expected_sha256,
+        created_by=current_user.id,
+    )
+    db.add(session)
+    db.commit()
+    return session
+
+
+def get_session(db: Session, upload_id: str, current_user) -> UploadSession:
+    """The caller's session (admins see all); expired partial uploads count as gone"""
+    session = db.query(UploadSession).filter(UploadSession.id == upload_id).first()
+    if not session or (session.created_by != current_user.id and current_user.role != "Admin"):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if session.status == "uploading" and _expires_at(session) < datetime.utcnow():
+        raise HTTPException(status_code=404, detail="Upload expired")
+    if session.status == "failed":
+        raise HTTPException(status_code=410, detail=session.error_message or "Upload failed")
+    return session
+
+
+def fail_session(db: Session, session: UploadSession, message: str):
+    session.status = "failed"
+    session.error_message = message
+    db.commit()
+    discard(session.file_path)
+
+
+def _save_offset(db: Session, session: UploadSession, old_offset: int, new_offset: int):
+    """Advance the stored offset, only from the value this PATCH started at (another instance may race)"""
+    updated = db.query(UploadSession).filter(
+        UploadSession.id == session.id,
+        UploadSession.status == "uploading",
+        UploadSession.upload_offset == old_offset
+    ).update({"upload_offset": new_offset, "updated_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    if not updated:
+        raise HTTPException(status_code=409, detail="Upload was modified concurrently")
+
+
+def _fsync(out):
+    out.flush()
+    os.fsync(out.fileno())
+
+
+async def append_chunk(db: Session, session: UploadSession, request: Request):
+    """Handle one PATCH: stream the body into the file at Upload-Offset"""
+    if request.headers.get("content-type", "").split(";")[0].strip().lower() != OFFSET_CONTENT_TYPE:
+        raise HTTPException(status_code=415, detail=f"Content-Type must be {OFFSET_CONTENT_TYPE}")
+    try:
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Missing or invalid Upload-Offset")
+    if session.status != "uploading":
+        raise HTTPException(status_code=409, detail=f"Upload is already {session.status}")
+    if offset != session.upload_offset:
+        raise HTTPException(status_code=409, detail="Upload-Offset does not match", headers=tus_headers(session))
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and offset + int(content_length) > session.upload_length:
+        raise HTTPException(status_code=413, detail="Chunk runs past Upload-Length")
+    checksum = _parse_checksum(request.headers.get("upload-checksum"))
+    if session.id in _in_flight:
+        raise HTTPException(status_code=423, detail="Another request is writing to this upload")
+
+    _in_flight.add(session.id)
+    try:
+        await _receive_into(db, session, request, offset, checksum)
+    finally:
+        _in_flight.discard(session.id)
+
+    db.refresh(session)
+    if session.audio_format is None and session.upload_offset >= min(SNIFF_BYTES, session.upload_length):
+        with open(session.file_path, "rb") as source:
+            head = source.read(SNIFF_BYTES)
+        try:
+            session.audio_format = require_format(head)
+        except HTTPException as e:
+            fail_session(db, session, e.detail)
+            raise
+        db.commit()
+
+
+async def _receive_into(db: Session, session: UploadSession, request: Request, offset: int, checksum: Optional[bytes]):
+    """
+    Write the request body at offset. Without a chunk checksum the data is
+    checkpointed as it arrives; with one, only after the whole body matched.
+    """
+    digest = hashlib.sha256() if checksum is not None else None
+    position = durable = offset
+    buffer = bytearray()
+    disconnected = False
+    out = open(session.file_path, "r+b")
+    try:
+        out.seek(offset)
+        try:
+            async for chunk in request.stream():
+                if position + len(buffer) + len(chunk) > session.upload_length:
+                    raise HTTPException(status_code=413, detail="Chunk runs past Upload-Length")
+                buffer += chunk
+                if digest is not None:
+                    digest.update(chunk)
+                if len(buffer) >= settings.UPLOAD_CHUNK_SIZE:
+                    await asyncio.to_thread(out.write, buffer)
+                    position += len(buffer)
+                    buffer = bytearray()
+                    if digest is None and position - durable >= settings.RESUMABLE_CHECKPOINT_BYTES:
+                        await asyncio.to_thread(_fsync, out)
+                        _save_offset(db, session, durable, position)
+                        durable = position
+        except ClientDisconnect:
+            disconnected = True
+
+        if digest is not None:
+            if disconnected:
+                return
+            if digest.digest() != checksum:
+                raise HTTPException(status_code=HTTP_CHECKSUM_MISMATCH, detail="Chunk checksum mismatch")
+        if buffer:
+            await asyncio.to_thread(out.write, buffer)
+            position += len(buffer)
+        if position > durable:
+            await asyncio.to_thread(_fsync, out)
+            _save_offset(db, session, durable, position)
+    finally:
+        out.close()
+
+
+async def complete_session(db: Session, session: UploadSession) -> Optional[CallEvaluation]:
+    """
+    Once every byte is in: verify the whole-file SHA-256 and create the call
+    (queued) in the same transaction that marks the session completed.
+    Returns None while the upload is still incomplete.
+    """
+    if session.status != "uploading" or session.upload_offset < session.upload_length:
+        return None
+    digest = await asyncio.to_thread(file_sha256, session.file_path)
+    if digest != session.expected_sha256:
+        fail_session(db, session, "Checksum mismatch - upload again")
+        raise HTTPException(status_code=HTTP_CHECKSUM_MISMATCH, detail="File checksum does not match the declared sha256")
+    agent = db.query(Agent).filter(Agent.agentId == session.agent_id).first()
+    if not agent:
+        fail_session(db, session, "Agent not found")
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    claimed = db.query(UploadSession).filter(
+        UploadSession.id == session.id, UploadSession.status == "uploading"
+    ).update({"status": "completed", "updated_at": datetime.utcnow()}, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Upload was completed concurrently")
+    call = CallEvaluation(
+        id=session.call_id,
+        filename=session.filename,
+        file_path=session.file_path,
+        file_size=session.upload_length,
+        file_sha256=digest,
+        status="processing",
+        analysis_status="queued",
+        agent_id=agent.agentId,
+        agent_name=agent.agentName
+    )
+    db.add(call)
+    db.commit()
+    db.refresh(session)
+    return call
+
+
+def delete_session(db: Session, session: UploadSession):
+    """tus termination: drop a partial upload (completed ones belong to their call now)"""
+    if session.status == "completed":
+        raise HTTPException(status_code=409, detail="Upload already completed")
+    if session.id in _in_flight:
+        raise HTTPException(status_code=423, detail="Another request is writing to this upload")
+    discard(session.file_path)
+    db.delete(session)
+    db.commit()
+
+
+def gc_resumable_uploads():
+    """Maintenance job: remove sessions (and partial files) untouched for RESUMABLE_UPLOAD_EXPIRY_HOURS"""
+    cutoff = datetime.utcnow() - timedelta(hours=settings.RESUMABLE_UPLOAD_EXPIRY_HOURS)
+    db = SessionLocal()
+    try:
+        stale = db.query(UploadSession).filter(UploadSession.updated_at < cutoff).all()
+        removed = 0
+        for session in stale:
+            if session.id in _in_flight:
+                continue
+            if session.status != "completed":
+                discard(session.file_path)
+                removed += 1
+            db.delete(session)
+        db.commit()
+        if stale:
+            print(f"✓ Resumable upload GC: {len(stale)} session(s) expired, {removed} partial file(s) removed")
+    finally:
+        db.close()
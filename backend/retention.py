@@ -0,0 +1,214 @@
+"""
+Retention enforcement driven by Settings.retention_period (months)
+Deletes (or archives) audio files and call rows past the retention window in
+small batches, then compacts the database and reports reclaimed space
+
+One-time SQLite setup for compaction (API stopped):
+    python retention.py --enable-incremental-vacuum
+"""
+import os
+import shutil
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import load_only
+
+from config import settings
+from database import SessionLocal, CallEvaluation, Settings, engine
+from call_lifecycle import sync_call_aggregates
+from search_index import remove_call_segments
+from audit_logger import log_retention_run
+
+
+def subtract_months(dt: datetime, months: int) -> datetime:
+    """Same day-of-month `months` earlier, clamped to the end of shorter months"""
+    year, month = divmod(dt.year * 12 + (dt.month - 1) - months, 12)
+    month += 1
+    for day in (dt.day, 30, 29, 28):
+        try:
+            return dt.replace(year=year, month=month, day=day)
+        except ValueError:
+            continue
+
+
+def _database_size_bytes() -> int:
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            page_count = conn.execute(text("PRAGMA page_count")).scalar()
+            page_size = conn.execute(text("PRAGMA page_size")).scalar()
+            return page_count * page_size
+        if engine.dialect.name == "postgresql":
+            return conn.execute(text("SELECT pg_database_size(current_database())")).scalar()
+    return 0
+
+
+# Pages freed per incremental_vacuum step (each step is a short write transaction)
+VACUUM_STEP_PAGES = 2000
+
+
+def _compact_database():
+    """
+    Return freed pages to the filesystem without holding long locks.
+    SQLite: only when the file already uses incremental auto-vacuum, freeing
+    pages in small throttled incremental_vacuum steps. Converting an existing
+    file needs a full VACUUM - see enable_incremental_vacuum().
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name == "sqlite":
+            if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+                print("⚠ Retention: freed pages stay in the SQLite file (auto_vacuum is not INCREMENTAL). "
+                      "Run `python retention.py --enable-incremental-vacuum` in a maintenance window to enable compaction.")
+                return
+
+            # executescript steps the pragma to completion - a plain execute() frees only one page
+            sqlite_conn = conn.connection.driver_connection
+            free_pages = conn.execute(text("PRAGMA freelist_count")).scalar()
+            while free_pages > 0:
+                sqlite_conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})")
+                remaining = conn.execute(text("PRAGMA freelist_count")).scalar()
+                if remaining >= free_pages:
+                    break  # No progress (another connection holds the file) - next run continues
+                free_pages = remaining
+                time.sleep(settings.RETENTION_BATCH_PAUSE_SECONDS)
+
+        elif engine.dialect.name == "postgresql":
+            conn.execute(text("VACUUM (ANALYZE) call_evaluations, call_segments"))
+
+
+def enable_incremental_vacuum() -> bool:
+    """
+    One-time maintenance step (SQLite only): switch the file to incremental
+    auto-vacuum. This runs a full VACUUM, which holds an exclusive lock for the
+    whole rebuild and can need up to twice the database size in free space -
+    run it with the API stopped. Refuses when the disk lacks that space.
+    """
+    if engine.dialect.name != "sqlite":
+        print("⚠ Incremental vacuum only applies to SQLite")
+        return False
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+            print("✓ Incremental auto-vacuum already enabled")
+            return True
+
+        db_size = _database_size_bytes()
+        db_dir = os.path.dirname(os.path.abspath(engine.url.database))
+        free = shutil.disk_usage(db_dir).free
+        if free < db_size * 2:
+            print(f"❌ Not enough free space for VACUUM: {free / (1024 * 1024):.0f} MB free, "
+                  f"needs about {db_size * 2 / (1024 * 1024):.0f} MB")
+            return False
+
+        print(f"🔧 Running full VACUUM on {db_size / (1024 * 1024):.0f} MB database...")
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+            print("❌ VACUUM did not switch auto_vacuum - is another process using the database?")
+            return False
+        print("✅ Incremental auto-vacuum enabled")
+        return True
+
+
+def _dispose_audio_file(file_path: str) -> int:
+    """Delete or archive one recording, returns bytes freed on the data disk"""
+    if not file_path or not os.path.exists(file_path):
+        return 0
+
+    size = os.path.getsize(file_path)
+    try:
+        if settings.RETENTION_ARCHIVE_DIR:
+            os.makedirs(settings.RETENTION_ARCHIVE_DIR, exist_ok=True)
+            shutil.move(file_path, os.path.join(settings.RETENTION_ARCHIVE_DIR, os.path.basename(file_path)))
+        else:
+            os.remove(file_path)
+        return size
+    except Exception as e:
+        print(f"⚠ Failed to remove audio file {file_path}: {e}")
+        return 0
+
+
+def enforce_retention() -> dict:
+    """
+    Remove calls older than the configured retention period.
+    Each batch is its own short transaction followed by a pause, so uploads and
+    the pipeline can take the write lock in between.
+    """
+    db = SessionLocal()
+    try:
+        settings_record = db.query(Settings).first()
+        months = settings_record.retention_period if settings_record else 12
+        if not months or months <= 0:
+            print("⚠ Retention disabled (retention_period <= 0)")
+            return {"calls_deleted": 0}
+
+        cutoff = subtract_months(datetime.utcnow(), months)
+        db_size_before = _database_size_bytes()
+
+        calls_deleted = 0
+        audio_bytes = 0
+
+        while True:
+            # Only what deleting needs (segments, aggregates, tombstone, file) - not transcripts/results
+            calls = db.query(CallEvaluation).options(load_only(
+                CallEvaluation.id,
+                CallEvaluation.file_path,
+                CallEvaluation.agent_id,
+                CallEvaluation.stats_agent_id,
+                CallEvaluation.stats_score,
+                CallEvaluation.rollup_state,
+                CallEvaluation.created_at
+            )).filter(
+                CallEvaluation.created_at < cutoff
+            ).order_by(CallEvaluation.created_at).limit(settings.RETENTION_BATCH_SIZE).all()
+
+            if not calls:
+                break
+
+            file_paths = []
+            for call in calls:
+                file_paths.append(call.file_path)
+                remove_call_segments(db, call.id)
+                sync_call_aggregates(db, call, removed=True)
+                db.delete(call)
+            db.commit()
+
+            # Rows are gone first, so nothing can reference a file we are about to remove
+            for file_path in file_paths:
+                audio_bytes += _dispose_audio_file(file_path)
+
+            calls_deleted += len(calls)
+            print(f"🗑  Retention: removed {calls_deleted} calls so far...")
+            time.sleep(settings.RETENTION_BATCH_PAUSE_SECONDS)
+
+        db.close()
+
+        if calls_deleted:
+            _compact_database()
+
+        db_bytes = max(0, db_size_before - _database_size_bytes())
+        summary = {
+            "retention_months": months,
+            "cutoff": cutoff.isoformat(),
+            "calls_deleted": calls_deleted,
+            "audio_bytes_reclaimed": audio_bytes,
+            "database_bytes_reclaimed": db_bytes,
+            "archived": bool(settings.RETENTION_ARCHIVE_DIR)
+        }
+
+        if calls_deleted:
+            log_retention_run(summary)
+        print(f"✅ Retention complete: {calls_deleted} calls removed, "
+              f"{(audio_bytes + db_bytes) / (1024 * 1024):.1f} MB reclaimed")
+        return summary
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--enable-incremental-vacuum" in sys.argv:
+        sys.exit(0 if enable_incremental_vacuum() else 1)
+    enforce_retention()
@@ -0,0 +1,130 @@
+"""
+Daily and hourly rollups of completed calls per agent (dashboard trends)
+
+Each call remembers its contribution in rollup_state, so re-scores and deletes
+subtract exactly what was added. Buckets are updated with a dialect upsert in
+the same transaction as the call change, so reads never scan the calls table.
+"""
+import json
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from call_metrics import SCORECARD_METRICS, passed_metrics
+from database import CallEvaluation, DailyRollup, HourlyRollup, IS_SQLITE
+
+ROLLUP_MODELS = {
+    "daily": DailyRollup,
+    "hourly": HourlyRollup,
+}
+
+
+def truncate_bucket(moment: datetime, granularity: str) -> datetime:
+    if granularity == "hourly":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _contribution(call: CallEvaluation) -> Optional[dict]:
+    """What a call adds to the rollups, None if it does not count"""
+    if call.status != "completed" or call.score is None or call.created_at is None:
+        return None
+    return {
+        "agent_id": call.agent_id or "",
+        "created_at": call.created_at.isoformat(),
+        "score": call.score,
+        "duration": call.duration_seconds or 0,
+        "passes": passed_metrics(call.binary_scores)
+    }
+
+
+def _upsert(db: Session, model, bucket_start: datetime, agent_id: str, deltas: dict):
+    table = model.__table__
+    insert = sqlite_insert if IS_SQLITE else pg_insert
+    stmt = insert(table).values(bucket_start=bucket_start, agent_id=agent_id, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.bucket_start, table.c.agent_id],
+        set_={column: table.c[column] + stmt.excluded[column] for column in deltas}
+    )
+    db.execute(stmt)
+
+
+def _apply(db: Session, contribution: dict, sign: int):
+    deltas = {
+        "call_count": sign,
+        "score_sum": sign * contribution["score"],
+        "duration_sum": sign * contribution["duration"],
+    }
+    for metric in contribution["passes"]:
+        deltas[f"pass_{metric}"] = sign
+
+    created_at = datetime.fromisoformat(contribution["created_at"])
+    for granularity, model in ROLLUP_MODELS.items():
+        _upsert(db, model, truncate_bucket(created_at, granularity), contribution["agent_id"], deltas)
+
+
+def sync_call_rollups(db: Session, call: CallEvaluation, removed: bool = False):
+    """Move the call's contribution in the rollups to match its state - the caller commits"""
+    old = json.loads(call.rollup_state) if call.rollup_state else None
+    new = None if removed else _contribution(call)
+    if old == new:
+        return
+
+    if old:
+        _apply(db, old, -1)
+    if new:
+        _apply(db, new, 1)
+
+    if not removed:
+        call.rollup_state = json.dumps(new) if new else None
+
+
+def backfill_rollups(db: Session, batch_size: int = 500):
+    """Build rollups for completed calls that predate them (only runs when rollups are empty)"""
+    if db.query(DailyRollup).first() is not None:
+        return
+
+    calls = CallEvaluation.__table__
+    added = 0
+    last_id = ""
+    while True:
+        batch = db.query(CallEvaluation).filter(
+            CallEvaluation.id > last_id,
+            CallEvaluation.status == "completed",
+            CallEvaluation.rollup_state == None
+        ).order_by(CallEvaluation.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        last_id = batch[-1].id
+        for call in batch:
+            contribution = _contribution(call)
+            if contribution:
+                _apply(db, contribution, 1)
+                # Core update: a backfill is not a change to the call (keeps updated_at/ETags)
+                db.execute(update(calls).where(calls.c.id == call.id).values(rollup_state=json.dumps(contribution)))
+                added += 1
+        db.commit()
+        db.expunge_all()
+
+    if added:
+        print(f"✓ Backfilled rollups for {added} completed calls")
+
+
+def serialize_bucket(bucket_start: datetime, call_count, score_sum, duration_sum, passes) -> dict:
+    call_count = call_count or 0
+    return {
+        "bucket_start": bucket_start.isoformat(),
+        "call_count": call_count,
+        "avg_score": round(score_sum / call_count, 1) if call_count else None,
+        "avg_duration_seconds": round(duration_sum / call_count) if call_count else None,
+        "pass_counts": {metric: count or 0 for metric, count in zip(SCORECARD_METRICS, passes)},
+        "pass_rates": {
+            metric: round((count or 0) / call_count, 3) if call_count else None
+            for metric, count in zip(SCORECARD_METRICS, passes)
+        },
+    }
@@ -0,0 +1,243 @@
+"""
+Full-text search over censored transcript segments
+SQLite: FTS5 external-content table kept in sync with call_segments by triggers
+PostgreSQL: GIN index on to_tsvector('english', text)
+"""
+import html
+import json
+import re
+from typing import List, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from database import CallEvaluation, CallSegment
+
+FTS_TABLE = "call_segments_fts"
+
+# The database marks matches with these private-use characters; snippets are
+# HTML-escaped afterwards and only then get real <mark> tags
+MATCH_START = "\ue000"
+MATCH_END = "\ue001"
+
+# Words of context around the first match in LIKE-fallback snippets (FTS5 uses 16 tokens)
+SNIPPET_WORDS = 16
+
+# Set by ensure_search_index(); SQLite builds without FTS5 fall back to LIKE
+_fts5_available = False
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='call_segments',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS call_segments_ai AFTER INSERT ON call_segments BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS call_segments_ad AFTER DELETE ON call_segments BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS call_segments_au AFTER UPDATE ON call_segments BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+_POSTGRES_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_call_segments_text_fts "
+    "ON call_segments USING GIN (to_tsvector('english', text))",
+]
+
+
+def ensure_search_index(engine):
+    """Create the FTS structures - call once in startup after create_tables()"""
+    global _fts5_available
+
+    ddl = _SQLITE_DDL if engine.dialect.name == "sqlite" else _POSTGRES_DDL
+    try:
+        with engine.begin() as conn:
+            for statement in ddl:
+                conn.execute(text(statement))
+        _fts5_available = True
+        print("✓ Transcript search index created/verified")
+    except OperationalError as e:
+        _fts5_available = False
+        print(f"⚠ Full-text index unavailable ({e}), transcript search will use LIKE")
+
+
+def index_call_segments(db: Session, call_id: str, segments: List[Dict], speaker_roles: Optional[Dict] = None):
+    """
+    Replace the indexed segments of a call (caller commits).
+    Segments must already be profanity-censored.
+    """
+    speaker_roles = speaker_roles or {}
+
+    remove_call_segments(db, call_id)
+    db.bulk_insert_mappings(CallSegment, [
+        {
+            "call_id": call_id,
+            "segment_index": i,
+            "speaker": seg.get("speaker"),
+            "speaker_role": speaker_roles.get(seg.get("speaker"), "unknown"),
+            "start": seg.get("start"),
+            "end": seg.get("end"),
+            "text": seg.get("text", "")
+        }
+        for i, seg in enumerate(segments)
+        if seg.get("text")
+    ])
+
+
+def remove_call_segments(db: Session, call_id: str):
+    """Drop a call's segments from the index (caller commits)"""
+    db.query(CallSegment).filter(CallSegment.call_id == call_id).delete(synchronize_session=False)
+
+
+def backfill_search_index(db: Session, batch_size: int = 200):
+    """Index segments of calls processed before search existed - only runs on an empty index"""
+    if db.query(CallSegment.id).first() is not None:
+        return
+
+    indexed = 0
+    last_id = ""
+    while True:
+        calls = db.query(CallEvaluation.id, CallEvaluation.scores, CallEvaluation.speakers).filter(
+            CallEvaluation.id > last_id,
+            CallEvaluation.scores != None
+        ).order_by(CallEvaluation.id).limit(batch_size).all()
+
+        if not calls:
+            break
+
+        for call_id, scores, speakers in calls:
+            try:
+                segments = json.loads(scores).get("segments") or []
+                roles = json.loads(speakers) if speakers else {}
+            except (json.JSONDecodeError, ValueError, TypeError, AttributeError):
+                continue
+            index_call_segments(db, call_id, segments, roles)
+            indexed += 1
+
+        db.commit()
+        last_id = calls[-1][0]
+
+    if indexed:
+        print(f"✓ Indexed transcripts of {indexed} existing calls for search")
+
+
+def _fts5_query(q: str, mode: str) -> str:
+    """Quote user input so FTS5 operators (AND, NEAR, *, ...) are treated as text"""
+    if mode == "words":
+        return " ".join('"' + token.replace('"', '""') + '"' for token in q.split())
+    return '"' + q.replace('"', '""') + '"'
+
+
+def search_segments(
+    db: Session,
+    q: str,
+    agent_id: Optional[str] = None,
+    speaker_role: Optional[str] = None,
+    mode: str = "phrase",
+    sort: str = "recent",
+    limit: int = 20,
+    offset: int = 0
+) -> List[Dict]:
+    """
+    Search censored segment text.
+    agent_id restricts results to one agent's calls (role-based filtering in SQL).
+    sort="recent" walks the index newest-first and stops after `limit` hits, which
+    stays fast even for very common phrases; sort="relevance" ranks every match.
+    Returns up to `limit` rows; snippets are HTML-escaped text with matches in <mark></mark>.
+    """
+    dialect = db.get_bind().dialect.name
+    params = {"limit": limit, "offset": offset}
+    filters = ""
+
+    if agent_id is not None:
+        filters += " AND c.agent_id = :agent_id"
+        params["agent_id"] = agent_id
+    if speaker_role:
+        filters += " AND s.speaker_role = :speaker_role"
+        params["speaker_role"] = speaker_role
+
+    select_columns = """
+        s.call_id, s.segment_index, s.speaker, s.speaker_role, s.start, s."end",
+        c.filename, c.agent_id, c.agent_name, c.created_at
+    """
+
+    highlighted = True  # Database-side highlighting (FTS5 snippet / ts_headline)
+    if dialect == "sqlite" and _fts5_available:
+        params["q"] = _fts5_query(q, mode)
+        params["mark_start"], params["mark_end"] = MATCH_START, MATCH_END
+        order_by = "f.rank" if sort == "relevance" else "f.rowid DESC"
+        sql = f"""
+            SELECT {select_columns},
+                   snippet({FTS_TABLE}, 0, :mark_start, :mark_end, '…', 16) AS snippet
+            FROM {FTS_TABLE} f
+            JOIN call_segments s ON s.id = f.rowid
+            JOIN call_evaluations c ON c.id = s.call_id
+            WHERE {FTS_TABLE} MATCH :q {filters}
+            ORDER BY {order_by}
+            LIMIT :limit OFFSET :offset
+        """
+    elif dialect == "postgresql":
+        params["q"] = q
+        params["headline_options"] = f"StartSel={MATCH_START}, StopSel={MATCH_END}, MaxWords=24, MinWords=8"
+        tsquery = "phraseto_tsquery('english', :q)" if mode == "phrase" else "plainto_tsquery('english', :q)"
+        order_by = f"ts_rank(to_tsvector('english', s.text), {tsquery}) DESC" if sort == "relevance" else "s.id DESC"
+        sql = f"""
+            SELECT {select_columns},
+                   ts_headline('english', s.text, {tsquery},
+                               :headline_options) AS snippet
+            FROM call_segments s
+            JOIN call_evaluations c ON c.id = s.call_id
+            WHERE to_tsvector('english', s.text) @@ {tsquery} {filters}
+            ORDER BY {order_by}
+            LIMIT :limit OFFSET :offset
+        """
+    else:
+        # No full-text support - substring scan, newest segments first
+        highlighted = False
+        params["q"] = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        sql = f"""
+            SELECT {select_columns}, s.text AS snippet
+            FROM call_segments s
+            JOIN call_evaluations c ON c.id = s.call_id
+            WHERE s.text LIKE :q ESCAPE '\\' {filters}
+            ORDER BY s.id DESC
+            LIMIT :limit OFFSET :offset
+        """
+
+    rows = db.execute(text(sql), params).mappings().all()
+    results = []
+    for row in rows:
+        result = dict(row)
+        marked = result["snippet"] if highlighted else _mark_substring(result["snippet"], q)
+        result["snippet"] = _render_snippet(marked)
+        results.append(result)
+    return results
+
+
+def _mark_substring(segment_text: str, q: str) -> str:
+    """LIKE fallback: mark every case-insensitive occurrence of q, trimmed to the words around the first"""
+    pattern = re.compile(re.escape(q), re.IGNORECASE)
+    first = pattern.search(segment_text)
+    if not first:
+        return segment_text
+
+    before = segment_text[:first.start()].split(" ")
+    after = segment_text[first.end():].split(" ")
+    context = max(1, (SNIPPET_WORDS - len(q.split())) // 2)
+    start = len(segment_text[:first.start()]) - len(" ".join(before[-context:]))
+    end = first.end() + len(" ".join(after[:context + 1]))
+    window = segment_text[start:end]
+    window = pattern.sub(lambda m: f"{MATCH_START}{m.group(0)}{MATCH_END}", window)
+    return ("…" if start > 0 else "") + window + ("…" if end < len(segment_text) else "")
+
+
+def _render_snippet(marked: str) -> str:
+    """HTML-escape snippet text, then turn the match markers into <mark> tags"""
+    return html.escape(marked, quote=False).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>")
@@ -0,0 +1,96 @@
+"""
+JSON serialization helpers
+- orjson-backed default response class (falls back to the stdlib encoder)
+- Cache of serialized (and compressed) payloads for completed calls, which
+  no longer change once analysis has finished
+"""
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from compression import compress
+from config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DefaultJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class PayloadCache:
+    """
+    LRU of serialized payloads bounded by total bytes.
+    Entries are keyed by id and tagged with the row's updated_at, so any change
+    to the row (rename, retry, re-analysis) makes the cached copy miss.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (version, {encoding: bytes})
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: Optional[datetime], build: Callable[[], Any],
+            encoding: Optional[str] = None) -> bytes:
+        """Return the payload for key in the requested encoding, building it on a miss"""
+        encoding = encoding or "identity"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                variants = entry[1]
+                if encoding in variants:
+                    self.hits += 1
+                    return variants[encoding]
+                identity = variants["identity"]
+            else:
+                identity = None
+
+        if identity is None:
+            self.misses += 1
+            identity = dumps(build())
+        body = identity if encoding == "identity" else compress(identity, encoding)
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._size -= sum(len(v) for v in entry[1].values())
+            variants = entry[1] if entry and entry[0] == version else {"identity": identity}
+            variants[encoding] = body
+            self._size += sum(len(v) for v in variants.values())
+            self._entries[key] = (version, variants)
+            self._evict()
+        return body
+
+    def invalidate(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._size -= sum(len(v) for v in entry[1].values())
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            _, (_, variants) = self._entries.popitem(last=False)
+            self._size -= sum(len(v) for v in variants.values())
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+
+call_payload_cache = PayloadCache(settings.PAYLOAD_CACHE_MAX_MB * 1024 * 1024)
@@ -0,0 +1,61 @@
+"""
+Runtime metrics for operators - Admin only
+Values are per API instance (in-process pools, buffers and caches).
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+
+from audit_writer import audit_writer
+from auth import get_current_active_admin
+from loop_monitor import loop_monitor
+from password_pool import password_pool_stats
+from serialization import call_payload_cache
+
+router = APIRouter(prefix="/api/system", tags=["system"])
+
+
+@router.get("/metrics")
+async def get_metrics(current_user = Depends(get_current_active_admin)):
+    """Event-loop lag, password pool queue depth, audit writer backlog and payload cache usage"""
+    return {
+        "event_loop": loop_monitor.stats(),
+        "password_pool": password_pool_stats(),
+        "audit_writer": {
+            "pending": audit_writer.pending,
+            "written": audit_writer.written,
+            "spilled": audit_writer.spilled,
+            "dropped": audit_writer.dropped,
+        },
+        "payload_cache": {
+            "size_bytes": call_payload_cache.size_bytes,
+            "hits": call_payload_cache.hits,
+            "misses": call_payload_cache.misses,
+        },
+    }
+
+
+class LoopMonitorUpdate(BaseModel):
+    enabled: bool
+    threshold_ms: Optional[int] = None
+
+
+@router.get("/loop-monitor")
+async def get_loop_monitor(current_user = Depends(get_current_active_admin)):
+    """Lag statistics and the most recent stalls (with the blocking stack and route)"""
+    return {**loop_monitor.stats(), "recent_stalls": loop_monitor.recent_stalls()}
+
+
+@router.put("/loop-monitor")
+async def update_loop_monitor(update: LoopMonitorUpdate, current_user = Depends(get_current_active_admin)):
+    """Switch the event-loop monitor on/off or change its threshold on this instance"""
+    if update.threshold_ms is not None:
+        if update.threshold_ms < 10:
+            raise HTTPException(status_code=400, detail="threshold_ms must be at least 10")
+        loop_monitor.threshold_ms = update.threshold_ms
+    if update.enabled:
+        loop_monitor.start()
+    else:
+        loop_monitor.stop()
+    return loop_monitor.stats()
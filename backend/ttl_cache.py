@@ -0,0 +1,83 @@
+"""
+Small in-process TTL cache for hot read endpoints
+Entries expire after ttl_seconds and can be invalidated explicitly; each API
+instance has its own copy, so the TTL bounds staleness across instances.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    @property
+    def generation(self) -> int:
+        """Pass to set() to skip caching a value computed across an invalidation"""
+        return self._generation
+
+    def set(self, key: Hashable, value: Any, generation: int = None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                # Invalidated while the value was being computed - don't cache stale data
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        generation = self._generation
+        value = build()
+        self.set(key, value, generation)
+        return value
+
+    def invalidate(self, key: Hashable = _MISSING):
+        """Drop one key, or everything when called without a key"""
+        with self._lock:
+            if key is _MISSING:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            # Values computed before this point must not be stored (see set())
+            self._generation += 1
+
+
+_groups = {}
+
+
+def cache_group(name: str) -> List[TTLCache]:
+    return _groups.setdefault(name, [])
+
+
+def register_cache(group: str, cache: TTLCache) -> TTLCache:
+    """Add a cache to a named group so invalidate_group() clears it"""
+    cache_group(group).append(cache)
+    return cache
+
+
+def invalidate_group(group: str):
+    for cache in cache_group(group):
+        cache.invalidate()
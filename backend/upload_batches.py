@@ -0,0 +1,294 @@
+"""
+Bulk upload batches (POST /api/upload/bulk)
+- Accepts many loose files, or one zip; a manifest (manifest.csv with
+  filename,agent_id columns, or manifest.json mapping filename -> agent_id)
+  assigns recordings to agents, otherwise the form's agent_id applies to all
+- Assignments and agents are checked before anything is written; every file
+  is then streamed to UPLOAD_DIR (upload_storage). If one is rejected the
+  files already stored are removed and nothing is inserted
+- All CallEvaluation rows, their audit rows and the UploadBatch row are
+  inserted in one transaction
+- Processing runs with at most BULK_PROCESS_CONCURRENCY calls in flight per
+  instance, so a 200-file batch does not start 200 pipelines at once
+- Progress is aggregated from the batch's calls (CallEvaluation.batch_id)
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import uuid
+import zipfile
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from audit_logger import audit_record, call_upload_record
+from config import settings
+from database import Agent, AuditLog, CallEvaluation, UploadBatch
+from upload_storage import discard, new_call_id, save_upload, store_stream
+
+MANIFEST_NAMES = ("manifest.csv", "manifest.json")
+MANIFEST_MAX_BYTES = 1024 * 1024
+ZIP_MAGIC = b"PK\x03\x04"
+
+_process_slots: Optional[asyncio.Semaphore] = None
+
+
+def _basename(name: str) -> str:
+    return os.path.basename((name or "").replace("\\", "/"))
+
+
+def parse_manifest(data: bytes, name: str) -> Dict[str, str]:
+    """filename -> agent_id from a manifest.csv or manifest.json"""
+    try:
+        text = data.decode("utf-8-sig")
+        if name.lower().endswith(".json"):
+            parsed = json.loads(text)
+            if isinstance(parsed, list):  # [{"filename": ..., "agent_id": ...}]
+                return {str(row["filename"]): str(row["agent_id"]) for row in parsed}
+            return {str(filename): str(agent_id) for filename, agent_id in parsed.items()}
+        rows = csv.DictReader(io.StringIO(text))
+        return {row["filename"].strip(): row["agent_id"].strip() for row in rows if row.get("filename")}
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid manifest {name}: {e}")
+
+
+def is_zip(upload: UploadFile) -> bool:
+    head = upload.file.read(len(ZIP_MAGIC))
+    upload.file.seek(0)
+    return head == ZIP_MAGIC
+
+
+def assign_agents(names: List[str], manifest: Dict[str, str], default_agent_id: Optional[str]) -> List[str]:
+    """Agent id per file - manifest entry (full path, then base name) or the default"""
+    assigned, missing = [], []
+    for name in names:
+        agent_id = manifest.get(name) or manifest.get(_basename(name)) or default_agent_id
+        if not agent_id:
+            missing.append(name)
+        assigned.append(agent_id)
+    if missing:
+        raise HTTPException(status_code=400, detail=f"No agent assigned for: {', '.join(missing[:20])}")
+    return assigned
+
+
+def load_agents(db: Session, agent_ids: List[str]) -> Dict[str, Agent]:
+    agents = {agent.agentId: agent for agent in db.query(Agent).filter(Agent.agentId.in_(set(agent_ids)))}
+    unknown = sorted(set(agent_ids) - set(agents))
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Agent not found: {', '.join(unknown)}")
+    return agents
+
+
+def _check_count(count: int):
+    if count == 0:
+        raise HTTPException(status_code=400, detail="No recordings in upload")
+    if count > settings.BULK_UPLOAD_MAX_FILES:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.BULK_UPLOAD_MAX_FILES} recordings per batch"
+        )
+
+
+def _file_error(filename: str, error: HTTPException) -> HTTPException:
+    return HTTPException(status_code=error.status_code, detail=f"{filename}: {error.detail}")
+
+
+def remove_staged(staged: List[Dict]):
+    for item in staged:
+        discard(item["path"])
+
+
+async def stage_files(uploads: List[UploadFile], agent_ids: List[str]) -> List[Dict]:
+    """Stream loose files to disk; all or nothing"""
+    staged = []
+    try:
+        for upload, agent_id in zip(uploads, agent_ids):
+            call_id = _unique_call_id(staged)
+            try:
+                stored = await save_upload(upload, call_id)
+            except HTTPException as e:
+                raise _file_error(upload.filename, e)
+            staged.append({"call_id": call_id, "filename": _basename(upload.filename), "agent_id": agent_id, **stored})
+    except BaseException:
+        remove_staged(staged)
+        raise
+    return staged
+
+
+def stage_zip(archive: zipfile.ZipFile, members: List[zipfile.ZipInfo], agent_ids: List[str]) -> List[Dict]:
+    """Extract zip members straight into UPLOAD_DIR (blocking); all or nothing"""
+    staged = []
+    try:
+        for info, agent_id in zip(members, agent_ids):
+            call_id = _unique_call_id(staged)
+            try:
+                with archive.open(info) as source:
+                    stored = store_stream(source, call_id, info.filename)
+            except HTTPException as e:
+                raise _file_error(info.filename, e)
+            staged.append({"call_id": call_id, "filename": _basename(info.filename), "agent_id": agent_id, **stored})
+    except BaseException:
+        remove_staged(staged)
+        raise
+    return staged
+
+
+def zip_members(archive: zipfile.ZipFile):
+    """(recording members, manifest from the zip or {}) - checks sizes from the directory up front"""
+    members, manifest = [], {}
+    for info in archive.infolist():
+        name = _basename(info.filename)
+        if info.is_dir() or not name or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+            continue
+        if name.lower() in MANIFEST_NAMES:
+            if info.file_size > MANIFEST_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Manifest is too large")
+            manifest = parse_manifest(archive.read(info), name)
+            continue
+        if info.file_size > settings.MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{info.filename}: exceeds the {settings.MAX_FILE_SIZE // (1024 * 1024)} MB limit",
+            )
+        members.append(info)
+    _check_count(len(members))
+    if sum(info.file_size for info in members) > settings.BULK_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Extracted recordings exceed the bulk upload limit")
+    return members, manifest
+
+
+def _unique_call_id(staged: List[Dict]) -> str:
+    # new_call_id() has a 4-digit suffix - a batch easily produces two in the same second
+    taken = {item["call_id"] for item in staged}
+    while True:
+        call_id = new_call_id()
+        if call_id not in taken:
+            return call_id
+
+
+async def stage_bulk_upload(
+    db: Session, files: List[UploadFile], manifest: Optional[UploadFile], default_agent_id: Optional[str]
+):
+    """Validate a bulk request and stream its recordings to disk -> (source, staged items, agents by id)"""
+    manifest_map = {}
+    if manifest is not None:
+        data = await manifest.read(MANIFEST_MAX_BYTES + 1)
+        if len(data) > MANIFEST_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Manifest is too large")
+        manifest_map = parse_manifest(data, manifest.filename or "manifest.csv")
+
+    if len(files) == 1 and is_zip(files[0]):
+        try:
+            archive = await asyncio.to_thread(zipfile.ZipFile, files[0].file)
+            members, zip_manifest = await asyncio.to_thread(zip_members, archive)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="Invalid zip file")
+        agent_ids = assign_agents([info.filename for info in members], {**zip_manifest, **manifest_map}, default_agent_id)
+        agents = load_agents(db, agent_ids)
+        return "zip", await asyncio.to_thread(stage_zip, archive, members, agent_ids), agents
+
+    _check_count(len(files))
+    agent_ids = assign_agents([upload.filename for upload in files], manifest_map, default_agent_id)
+    agents = load_agents(db, agent_ids)
+    return "files", await stage_files(files, agent_ids), agents
+
+
+def ingest_batch(db: Session, source: str, staged: List[Dict], agents: Dict[str, Agent], current_user) -> UploadBatch:
+    """Insert the batch, its calls and their audit rows in one transaction"""
+    batch = UploadBatch(
+        id=f"BATCH-{uuid.uuid4().hex[:12].upper()}",
+        source=source,
+        file_count=len(staged),
+        total_bytes=sum(item["size"] for item in staged),
+        created_by=current_user.id,
+        created_by_name=current_user.full_name,
+    )
+    db.add(batch)
+    db.add_all([
+        CallEvaluation(
+            id=item["call_id"],
+            filename=item["filename"],
+            file_path=item["path"],
+            file_size=item["size"],
+            file_sha256=item["sha256"],
+            batch_id=batch.id,
+            status="processing",
+            analysis_status="queued",
+            agent_id=item["agent_id"],
+            agent_name=agents[item["agent_id"]].agentName,
+        )
+        for item in staged
+    ])
+    records = [
+        call_upload_record(
+            item["call_id"], item["filename"], agents[item["agent_id"]].agentName,
+            current_user.full_name, current_user.role, batch.id
+        )
+        for item in staged
+    ]
+    records.append(audit_record(
+        action="create",
+        resource_type="upload_batch",
+        resource_id=batch.id,
+        message=f"Bulk uploaded {len(staged)} calls ({source})",
+        user=current_user.full_name,
+        role=current_user.role,
+        details={"file_count": len(staged), "total_bytes": batch.total_bytes, "source": source},
+    ))
+    # Audit rows go in with the calls rather than through the buffered writer
+    db.execute(insert(AuditLog), records)
+    db.commit()
+    return batch
+
+
+async def dispatch_batch(process: Callable[[str, str], None], items: List[Dict]):
+    """Run process(call_id, path) for every item, BULK_PROCESS_CONCURRENCY at a time (background task)"""
+    global _process_slots
+    if _process_slots is None:
+        _process_slots = asyncio.Semaphore(settings.BULK_PROCESS_CONCURRENCY)
+
+    async def run(item):
+        async with _process_slots:
+            try:
+                await asyncio.to_thread(process, item["call_id"], item["path"])
+            except Exception as e:
+                print(f"❌ Bulk processing failed for {item['call_id']}: {e}")
+
+    await asyncio.gather(*(run(item) for item in items))
+
+
+def batch_progress(db: Session, batch: UploadBatch) -> Dict:
+    """Aggregate state of a batch's calls"""
+    counts = {"queued": 0, "processing": 0, "completed": 0, "failed": 0, "cancelled": 0}
+    rows = (
+        db.query(CallEvaluation.status, CallEvaluation.analysis_status, func.count())
+        .filter(CallEvaluation.batch_id == batch.id)
+        .group_by(CallEvaluation.status, CallEvaluation.analysis_status)
+    )
+    for call_status, analysis_status, count in rows:
+        if call_status in ("completed", "failed", "cancelled"):
+            key = call_status
+        elif analysis_status == "queued":
+            key = "queued"
+        else:
+            key = "processing"
+        counts[key] += count
+
+    tracked = sum(counts.values())
+    finished = counts["completed"] + counts["failed"] + counts["cancelled"]
+    return {
+        "batch_id": batch.id,
+        "source": batch.source,
+        "file_count": batch.file_count,
+        "total_bytes": batch.total_bytes,
+        "created_by": batch.created_by_name,
+        "created_at": batch.created_at.isoformat() if batch.created_at else None,
+        "counts": counts,
+        "deleted": max(0, batch.file_count - tracked),  # Calls removed since upload
+        "finished": finished,
+        "percent": round(100 * finished / tracked, 1) if tracked else 100.0,
+        "done": finished == tracked,
+    }
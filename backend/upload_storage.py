@@ -0,0 +1,194 @@
+"""
+Streamed audio upload storage
+- Uploads are copied in UPLOAD_CHUNK_SIZE chunks to a .part file next to the
+  destination (never held in memory), hashed with SHA-256 on the way, and
+  renamed into place once complete - a crash never leaves a truncated recording
+  under the final name
+- The format is sniffed from the first bytes (WAV/MP3/M4A), not the extension
+- MAX_FILE_SIZE is enforced while copying, and UploadSizeLimitMiddleware stops
+  oversized request bodies before they are spooled to disk at all
+"""
+import asyncio
+import hashlib
+import os
+import uuid
+from datetime import datetime
+from typing import BinaryIO, Dict, Optional
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.responses import JSONResponse
+
+from config import settings
+
+# Bytes needed to recognise every supported format
+SNIFF_BYTES = 12
+
+# Room for multipart boundaries and the other form fields around the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+AUDIO_EXTENSIONS = {
+    "wav": (".wav",),
+    "mp3": (".mp3",),
+    "m4a": (".m4a", ".mp4", ".aac"),
+}
+
+
+def sniff_audio_format(head: bytes) -> Optional[str]:
+    """wav, mp3 or m4a from the leading bytes of a file, None if unrecognised"""
+    if len(head) >= 12 and head[:4] in (b"RIFF", b"RF64") and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:3] == b"ID3":
+        return "mp3"
+    # MPEG audio frame sync: 11 set bits, layer bits not 00 (reserved)
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0 and head[1] & 0x06:
+        return "mp3"
+    if len(head) >= 8 and head[4:8] == b"ftyp":
+        return "m4a"
+    return None
+
+
+def stored_filename(call_id: str, filename: str, audio_format: Optional[str]) -> str:
+    """{call_id}_{name} with any directory parts dropped and a matching extension ensured (if the format is known)"""
+    name = os.path.basename((filename or "").replace("\\", "/")) or "recording"
+    if audio_format and not name.lower().endswith(AUDIO_EXTENSIONS[audio_format]):
+        name = f"{name}.{audio_format}"
+    return f"{call_id}_{name}"
+
+
+def too_large(what: str = "File", limit: int = None) -> HTTPException:
+    limit = settings.MAX_FILE_SIZE if limit is None else limit
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"{what} exceeds the {limit // (1024 * 1024)} MB limit",
+    )
+
+
+def write_stream(source: BinaryIO, part_path: str, max_bytes: int = None) -> Dict:
+    """
+    Copy a file object to part_path chunk by chunk (blocking - run in a thread).
+    Rejects unknown formats after the first bytes and stops as soon as the copy
+    passes max_bytes; the .part file is removed on any failure.
+    Returns {"size", "sha256", "format"}.
+    """
+    max_bytes = settings.MAX_FILE_SIZE if max_bytes is None else max_bytes
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    audio_format = None
+    try:
+        with open(part_path, "wb") as out:
+            while True:
+                chunk = source.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise too_large()
+                if audio_format is None:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                    if len(head) >= SNIFF_BYTES:
+                        audio_format = require_format(head)
+                digest.update(chunk)
+                out.write(chunk)
+            if audio_format is None:
+                audio_format = require_format(head)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        discard(part_path)
+        raise
+    return {"size": size, "sha256": digest.hexdigest(), "format": audio_format}
+
+
+def require_format(head: bytes) -> str:
+    audio_format = sniff_audio_format(head)
+    if audio_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Unsupported audio format (expected WAV, MP3 or M4A)",
+        )
+    return audio_format
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file on disk, read in chunks (blocking)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(settings.UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def store_stream(source: BinaryIO, call_id: str, filename: str) -> Dict:
+    """
+    Copy a file object into UPLOAD_DIR under its final name (blocking).
+    Returns {"path", "size", "sha256", "format"}; raises 413/415 HTTPExceptions.
+    """
+    part_path = os.path.join(settings.UPLOAD_DIR, f"{call_id}.part")
+    stored = write_stream(source, part_path)
+    path = os.path.join(settings.UPLOAD_DIR, stored_filename(call_id, filename, stored["format"]))
+    os.replace(part_path, path)
+    stored["path"] = path
+    return stored
+
+
+async def save_upload(upload: UploadFile, call_id: str) -> Dict:
+    """store_stream for an UploadFile, off the event loop"""
+    return await asyncio.to_thread(store_stream, upload.file, call_id, upload.filename)
+
+
+def new_call_id() -> str:
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    return f"REC-{timestamp}-{str(uuid.uuid4().int)[:4]}"
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Pure ASGI - caps request bodies on upload routes before the form parser
+    spools them: rejects an oversized Content-Length up front, and aborts a
+    body that grows past the limit while it is being received
+    """
+
+    def __init__(self, app, limits: Dict[str, int] = None):
+        self.app = app
+        self.limits = limits or {
+            "/api/upload": settings.MAX_FILE_SIZE + FORM_OVERHEAD_BYTES,
+            "/api/upload/bulk": settings.BULK_UPLOAD_MAX_BYTES + FORM_OVERHEAD_BYTES,
+        }
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope.get("headers") or []).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            await _reject(scope, receive, send, limit)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise too_large("Request body", limit)  # Surfaces as a 413 through FastAPI's exception handling
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def _reject(scope, receive, send, limit: int):
+    error = too_large("Request body", limit)
+    response = JSONResponse({"detail": error.detail}, status_code=error.status_code, headers={"Connection": "close"})
+    await response(scope, receive, send)